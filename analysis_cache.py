@@ -0,0 +1,239 @@
+"""
+Content-addressed cache for image analysis results
+Re-uploaded images skip EXIF parsing, quality analysis and paid AI keywording
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# Seconds a connection waits for another process's write lock before failing
+BUSY_TIMEOUT_SECONDS = 30
+
+
+class AnalysisCache:
+    """Persistent, size-bounded cache keyed by image content hash and provider/model"""
+
+    def __init__(self, path: str = ":memory:", max_entries: int = 10000,
+                 max_bytes: int = 256 * 1024 * 1024):
+        if max_entries <= 0 or max_bytes <= 0:
+            raise ValueError("Cache limits must be positive")
+
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+        if path != ":memory:":
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        if path != ":memory:":
+            # Prefork workers share the file; WAL lets them read while another writes
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._init_schema()
+
+    def _init_schema(self):
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " digest TEXT NOT NULL,"
+                " provider TEXT NOT NULL,"
+                " model TEXT NOT NULL,"
+                " kind TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created REAL NOT NULL,"
+                " accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS perceptual_hashes ("
+                " digest TEXT NOT NULL,"
+                " provider TEXT NOT NULL,"
+                " model TEXT NOT NULL,"
+                " phash TEXT NOT NULL,"
+                " PRIMARY KEY (digest, provider, model))"
+            )
+
+    @staticmethod
+    def hash_file(path: str) -> str:
+        """Return the SHA-256 hex digest of a file's bytes"""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def hash_bytes(data: bytes) -> str:
+        """Return the SHA-256 hex digest of in-memory image bytes"""
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def json_compatible(payload: Dict[str, Any]) -> Dict[str, Any]:
+        """payload as a cache hit returns it: tuples become lists, other non-JSON values strings"""
+        return json.loads(json.dumps(payload, default=str))
+
+    @staticmethod
+    def make_key(digest: str, provider: str, model: str, kind: str = "metadata") -> str:
+        """Build the cache key for a content hash, provider/model pair and entry kind"""
+        return f"{kind}:{provider.lower()}:{model}:{digest}"
+
+    def get(self, digest: str, provider: str, model: str, kind: str = "metadata") -> Optional[Dict[str, Any]]:
+        """Return a cached payload or None, counting the lookup as a hit or miss"""
+        key = self.make_key(digest, provider, model, kind)
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+
+            self._hits += 1
+            with self._conn:
+                self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+
+        try:
+            return json.loads(row[0])
+        except ValueError as e:
+            logger.warning(f"Discarding corrupt cache entry {key}: {e}")
+            self.delete(digest, provider, model, kind)
+            return None
+
+    def contains(self, digest: str, provider: str, model: str, kind: str = "metadata") -> bool:
+        """Whether an entry exists, without counting a lookup or refreshing its recency"""
+        key = self.make_key(digest, provider, model, kind)
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone() is not None
+
+    def set(self, digest: str, provider: str, model: str, payload: Dict[str, Any],
+            kind: str = "metadata") -> None:
+        """Store a payload, evicting least recently used entries beyond the size bounds"""
+        key = self.make_key(digest, provider, model, kind)
+        encoded = json.dumps(payload, default=str)
+        size = len(encoded.encode("utf-8"))
+        if size > self.max_bytes:
+            logger.warning(f"Not caching {key}: entry larger than cache limit")
+            return
+
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries "
+                    "(key, digest, provider, model, kind, payload, size, created, accessed) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, digest, provider.lower(), model, kind, encoded, size, now, now)
+                )
+                self._evict()
+
+    def delete(self, digest: str, provider: str, model: str, kind: str = "metadata") -> None:
+        """Remove a single entry if present"""
+        key = self.make_key(digest, provider, model, kind)
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def _evict(self):
+        """Drop least recently used entries until both bounds hold (caller holds the lock)"""
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute("SELECT key, size FROM entries ORDER BY accessed ASC").fetchall()
+        doomed = []
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+        self._conn.execute("DELETE FROM perceptual_hashes WHERE digest NOT IN (SELECT digest FROM entries)")
+        self._evictions += len(doomed)
+
+    def set_phash(self, digest: str, provider: str, model: str, phash: int) -> None:
+        """Record the perceptual hash of an analyzed image for near-duplicate lookups"""
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO perceptual_hashes (digest, provider, model, phash) VALUES (?, ?, ?, ?)",
+                    (digest, provider.lower(), model, format(phash, "016x"))
+                )
+
+    def iter_phashes(self, provider: str, model: str) -> Iterator[Tuple[str, int]]:
+        """Yield (digest, perceptual hash) pairs recorded for a provider/model"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT digest, phash FROM perceptual_hashes WHERE provider = ? AND model = ?",
+                (provider.lower(), model)
+            ).fetchall()
+        for digest, phash in rows:
+            yield digest, int(phash, 16)
+
+    def clear(self) -> None:
+        """Remove every entry and reset statistics"""
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM entries")
+                self._conn.execute("DELETE FROM perceptual_hashes")
+            self._hits = self._misses = self._evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current occupancy"""
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "entries": count,
+                "size_bytes": total,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache = None
+_default_cache_pid = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> Optional[AnalysisCache]:
+    """Return the process-wide cache configured from the environment, or None if disabled"""
+    global _default_cache, _default_cache_pid
+    from config import Config
+
+    if not Config.ANALYSIS_CACHE_ENABLED:
+        return None
+
+    with _default_cache_lock:
+        # A SQLite connection must not cross a fork, so each prefork worker opens its own
+        if _default_cache is None or _default_cache_pid != os.getpid():
+            _default_cache_pid = os.getpid()
+            _default_cache = AnalysisCache(
+                path=Config.ANALYSIS_CACHE_PATH,
+                max_entries=Config.ANALYSIS_CACHE_MAX_ENTRIES,
+                max_bytes=Config.ANALYSIS_CACHE_MAX_MB * 1024 * 1024
+            )
+        return _default_cache
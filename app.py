@@ -1,18 +1,28 @@
-from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for
-from controller import PrompterGenerator
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for
+from controller import PrompterGenerator, storyboard_chunks
+from provider_router import provider_router, select_generator, with_failover
+from singleflight import coalesce, singleflight
+from token_estimator import TokenBudgetExceeded, fit_calls, prompt_token_stats, token_ledger
 from microstock_optimizer import optimizer
-from image_metadata_extractor import create_metadata_extractor
+from pregeneration import PregenSpec, pregeneration_pool
+from platform_optimizer import platform_optimizer, throughput_stats
+from image_metadata_extractor import create_metadata_extractor, duplicate_of, summarize_duplicate_groups
+from config import Config
+from analysis_cache import get_default_cache
+from metadata_export import (EXPORT_FORMATS, ZIP_MANIFEST_COLUMNS, export_extension, export_mimetype, iter_export,
+                             iter_zip_archive, manifest_row)
 import os
 import time
 import json
 import io
-import pandas as pd
-from typing import List, Dict
-from dotenv import load_dotenv
+import csv
+import itertools
 import tempfile
+import functools
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from dotenv import load_dotenv
 import re
 from werkzeug.utils import secure_filename
-import zipfile
 
 load_dotenv()
 
@@ -32,6 +42,8 @@ UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'tiff', 'bmp', 'webp'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# ZIP export manifests move from memory to a temp file past this size
+MANIFEST_SPOOL_BYTES = 1024 * 1024
 
 # Ensure upload directory exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -60,289 +72,479 @@ def imagen_page():
 def metadata_page():
     return render_template('metadata.html')
 
+# Pause between consecutive provider calls within one request (provider rate limits)
+PROMPT_PACING_SECONDS = 2
+
+class PromptJob(NamedTuple):
+    """One generate_*_prompts request: generator method, its arguments and how to build each entry"""
+    method: str
+    subject: Optional[str]
+    kwargs: Dict
+    make_entry: Callable[[Dict, int, int], Dict]
+    label: str
+    # Streaming variant of method and the parameters its cleaner strips (None: no token streaming)
+    stream_method: Optional[str] = None
+    clean_params: Optional[List[str]] = None
+
+def has_credentials(data: Dict, key_field: str = 'api_key', provider_field: str = 'provider') -> bool:
+    """True when the request carries an API key or names a provider that needs none"""
+    return bool(data.get(key_field)) or not Config.requires_api_key(data.get(provider_field, 'gemini'))
+
+def generator_options(data: Dict) -> Dict:
+    """PrompterGenerator arguments shared by every generation endpoint"""
+    options = {'api_key': data.get('api_key'), 'model_name': data.get('model'), 'provider': data.get('provider', 'gemini')}
+    if data.get('max_tokens'):
+        options['max_tokens'] = int(data['max_tokens'])
+    return options
+
+def backup_keys(data: Dict) -> Dict[str, str]:
+    """The requester's own keys for other providers (backup_api_keys: {"openai": "..."}), used for hedging"""
+    keys = data.get('backup_api_keys')
+    if not isinstance(keys, dict):
+        return {}
+    return {provider: key for provider, key in keys.items() if isinstance(key, str) and key}
+
+def build_generator(data: Dict, factory: Optional[Callable] = None):
+    """The requested provider's generator, hedged with any other provider the request has a key for
+
+    Identical concurrent requests share their upstream calls (singleflight.py).
+    """
+    factory = factory or PrompterGenerator
+    if data.get('max_tokens'):
+        factory = functools.partial(factory, max_tokens=int(data['max_tokens']))
+    return coalesce(with_failover(factory(**generator_options(data)), factory, backup_keys(data)), data)
+
+def job_token_budget(data: Dict) -> int:
+    """Estimated-token budget of a request's whole job: its token_budget, capped by JOB_TOKEN_BUDGET (0 = none)"""
+    budgets = [int(budget) for budget in (data.get('token_budget'), Config.JOB_TOKEN_BUDGET) if budget]
+    return min(budgets) if budgets else 0
+
+def plan_prompt_job(generator, job: PromptJob, data: Dict) -> Tuple[int, Optional[Dict]]:
+    """How many of the job's prompts fit its token budget, and the budget report for the response"""
+    total = data.get('round_count', 1) * data.get('num_prompts', 1)
+    budget = job_token_budget(data)
+    if not budget:
+        return total, None
+    per_prompt = generator.estimate_call_tokens(job.method, **job.kwargs)
+    count = fit_calls(per_prompt, total, budget)
+    return count, {'budget': budget, 'tokens_per_prompt': per_prompt, 'estimated_tokens': per_prompt * count,
+                   'skipped': total - count}
+
+def over_budget_error(tokens: int, budget: int) -> Dict:
+    return {'error': f'Needs about {tokens} tokens, over the token budget of {budget}'}
+
+def pregen_spec(job: PromptJob, data: Dict) -> Optional[PregenSpec]:
+    """The pre-generation pool entry a job's prompts can be served from (none for seeded or size-capped requests)"""
+    if data.get('seed') or data.get('max_tokens'):
+        return None
+    return PregenSpec(data.get('provider', 'gemini'), data.get('model'), job.method, job.kwargs)
+
+def take_pregenerated(spec: Optional[PregenSpec]) -> Optional[Dict]:
+    return pregeneration_pool.take(spec) if spec else None
+
+def trending_prompt_specs() -> List[PregenSpec]:
+    """Pre-generation seeds: the trending subjects and bestselling prompts with the default Midjourney settings"""
+    subjects = [subject for category, subjects in optimizer.trending_subjects.items() if category != 'imagen'
+                for subject in subjects]
+    subjects += [prompt for category in ('business', 'technology', 'lifestyle')
+                 for prompt in optimizer.get_bestselling_prompts(category)]
+    data = {'provider': Config.DEFAULT_PROVIDER, 'model': Config.DEFAULT_MODEL}
+    return [pregen_spec(midjourney_prompt_job(dict(data, main_base=subject)), data) for subject in subjects]
+
+pregeneration_pool.seed_factory = trending_prompt_specs
+
+def prompt_slots(data: Dict, limit: int) -> Iterable[Tuple[int, int]]:
+    """(round, index) of each prompt in a job, stopping after limit prompts"""
+    slots = ((round_num, i) for round_num in range(1, data.get('round_count', 1) + 1)
+             for i in range(1, data.get('num_prompts', 1) + 1))
+    return itertools.islice(slots, limit)
+
+def midjourney_prompt_job(data: Dict) -> PromptJob:
+    main_base = data.get('main_base')
+    theme = data.get('theme', '')
+    elements = data.get('elements', '')
+    config_mj = data.get('config_mj', '--ar 16:9 --q 2')
+    
+    def make_entry(result: Dict, round_num: int, i: int) -> Dict:
+        clean_prompt = clean_generated_prompt(result["text"])
+        complete_prompt = f"{clean_prompt} {config_mj.strip()}"
+        metadata = generate_prompt_metadata(clean_prompt, main_base, theme, elements)
+        return {
+            "prompt": complete_prompt,
+            "title": metadata["title"],
+            "description": metadata["description"], 
+            "keywords": metadata["keywords"],
+            "category": metadata["category"],
+            "round": round_num,
+            "index": i,
+            "provider": result["provider"],
+            "timestamp": time.time()
+        }
+    
+    kwargs = dict(
+        main_base=main_base,
+        image_style=data.get('image_style', 'Photography'),
+        image_detail=data.get('image_details', ''),
+        theme=theme,
+        elements=elements,
+        emotional=data.get('emotional', ''),
+        color=data.get('color_palette', ''),
+        aspect=data.get('aspect', '16:9'),
+    )
+    return PromptJob('prompt_generator', main_base, kwargs, make_entry, 'prompt',
+                     'stream_prompt_generator', MIDJOURNEY_CLEAN_PARAMS)
+
+def flux_prompt_job(data: Dict) -> PromptJob:
+    main_subject = data.get('main_subject')
+    image_style = data.get('image_style', 'Photography')
+    details = data.get('details', '')
+    quality_tags = data.get('quality_tags', [])
+    mood = data.get('mood', '')
+    negative_prompt = data.get('negative_prompt', 'blurry, low quality, distorted')
+    aspect_ratio = data.get('aspect_ratio', '1:1 (Square)')
+    inference_steps = data.get('inference_steps', 28)
+    
+    def make_entry(result: Dict, round_num: int, i: int) -> Dict:
+        # Clean FLUX prompt (should already be clean, but safety check)
+        flux_prompt = clean_flux_prompt(result["text"])
+        
+        # Add quality tags if specified
+        if quality_tags:
+            flux_prompt += f", {', '.join(quality_tags)}"
+        metadata = generate_flux_prompt_metadata(flux_prompt, main_subject, image_style, mood)
+        return {
+            "prompt": flux_prompt,
+            "negative_prompt": negative_prompt,
+            "title": metadata["title"],
+            "description": metadata["description"], 
+            "keywords": metadata["keywords"],
+            "category": metadata["category"],
+            "aspect_ratio": aspect_ratio,
+            "inference_steps": inference_steps,
+            "round": round_num,
+            "index": i,
+            "provider": result["provider"],
+            "timestamp": time.time()
+        }
+    
+    kwargs = dict(
+        main_base=main_subject,
+        image_style=image_style,
+        theme=mood,
+        elements=details,
+        emotional=mood,
+        color=data.get('color_scheme', ''),
+        image_detail=details,
+        lighting=data.get('lighting', 'natural lighting'),
+        composition=data.get('composition', 'medium shot')
+    )
+    return PromptJob('flux_prompt_generator', main_subject, kwargs, make_entry, 'FLUX prompt',
+                     'stream_flux_prompt_generator', FLUX_CLEAN_PARAMS)
+
+def imagen_prompt_job(data: Dict) -> PromptJob:
+    main_subject = data.get('main_subject')
+    image_style = data.get('image_style', 'Photography')
+    setting = data.get('setting', '')
+    mood = data.get('mood', 'optimistic')
+    negative_prompt = data.get('negative_prompt', 'text, logos, branding, trademarks, identifiable people, ugly, deformed, noisy, blurry, distorted, grainy')
+    
+    def make_entry(result: Dict, round_num: int, i: int) -> Dict:
+        # Clean Imagen prompt
+        imagen_prompt = clean_imagen_prompt(result["text"])
+        
+        metadata = generate_imagen_prompt_metadata(imagen_prompt, main_subject, image_style, mood, setting)
+        return {
+            "prompt": imagen_prompt,
+            "negative_prompt": negative_prompt,
+            "title": metadata["title"],
+            "description": metadata["description"], 
+            "keywords": metadata["keywords"],
+            "category": metadata["category"],
+            "round": round_num,
+            "index": i,
+            "provider": result["provider"],
+            "timestamp": time.time()
+        }
+    
+    kwargs = dict(
+        main_base=main_subject,
+        image_style=image_style,
+        theme=data.get('theme', ''),
+        elements=data.get('elements', ''),
+        emotional=mood,
+        color=data.get('color_palette', 'neutral tones'),
+        image_detail=data.get('details', ''),
+        lighting=data.get('lighting', 'natural lighting'),
+        composition=data.get('composition', 'rule of thirds'),
+        setting=setting,
+        mood=mood
+    )
+    return PromptJob('imagen_prompt_generator', main_subject, kwargs, make_entry, 'Imagen prompt')
+
+def run_prompt_job(job_factory: Callable[[Dict], PromptJob], data: Dict) -> Tuple[Dict, int]:
+    """Run num_prompts x round_count generations, returning the JSON payload and status code"""
+    job = job_factory(data)
+    if not has_credentials(data) or not job.subject:
+        return {'error': 'API key and main subject are required'}, 400
+    
+    generator = build_generator(data)
+    limit, token_report = plan_prompt_job(generator, job, data)
+    if token_report and not limit:
+        return over_budget_error(token_report['tokens_per_prompt'], token_report['budget']), 400
+    spec = pregen_spec(job, data)
+    if spec:
+        pregeneration_pool.observe(spec, limit)
+    generated_prompts = []
+    
+    for round_num, i in prompt_slots(data, limit):
+        try:
+            result = take_pregenerated(spec)
+            if result is None:
+                result = getattr(generator, job.method)(**job.kwargs)
+                time.sleep(PROMPT_PACING_SECONDS)
+            generated_prompts.append(job.make_entry(result, round_num, i))
+        except Exception as e:
+            return {'error': f'Error generating {job.label}: {str(e)}'}, 500
+    
+    payload = {'prompts': generated_prompts}
+    if token_report:
+        payload['token_budget'] = token_report
+    return payload, 200
+
+def stream_prompt_events(job: PromptJob, data: Dict, generator, limit: int, token_report: Optional[Dict] = None):
+    """Yield cleaned text deltas while each of the first limit prompts is generated, then the finished entry"""
+    started = time.perf_counter()
+    count = 0
+    spec = pregen_spec(job, data)
+    # Streams are not hedged: one provider streams and is reported for the whole request
+    streamer = select_generator(generator)
+    if spec:
+        pregeneration_pool.observe(spec, limit)
+    
+    try:
+        start = {'type': 'start', 'total': limit}
+        if token_report:
+            start['token_budget'] = token_report
+        yield start
+        for round_num, i in prompt_slots(data, limit):
+            try:
+                result = take_pregenerated(spec)
+                if result is None and job.stream_method:
+                    cleaner = StreamingPromptCleaner(job.clean_params or [])
+                    chunks = []
+                    for chunk in getattr(streamer, job.stream_method)(**job.kwargs):
+                        chunks.append(chunk)
+                        text = cleaner.feed(chunk)
+                        if text:
+                            yield {'type': 'delta', 'round': round_num, 'index': i, 'text': text}
+                    text = cleaner.finish()
+                    if text:
+                        yield {'type': 'delta', 'round': round_num, 'index': i, 'text': text}
+                    result = {'text': ''.join(chunks), 'provider': streamer.provider.value}
+                elif result is None:
+                    result = getattr(generator, job.method)(**job.kwargs)
+                count += 1
+                yield {'type': 'prompt', 'entry': job.make_entry(result, round_num, i)}
+            except Exception as e:
+                yield {'type': 'error', 'error': f'Error generating {job.label}: {str(e)}'}
+                return
+            if count < limit and not result.get('pregenerated'):
+                time.sleep(PROMPT_PACING_SECONDS)
+        
+        yield {'type': 'summary', 'success': True, 'total_generated': count,
+               'elapsed_seconds': round(time.perf_counter() - started, 3)}
+    except Exception as e:
+        yield {'type': 'error', 'error': str(e)}
+
+def prompt_job_response(job_factory: Callable[[Dict], PromptJob], data: Dict):
+    """JSON response for a prompt job, or a stream of its text as it is generated when one is requested"""
+    fmt = stream_format(data)
+    if fmt:
+        job = job_factory(data)
+        if not has_credentials(data) or not job.subject:
+            return jsonify({'error': 'API key and main subject are required'}), 400
+        generator = build_generator(data)
+        limit, token_report = plan_prompt_job(generator, job, data)
+        if token_report and not limit:
+            return jsonify(over_budget_error(token_report['tokens_per_prompt'], token_report['budget'])), 400
+        return stream_response(stream_prompt_events(job, data, generator, limit, token_report), fmt)
+    
+    payload, status = run_prompt_job(job_factory, data)
+    return jsonify(payload), status
+
 @app.route('/api/generate_prompts', methods=['POST'])
 def generate_prompts():
     try:
-        data = request.json
-        api_key = data.get('api_key')
-        provider = data.get('provider', 'gemini')
-        model = data.get('model')
-        main_base = data.get('main_base')
-        image_style = data.get('image_style', 'Photography')
-        image_details = data.get('image_details', '')
-        theme = data.get('theme', '')
-        elements = data.get('elements', '')
-        emotional = data.get('emotional', '')
-        color_palette = data.get('color_palette', '')
-        aspect = data.get('aspect', '16:9')
-        config_mj = data.get('config_mj', '--ar 16:9 --q 2')
-        num_prompts = data.get('num_prompts', 1)
-        round_count = data.get('round_count', 1)
-        
-        if not api_key or not main_base:
-            return jsonify({'error': 'API key and main subject are required'}), 400
-        
-        generator = PrompterGenerator(api_key=api_key, model_name=model, provider=provider)
-        generated_prompts = []
-        
-        for round_num in range(1, round_count + 1):
-            for i in range(1, num_prompts + 1):
-                try:
-                    result = generator.prompt_generator(
-                        main_base=main_base,
-                        image_style=image_style,
-                        image_detail=image_details,
-                        theme=theme,
-                        elements=elements,
-                        emotional=emotional,
-                        color=color_palette,
-                        aspect=aspect,
-                    )
-                    
-                    clean_prompt = clean_generated_prompt(result["text"])
-                    complete_prompt = f"{clean_prompt} {config_mj.strip()}"
-                    metadata = generate_prompt_metadata(clean_prompt, main_base, theme, elements)
-                    
-                    generated_prompts.append({
-                        "prompt": complete_prompt,
-                        "title": metadata["title"],
-                        "description": metadata["description"], 
-                        "keywords": metadata["keywords"],
-                        "category": metadata["category"],
-                        "round": round_num,
-                        "index": i,
-                        "provider": result["provider"],
-                        "timestamp": time.time()
-                    })
-                    
-                    time.sleep(2)
-                    
-                except Exception as e:
-                    return jsonify({'error': f'Error generating prompt: {str(e)}'}), 500
-        
-        return jsonify({'prompts': generated_prompts})
-        
+        return prompt_job_response(midjourney_prompt_job, request.json)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/generate_flux_prompts', methods=['POST'])
 def generate_flux_prompts():
     try:
-        data = request.json
-        api_key = data.get('api_key')
-        provider = data.get('provider', 'gemini')
-        model = data.get('model')
-        main_subject = data.get('main_subject')
-        image_style = data.get('image_style', 'Photography')
-        lighting = data.get('lighting', 'natural lighting')
-        composition = data.get('composition', 'medium shot')
-        details = data.get('details', '')
-        quality_tags = data.get('quality_tags', [])
-        mood = data.get('mood', '')
-        color_scheme = data.get('color_scheme', '')
-        negative_prompt = data.get('negative_prompt', 'blurry, low quality, distorted')
-        aspect_ratio = data.get('aspect_ratio', '1:1 (Square)')
-        inference_steps = data.get('inference_steps', 28)
-        num_prompts = data.get('num_prompts', 1)
-        round_count = data.get('round_count', 1)
-        
-        if not api_key or not main_subject:
-            return jsonify({'error': 'API key and main subject are required'}), 400
-        
-        generator = PrompterGenerator(api_key=api_key, model_name=model, provider=provider)
-        generated_prompts = []
-        
-        for round_num in range(1, round_count + 1):
-            for i in range(1, num_prompts + 1):
-                try:
-                    result = generator.flux_prompt_generator(
-                        main_base=main_subject,
-                        image_style=image_style,
-                        theme=mood,
-                        elements=details,
-                        emotional=mood,
-                        color=color_scheme,
-                        image_detail=details,
-                        lighting=lighting,
-                        composition=composition
-                    )
-                    
-                    # Clean FLUX prompt (should already be clean, but safety check)
-                    flux_prompt = clean_flux_prompt(result["text"])
-                    
-                    # Add quality tags if specified
-                    if quality_tags:
-                        flux_prompt += f", {', '.join(quality_tags)}"
-                    metadata = generate_flux_prompt_metadata(flux_prompt, main_subject, image_style, mood)
-                    
-                    generated_prompts.append({
-                        "prompt": flux_prompt,
-                        "negative_prompt": negative_prompt,
-                        "title": metadata["title"],
-                        "description": metadata["description"], 
-                        "keywords": metadata["keywords"],
-                        "category": metadata["category"],
-                        "aspect_ratio": aspect_ratio,
-                        "inference_steps": inference_steps,
-                        "round": round_num,
-                        "index": i,
-                        "provider": result["provider"],
-                        "timestamp": time.time()
-                    })
-                    
-                    time.sleep(2)
-                    
-                except Exception as e:
-                    return jsonify({'error': f'Error generating FLUX prompt: {str(e)}'}), 500
-        
-        return jsonify({'prompts': generated_prompts})
-        
+        return prompt_job_response(flux_prompt_job, request.json)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/generate_imagen_prompts', methods=['POST'])
 def generate_imagen_prompts():
     try:
-        data = request.json
-        api_key = data.get('api_key')
-        provider = data.get('provider', 'gemini')
-        model = data.get('model')
-        main_subject = data.get('main_subject')
-        image_style = data.get('image_style', 'Photography')
-        setting = data.get('setting', '')
-        composition = data.get('composition', 'rule of thirds')
-        lighting = data.get('lighting', 'natural lighting')
-        mood = data.get('mood', 'optimistic')
-        color_palette = data.get('color_palette', 'neutral tones')
-        details = data.get('details', '')
-        theme = data.get('theme', '')
-        elements = data.get('elements', '')
-        negative_prompt = data.get('negative_prompt', 'text, logos, branding, trademarks, identifiable people, ugly, deformed, noisy, blurry, distorted, grainy')
-        num_prompts = data.get('num_prompts', 1)
-        round_count = data.get('round_count', 1)
-        
-        if not api_key or not main_subject:
-            return jsonify({'error': 'API key and main subject are required'}), 400
-        
-        generator = PrompterGenerator(api_key=api_key, model_name=model, provider=provider)
-        generated_prompts = []
-        
-        for round_num in range(1, round_count + 1):
-            for i in range(1, num_prompts + 1):
-                try:
-                    result = generator.imagen_prompt_generator(
-                        main_base=main_subject,
-                        image_style=image_style,
-                        theme=theme,
-                        elements=elements,
-                        emotional=mood,
-                        color=color_palette,
-                        image_detail=details,
-                        lighting=lighting,
-                        composition=composition,
-                        setting=setting,
-                        mood=mood
-                    )
-                    
-                    # Clean Imagen prompt
-                    imagen_prompt = clean_imagen_prompt(result["text"])
-                    
-                    metadata = generate_imagen_prompt_metadata(imagen_prompt, main_subject, image_style, mood, setting)
-                    
-                    generated_prompts.append({
-                        "prompt": imagen_prompt,
-                        "negative_prompt": negative_prompt,
-                        "title": metadata["title"],
-                        "description": metadata["description"], 
-                        "keywords": metadata["keywords"],
-                        "category": metadata["category"],
-                        "round": round_num,
-                        "index": i,
-                        "provider": result["provider"],
-                        "timestamp": time.time()
-                    })
-                    
-                    time.sleep(2)
-                    
-                except Exception as e:
-                    return jsonify({'error': f'Error generating Imagen prompt: {str(e)}'}), 500
-        
-        return jsonify({'prompts': generated_prompts})
-        
+        return prompt_job_response(imagen_prompt_job, request.json)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def storyboard_args(data: Dict) -> Optional[Dict]:
+    """storyboard_generator arguments, or None when a required field is missing"""
+    context = data.get('context')
+    keywords = data.get('keywords', [])
+    if not has_credentials(data) or not context or not keywords:
+        return None
+    
+    if isinstance(keywords, str):
+        keywords_list = [k.strip() for k in keywords.split(',') if k.strip()]
+    else:
+        keywords_list = keywords
+    args = {'context': context, 'keywords': keywords_list, 'num_scenes': data.get('num_scenes', 1)}
+    if data.get('chunk_size'):
+        args['chunk_size'] = int(data['chunk_size'])
+    return args
 
 @app.route('/api/generate_storyboard', methods=['POST'])
 def generate_storyboard():
     try:
         data = request.json
-        api_key = data.get('api_key')
-        provider = data.get('provider', 'gemini')
-        model = data.get('model')
-        context = data.get('context')
-        keywords = data.get('keywords', [])
-        num_scenes = data.get('num_scenes', 1)
-
-        if not api_key or not context or not keywords:
+        args = storyboard_args(data)
+        if args is None:
             return jsonify({'error': 'API key, context, and keywords are required'}), 400
 
-        if isinstance(keywords, str):
-            keywords_list = [k.strip() for k in keywords.split(',') if k.strip()]
-        else:
-            keywords_list = keywords
-
-        generator = PrompterGenerator(api_key=api_key, model_name=model, provider=provider)
-        result = generator.storyboard_generator(context=context, keywords=keywords_list, num_scenes=num_scenes)
+        generator = build_generator(data)
+        budget = job_token_budget(data)
+        if budget:
+            tokens = generator.estimate_call_tokens('storyboard_generator', **args)
+            if tokens > budget:
+                return jsonify(over_budget_error(tokens, budget)), 400
+        fmt = stream_format(data)
+        if fmt:
+            return stream_response(stream_storyboard_events(generator, args), fmt)
+        
+        result = generator.storyboard_generator(**args)
         return jsonify(result)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def stream_storyboard_events(generator: PrompterGenerator, args: Dict):
+    """Yield each scene range as soon as its chunk completes, then a summary listing failed ranges"""
+    started = time.perf_counter()
+    generator = select_generator(generator)
+    total_chunks = len(storyboard_chunks(args['num_scenes'], args.get('chunk_size') or Config.STORYBOARD_CHUNK_SCENES))
+    completed = scenes_generated = 0
+    failed_chunks = []
+    
+    try:
+        if total_chunks == 1:
+            # One call: relay each scene as soon as the streamed JSON completes it
+            scenes = generator.stream_storyboard_generator(args['context'], args['keywords'], args['num_scenes'])
+            yield {'type': 'start', 'total_scenes': args['num_scenes'], 'chunks': total_chunks}
+            for scene in scenes:
+                scenes_generated += 1
+                yield {'type': 'scenes', 'first_scene': scene['scene'], 'last_scene': scene['scene'],
+                       'scenes': [scene]}
+            yield {'type': 'summary', 'success': True, 'provider': generator.provider.value,
+                   'scenes_generated': scenes_generated, 'failed_chunks': [],
+                   'elapsed_seconds': round(time.perf_counter() - started, 3)}
+            return
+        
+        chunks = generator.iter_storyboard_chunks(**args)
+        yield {'type': 'start', 'total_scenes': args['num_scenes'], 'chunks': total_chunks}
+        for chunk in chunks:
+            completed += 1
+            if chunk.get('error'):
+                failed_chunks.append(chunk)
+                yield dict(chunk, type='chunk_error', completed_chunks=completed, chunks=total_chunks)
+            else:
+                scenes_generated += len(chunk['scenes'])
+                yield dict(chunk, type='scenes', completed_chunks=completed, chunks=total_chunks)
+        
+        yield {
+            'type': 'summary',
+            'success': True,
+            'provider': generator.provider.value,
+            'scenes_generated': scenes_generated,
+            'failed_chunks': [{key: chunk[key] for key in ('first_scene', 'last_scene', 'error')}
+                              for chunk in sorted(failed_chunks, key=lambda chunk: chunk['first_scene'])],
+            'elapsed_seconds': round(time.perf_counter() - started, 3)
+        }
+    except Exception as e:
+        yield {'type': 'error', 'error': str(e)}
+
+def bulk_entry(i: int, prompt_config: Dict, result: Optional[Dict] = None, error: Optional[Exception] = None,
+               provider: str = 'gemini') -> Dict:
+    """One bulk_generate row: the generated prompt, or the final error after all retries"""
+    if error is not None:
+        return {
+            'index': i+1,
+            'main_base': prompt_config.get('main_base', ''),
+            'generated_prompt': f"Error: {str(error)}",
+            'provider': provider,
+            'status': 'Failed'
+        }
+    return {
+        'index': i+1,
+        'main_base': prompt_config.get('main_base', ''),
+        'generated_prompt': result['text'].replace('.', '').strip(),
+        'provider': result['provider'],
+        'status': 'Success'
+    }
+
+def bulk_token_plan(generator, prompts_data: List[Dict], budget: int) -> List[bool]:
+    """Which bulk rows fit the job token budget, taking rows in order until it is spent
+
+    A row that cannot be estimated (e.g. an unexpected field) costs nothing here; it fails on its own when sent.
+    """
+    if not budget:
+        return [True] * len(prompts_data)
+    fits, spent = [], 0
+    for prompt_config in prompts_data:
+        try:
+            tokens = generator.estimate_call_tokens('prompt_generator', **prompt_config)
+        except Exception:
+            tokens = 0
+        fits.append(spent + tokens <= budget)
+        spent += tokens if fits[-1] else 0
+    return fits
+
 @app.route('/api/bulk_generate', methods=['POST'])
 def bulk_generate():
     try:
         data = request.json
-        api_key = data.get('api_key')
-        provider = data.get('provider', 'gemini')
-        model = data.get('model')
         prompts_data = data.get('prompts_data', [])
         delay_between = data.get('delay_between', 3)
         max_retries = data.get('max_retries', 2)
         
-        if not api_key or not prompts_data:
+        if not has_credentials(data) or not prompts_data:
             return jsonify({'error': 'API key and prompts data are required'}), 400
         
-        generator = PrompterGenerator(api_key=api_key, model_name=model, provider=provider)
+        options = generator_options(data)
+        generator = build_generator(data)
+        fits = bulk_token_plan(generator, prompts_data, job_token_budget(data))
+        if not any(fits):
+            tokens = generator.estimate_call_tokens('prompt_generator', **prompts_data[0])
+            return jsonify(over_budget_error(tokens, job_token_budget(data))), 400
         generated_prompts = []
         
         for i, prompt_config in enumerate(prompts_data):
-            retry_count = 0
-            success = False
-            
-            while retry_count < max_retries and not success:
+            if not fits[i]:
+                generated_prompts.append(bulk_entry(i, prompt_config, error=TokenBudgetExceeded(
+                    'Skipped: over the job token budget'), provider=options['provider']))
+                continue
+            for attempt in range(1, max_retries + 1):
                 try:
                     result = generator.prompt_generator(**prompt_config)
-                    
-                    generated_prompts.append({
-                        'index': i+1,
-                        'main_base': prompt_config['main_base'],
-                        'generated_prompt': result['text'].replace('.', '').strip(),
-                        'provider': result['provider'],
-                        'status': 'Success'
-                    })
-                    
-                    success = True
-                    
+                    generated_prompts.append(bulk_entry(i, prompt_config, result))
+                    break
                 except Exception as e:
-                    retry_count += 1
-                    if retry_count >= max_retries:
-                        generated_prompts.append({
-                            'index': i+1,
-                            'main_base': prompt_config['main_base'],
-                            'generated_prompt': f"Error: {str(e)}",
-                            'provider': provider,
-                            'status': 'Failed'
-                        })
+                    if attempt >= max_retries:
+                        generated_prompts.append(bulk_entry(i, prompt_config, error=e, provider=options['provider']))
             
             time.sleep(delay_between)
         
@@ -372,6 +574,59 @@ def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def form_flag(name: str) -> bool:
+    """Interpret a multipart form field as a boolean switch"""
+    return request.form.get(name, '').lower() in ('1', 'true', 'yes', 'on')
+
+STREAM_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream'
+}
+
+def stream_format(data: Optional[Dict] = None) -> Optional[str]:
+    """Return the requested streaming format ('ndjson' or 'sse'), or None for a plain JSON response"""
+    requested = (data or {}).get('stream') or request.form.get('stream') or request.args.get('stream') or ''
+    requested = str(requested).lower()
+    if requested in STREAM_MIMETYPES:
+        return requested
+    if requested in ('1', 'true', 'yes', 'on'):
+        return 'ndjson'
+    
+    accept = request.headers.get('Accept', '')
+    if 'application/x-ndjson' in accept:
+        return 'ndjson'
+    if 'text/event-stream' in accept:
+        return 'sse'
+    return None
+
+def encode_stream_event(event: Dict, fmt: str) -> str:
+    """Serialize one event as an NDJSON line or a Server-Sent Events frame"""
+    payload = json.dumps(event, default=str)
+    if fmt == 'sse':
+        return f"event: {event.get('type', 'message')}\ndata: {payload}\n\n"
+    return payload + '\n'
+
+def stream_response(events: Iterable[Dict], fmt: str) -> Response:
+    """Relay events to the client as they are produced, without buffering the whole body"""
+    response = Response((encode_stream_event(event, fmt) for event in events),
+                        mimetype=STREAM_MIMETYPES[fmt])
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/stats')
+def api_stats():
+    """Report runtime statistics for caches and shared resources"""
+    cache = get_default_cache()
+    return jsonify({
+        'analysis_cache': cache.stats() if cache is not None else {'enabled': False},
+        'providers': provider_router.stats(),
+        'coalescing': singleflight.stats(),
+        'prompt_tokens': prompt_token_stats.stats(),
+        'token_ledger': token_ledger.stats(),
+        'pregeneration': pregeneration_pool.stats()
+    })
+
 @app.route('/api/extract_metadata', methods=['POST'])
 def extract_metadata():
     """Extract metadata from uploaded image"""
@@ -389,6 +644,7 @@ def extract_metadata():
         # Get AI settings
         ai_key = request.form.get('ai_key')
         ai_provider = request.form.get('ai_provider', 'gemini')
+        force_refresh = form_flag('force_refresh')
         
         # Save uploaded file
         filename = secure_filename(file.filename)
@@ -399,10 +655,10 @@ def extract_metadata():
         
         try:
             # Create metadata extractor
-            extractor = create_metadata_extractor(ai_key, ai_provider)
+            extractor = create_metadata_extractor(ai_key, ai_provider, cache=get_default_cache())
             
             # Extract metadata
-            metadata = extractor.extract_image_metadata(filepath)
+            metadata = extractor.extract_image_metadata(filepath, force_refresh=force_refresh)
             
             # Add file info
             metadata['upload_info'] = {
@@ -425,9 +681,41 @@ def extract_metadata():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def save_uploaded_images(files) -> List[Tuple[str, str]]:
+    """Save allowed uploads to the upload folder, returning (saved path, original filename) pairs"""
+    saved = []
+    for file in files:
+        if file.filename == '' or not allowed_file(file.filename):
+            continue
+        
+        # Save uploaded file
+        filename = secure_filename(file.filename)
+        timestamp = str(int(time.time()))
+        unique_filename = f"{timestamp}_{filename}"
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+        file.save(filepath)
+        saved.append((filepath, filename))
+    return saved
+
+def format_batch_result(result: Dict) -> Dict:
+    """Shape an extractor batch result for API responses"""
+    return {
+        'filename': os.path.basename(result['image_path']),
+        'success': result['success'],
+        'metadata': result.get('metadata', {}),
+        'error': result.get('error', ''),
+        'processed_at': result['processed_at']
+    }
+
+def remove_files(paths: List[str]):
+    """Delete temporary upload files that still exist"""
+    for filepath in paths:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
 @app.route('/api/batch_extract_metadata', methods=['POST'])
 def batch_extract_metadata():
-    """Extract metadata from multiple images"""
+    """Extract metadata from multiple images, optionally streaming one record per image"""
     try:
         if 'images' not in request.files:
             return jsonify({'error': 'No image files provided'}), 400
@@ -439,58 +727,191 @@ def batch_extract_metadata():
         # Get AI settings
         ai_key = request.form.get('ai_key')
         ai_provider = request.form.get('ai_provider', 'gemini')
+        force_refresh = form_flag('force_refresh')
+        near_duplicate_threshold = request.form.get('near_duplicate_threshold', type=int,
+                                                    default=Config.NEAR_DUPLICATE_THRESHOLD)
+        ai_batch_size = request.form.get('ai_batch_size', type=int, default=Config.AI_BATCH_SIZE)
+        fmt = stream_format()
         
         # Process each file
         results = []
         temp_files = []
+        streaming = False
         
         try:
-            for file in files:
-                if file.filename == '' or not allowed_file(file.filename):
-                    continue
-                
-                # Save uploaded file
-                filename = secure_filename(file.filename)
-                timestamp = str(int(time.time()))
-                unique_filename = f"{timestamp}_{filename}"
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-                file.save(filepath)
-                temp_files.append(filepath)
+            temp_files = [filepath for filepath, _ in save_uploaded_images(files)]
             
             if not temp_files:
                 return jsonify({'error': 'No valid image files found'}), 400
             
             # Create metadata extractor
-            extractor = create_metadata_extractor(ai_key, ai_provider)
+            extractor = create_metadata_extractor(ai_key, ai_provider, cache=get_default_cache())
+            
+            if fmt:
+                # The generator now owns the uploads and removes them once the stream ends
+                streaming = True
+                return stream_response(
+                    stream_batch_events(extractor, temp_files, force_refresh, near_duplicate_threshold,
+                                        ai_batch_size), fmt
+                )
             
             # Process images in batch
-            batch_results = extractor.batch_process_images(temp_files)
+            batch_results = extractor.batch_process_images(temp_files, force_refresh=force_refresh,
+                                                           near_duplicate_threshold=near_duplicate_threshold,
+                                                           ai_batch_size=ai_batch_size)
             
             # Format results
             for result in batch_results:
-                results.append({
-                    'filename': os.path.basename(result['image_path']),
-                    'success': result['success'],
-                    'metadata': result.get('metadata', {}),
-                    'error': result.get('error', ''),
-                    'processed_at': result['processed_at']
-                })
+                results.append(format_batch_result(result))
             
             return jsonify({
                 'success': True,
                 'results': results,
-                'total_processed': len(results)
+                'total_processed': len(results),
+                'duplicate_groups': summarize_duplicate_groups(batch_results)
             })
             
         finally:
             # Clean up temp files
-            for filepath in temp_files:
-                if os.path.exists(filepath):
-                    os.remove(filepath)
+            if not streaming:
+                remove_files(temp_files)
                     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def stream_batch_events(extractor, temp_files: List[str], force_refresh: bool = False,
+                        near_duplicate_threshold: Optional[int] = None, ai_batch_size: int = 1):
+    """Yield a result event per image with running counts, then a summary event"""
+    total = len(temp_files)
+    succeeded = failed = 0
+    duplicate_groups = {}
+    started = time.time()
+    
+    try:
+        yield {'type': 'start', 'total': total}
+        
+        results = extractor.iter_process_images(temp_files, force_refresh=force_refresh,
+                                                near_duplicate_threshold=near_duplicate_threshold,
+                                                ai_batch_size=ai_batch_size)
+        for index, result in enumerate(results, 1):
+            if result['success']:
+                succeeded += 1
+                representative = duplicate_of(result['metadata'])
+                if representative:
+                    duplicate_groups.setdefault(representative, []).append(result['metadata']['filename'])
+            else:
+                failed += 1
+            
+            yield {
+                'type': 'result',
+                'index': index,
+                'total': total,
+                'processed': index,
+                'succeeded': succeeded,
+                'failed': failed,
+                'result': format_batch_result(result)
+            }
+            
+            # Drop the uploaded file as soon as its record has been sent
+            remove_files([result['image_path']])
+        
+        yield {
+            'type': 'summary',
+            'success': True,
+            'total_processed': succeeded + failed,
+            'succeeded': succeeded,
+            'failed': failed,
+            'duplicate_groups': duplicate_groups,
+            'elapsed_seconds': round(time.time() - started, 3)
+        }
+    except Exception as e:
+        yield {'type': 'error', 'error': str(e)}
+    finally:
+        remove_files(temp_files)
+
+@app.route('/api/batch_export_zip', methods=['POST'])
+def batch_export_zip():
+    """Process uploaded images and stream back a ZIP of JPEG copies with embedded metadata plus a manifest"""
+    try:
+        files = request.files.getlist('images')
+        if not files:
+            return jsonify({'error': 'No image files provided'}), 400
+        
+        ai_key = request.form.get('ai_key')
+        ai_provider = request.form.get('ai_provider', 'gemini')
+        force_refresh = form_flag('force_refresh')
+        near_duplicate_threshold = request.form.get('near_duplicate_threshold', type=int,
+                                                    default=Config.NEAR_DUPLICATE_THRESHOLD)
+        ai_batch_size = request.form.get('ai_batch_size', type=int, default=Config.AI_BATCH_SIZE)
+        
+        uploads = save_uploaded_images(files)
+        if not uploads:
+            return jsonify({'error': 'No valid image files found'}), 400
+        temp_files = [path for path, _ in uploads]
+        
+        try:
+            extractor = create_metadata_extractor(ai_key, ai_provider, cache=get_default_cache())
+            entries = processed_zip_entries(extractor, uploads, force_refresh, near_duplicate_threshold,
+                                            ai_batch_size)
+            response = Response(iter_zip_archive(entries), mimetype='application/zip')
+        except Exception:
+            remove_files(temp_files)
+            raise
+        response.headers['Content-Disposition'] = f'attachment; filename=processed_images_{int(time.time())}.zip'
+        # The entries generator removes uploads as it goes, but never runs if the client leaves before the body starts
+        response.call_on_close(lambda: remove_files(temp_files))
+        return response
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def processed_zip_entries(extractor, uploads: List[Tuple[str, str]], force_refresh: bool = False,
+                          near_duplicate_threshold: Optional[int] = None, ai_batch_size: int = 1):
+    """Yield (archive name, bytes) for each processed image, then the manifest CSV
+    
+    The manifest is spooled to a temporary file once it outgrows MANIFEST_SPOOL_BYTES, so memory
+    stays bounded however many images are processed.
+    """
+    original_names = dict(uploads)
+    used_names = set()
+    manifest = tempfile.SpooledTemporaryFile(max_size=MANIFEST_SPOOL_BYTES)
+    manifest_text = io.TextIOWrapper(manifest, encoding='utf-8', newline='')
+    manifest_writer = csv.writer(manifest_text)
+    manifest_writer.writerow(ZIP_MANIFEST_COLUMNS)
+    
+    try:
+        results = extractor.iter_process_images(list(original_names), force_refresh=force_refresh,
+                                                near_duplicate_threshold=near_duplicate_threshold,
+                                                ai_batch_size=ai_batch_size)
+        for result in results:
+            source = original_names[result['image_path']]
+            archive_name = ''
+            if result['success']:
+                try:
+                    image = io.BytesIO()
+                    extractor.embed_metadata(result['image_path'], result['metadata'], image)
+                    stem, suffix = os.path.splitext(source)[0], 1
+                    archive_name = f"images/{stem}.jpg"
+                    while archive_name in used_names:
+                        suffix += 1
+                        archive_name = f"images/{stem}_{suffix}.jpg"
+                    used_names.add(archive_name)
+                    yield archive_name, image.getvalue()
+                except Exception as e:
+                    result = dict(result, success=False, error=f"Embedding metadata failed: {e}")
+            
+            manifest_writer.writerow(manifest_row(archive_name, source, result))
+            
+            # Drop the uploaded file as soon as its entry has been written
+            remove_files([result['image_path']])
+        
+        manifest_text.flush()
+        manifest.seek(0)
+        yield 'manifest.csv', manifest
+    finally:
+        manifest_text.close()
+        remove_files(list(original_names))
+
 @app.route('/api/generate_image_keywords', methods=['POST'])
 def generate_image_keywords():
     """Generate AI-powered keywords for image description"""
@@ -504,7 +925,7 @@ def generate_image_keywords():
         if not image_description:
             return jsonify({'error': 'Image description is required'}), 400
         
-        if not ai_key:
+        if not has_credentials(data, 'ai_key', 'ai_provider'):
             return jsonify({'error': 'AI API key is required'}), 400
         
         # Use the prompt generator to create keywords
@@ -561,101 +982,65 @@ def optimize_for_platform():
         if not title or not description:
             return jsonify({'error': 'Title and description are required'}), 400
         
-        # Platform-specific optimizations
-        platform_requirements = {
-            'shutterstock': {
-                'title_max': 100,
-                'description_max': 200,
-                'keywords_max': 50,
-                'requirements': [
-                    'No people names or locations',
-                    'Professional quality required',
-                    'Model releases needed for people',
-                    'Property releases for recognizable buildings'
-                ]
-            },
-            'getty': {
-                'title_max': 80,
-                'description_max': 150,
-                'keywords_max': 30,
-                'requirements': [
-                    'Premium quality only',
-                    'Strict editorial guidelines',
-                    'Comprehensive releases required',
-                    'High commercial value'
-                ]
-            },
-            'adobe_stock': {
-                'title_max': 70,
-                'description_max': 200,
-                'keywords_max': 49,
-                'requirements': [
-                    'AI-generated content must be disclosed',
-                    'No Adobe trademarks',
-                    'Model releases required',
-                    'Technical quality standards'
-                ]
-            },
-            'istock': {
-                'title_max': 100,
-                'description_max': 200,
-                'keywords_max': 50,
-                'requirements': [
-                    'Getty Images subsidiary',
-                    'Professional standards',
-                    'Exclusive content preferred',
-                    'Diverse representation valued'
-                ]
-            }
-        }
+        optimized = platform_optimizer.optimize(title, description, keywords, category, platform)
         
-        platform_info = platform_requirements.get(platform, platform_requirements['shutterstock'])
+        return jsonify({
+            'success': True,
+            'optimized': optimized
+        })
         
-        # Optimize content
-        optimized = {
-            'platform': platform,
-            'title': title[:platform_info['title_max']],
-            'description': description[:platform_info['description_max']],
-            'keywords': keywords,
-            'category': category,
-            'requirements': platform_info['requirements'],
-            'compliance_check': {
-                'title_length': len(title) <= platform_info['title_max'],
-                'description_length': len(description) <= platform_info['description_max'],
-                'keywords_count': len(keywords.split(',')) <= platform_info['keywords_max']
-            }
-        }
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/batch_optimize_for_platform', methods=['POST'])
+def batch_optimize_for_platform():
+    """Optimize many items for a set of platforms, returning or streaming every item x platform result"""
+    try:
+        data = request.json or {}
+        items = data.get('items', [])
+        if not items:
+            return jsonify({'error': 'No items provided'}), 400
+        
+        try:
+            platforms = [rules.name for rules in platform_optimizer.resolve_platforms(data.get('platforms'))]
+        except ValueError as e:
+            return jsonify({'error': str(e), 'supported_platforms': platform_optimizer.platforms}), 400
+        
+        fmt = stream_format(data)
+        if fmt:
+            return stream_response(stream_platform_events(items, platforms), fmt)
         
-        # Limit keywords if needed
-        keyword_list = [kw.strip() for kw in keywords.split(',') if kw.strip()]
-        if len(keyword_list) > platform_info['keywords_max']:
-            keyword_list = keyword_list[:platform_info['keywords_max']]
-            optimized['keywords'] = ', '.join(keyword_list)
-            optimized['keywords_truncated'] = True
-        
-        # Add optimization suggestions
-        suggestions = []
-        if len(title) > platform_info['title_max']:
-            suggestions.append(f"Title too long - max {platform_info['title_max']} characters")
-        if len(description) > platform_info['description_max']:
-            suggestions.append(f"Description too long - max {platform_info['description_max']} characters")
-        if len(keyword_list) > platform_info['keywords_max']:
-            suggestions.append(f"Too many keywords - max {platform_info['keywords_max']} allowed")
-        
-        optimized['suggestions'] = suggestions
-        optimized['compliant'] = len(suggestions) == 0
+        started = time.perf_counter()
+        results = list(platform_optimizer.optimize_batch(items, platforms))
+        failed = sum(1 for result in results if not result['success'])
         
         return jsonify({
             'success': True,
-            'optimized': optimized
+            'results': results,
+            'stats': throughput_stats(len(items), len(platforms), len(results), failed, started)
         })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def stream_platform_events(items: List[Dict], platforms: List[str]):
+    """Yield a result event per item x platform pair, then a summary with throughput"""
+    started = time.perf_counter()
+    count = failed = 0
+    
+    try:
+        yield {'type': 'start', 'items': len(items), 'platforms': platforms, 'total': len(items) * len(platforms)}
+        for result in platform_optimizer.optimize_batch(items, platforms):
+            count += 1
+            failed += 0 if result['success'] else 1
+            yield dict(result, type='result')
+        yield dict(throughput_stats(len(items), len(platforms), count, failed, started), type='summary', success=True)
+    except Exception as e:
+        yield {'type': 'error', 'error': str(e)}
+
 @app.route('/api/export_metadata', methods=['POST'])
 def export_metadata():
-    """Export metadata in various formats"""
+    """Export metadata as CSV, JSON, JSONL or an agency CSV layout, streamed straight into the response"""
     try:
         data = request.json
         metadata_list = data.get('metadata_list', [])
@@ -663,52 +1048,18 @@ def export_metadata():
         
         if not metadata_list:
             return jsonify({'error': 'No metadata provided'}), 400
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'error': 'Unsupported format', 'supported_formats': EXPORT_FORMATS}), 400
         
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix=f'.{export_format}') as temp_file:
-            if export_format == 'csv':
-                import csv
-                writer = csv.writer(temp_file)
-                
-                # Write header
-                headers = ['filename', 'title', 'description', 'keywords', 'category', 'width', 'height', 'file_size', 'quality_score']
-                writer.writerow(headers)
-                
-                # Write data
-                for item in metadata_list:
-                    row = [
-                        item.get('filename', ''),
-                        item.get('title', ''),
-                        item.get('description', ''),
-                        item.get('keywords', ''),
-                        item.get('category', ''),
-                        item.get('width', ''),
-                        item.get('height', ''),
-                        item.get('file_size', ''),
-                        item.get('quality_score', '')
-                    ]
-                    writer.writerow(row)
-                    
-            elif export_format == 'json':
-                json.dump(metadata_list, temp_file, indent=2)
-                
-            else:
-                return jsonify({'error': 'Unsupported format'}), 400
-            
-            temp_file_path = temp_file.name
-        
-        # Return file
-        return send_file(
-            temp_file_path,
-            as_attachment=True,
-            download_name=f'image_metadata_{int(time.time())}.{export_format}',
-            mimetype='application/octet-stream'
-        )
+        download_name = f'image_metadata_{int(time.time())}.{export_extension(export_format)}'
+        response = Response(iter_export(metadata_list, export_format), mimetype=export_mimetype(export_format))
+        response.headers['Content-Disposition'] = f'attachment; filename={download_name}'
+        return response
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def clean_prompt(prompt_text: str, params_to_remove: list) -> str:
+def clean_prompt(prompt_text: str, params_to_remove: list, fallback: str = "professional business concept") -> str:
     """Clean and format a prompt by removing specified parameters."""
     clean_prompt = prompt_text.replace("/imagine", "").replace("`", "").strip()
     
@@ -722,35 +1073,66 @@ def clean_prompt(prompt_text: str, params_to_remove: list) -> str:
     clean_prompt = re.sub(r'\s+', ' ', clean_prompt)
     clean_prompt = clean_prompt.strip(' ,-.')
     
-    return clean_prompt.strip() if clean_prompt.strip() else "professional business concept"
+    return clean_prompt.strip() if clean_prompt.strip() else fallback
+
+MIDJOURNEY_CLEAN_PARAMS = [
+    r'--ar\s+[\d:\.]+', r'--aspect\s+[\d:\.]+',
+    r'--v\s+[\d\.]+', r'--version\s+[\d\.]+', 
+    r'--stylize\s+\d+', r'--s\s+\d+',
+    r'--chaos\s+\d+', r'--c\s+\d+',
+    r'--quality\s+[\d\.]+', r'--q\s+[\d\.]+',
+    r'--zoom\s+[\d\.]+', r'--z\s+[\d\.]+',
+    r'--style\s+\w+', r'--st\s+\w+',
+    r'--seed\s+\d+', r'--sameseed\s+\d+',
+    r'--tile', r'--iw\s+[\d\.]+', r'--uplight', r'--upbeta', r'--upanime',
+    r'--hd', r'--fast', r'--relax', r'--turbo'
+]
+
+FLUX_CLEAN_PARAMS = [
+    r'--ar\s+[\d:\.]+', r'--aspect\s+[\d:\.]+',
+    r'--v\s+[\d\.]+', r'--version\s+[\d\.]+', 
+    r'--stylize\s+\d+', r'--s\s+\d+',
+    r'--chaos\s+\d+', r'--c\s+\d+',
+    r'--quality\s+[\d\.]+', r'--q\s+[\d\.]+',
+    r'--zoom\s+[\d\.]+', r'--style\s+\w+', r'--seed\s+\d+'
+]
 
 def clean_generated_prompt(prompt_text):
     """Clean Midjourney-specific parameters from generated prompts"""
-    midjourney_params = [
-        r'--ar\s+[\d:\.]+', r'--aspect\s+[\d:\.]+',
-        r'--v\s+[\d\.]+', r'--version\s+[\d\.]+', 
-        r'--stylize\s+\d+', r'--s\s+\d+',
-        r'--chaos\s+\d+', r'--c\s+\d+',
-        r'--quality\s+[\d\.]+', r'--q\s+[\d\.]+',
-        r'--zoom\s+[\d\.]+', r'--z\s+[\d\.]+',
-        r'--style\s+\w+', r'--st\s+\w+',
-        r'--seed\s+\d+', r'--sameseed\s+\d+',
-        r'--tile', r'--iw\s+[\d\.]+', r'--uplight', r'--upbeta', r'--upanime',
-        r'--hd', r'--fast', r'--relax', r'--turbo'
-    ]
-    return clean_prompt(prompt_text, midjourney_params)
+    return clean_prompt(prompt_text, MIDJOURNEY_CLEAN_PARAMS)
 
 def clean_flux_prompt(prompt_text):
     """Clean and format FLUX1.dev prompts (should already be clean)"""
-    midjourney_params = [
-        r'--ar\s+[\d:\.]+', r'--aspect\s+[\d:\.]+',
-        r'--v\s+[\d\.]+', r'--version\s+[\d\.]+', 
-        r'--stylize\s+\d+', r'--s\s+\d+',
-        r'--chaos\s+\d+', r'--c\s+\d+',
-        r'--quality\s+[\d\.]+', r'--q\s+[\d\.]+',
-        r'--zoom\s+[\d\.]+', r'--style\s+\w+', r'--seed\s+\d+'
-    ]
-    return clean_prompt(prompt_text, midjourney_params)
+    return clean_prompt(prompt_text, FLUX_CLEAN_PARAMS)
+
+class StreamingPromptCleaner:
+    """Apply clean_prompt to text arriving in chunks, releasing only output that later text cannot change
+    
+    The raw text is cleaned up to its last whitespace (a partial word or a "--flag" still waiting
+    for its value stays buffered), and only growth of that cleaned prefix is emitted. The caller
+    should still treat the final, fully cleaned prompt as authoritative.
+    """
+    
+    def __init__(self, params_to_remove: list):
+        self.params_to_remove = params_to_remove
+        self.raw = ''
+        self.sent = ''
+    
+    def feed(self, chunk: str) -> str:
+        self.raw += chunk
+        boundary = max(self.raw.rfind(' '), self.raw.rfind('\n'))
+        if boundary <= 0:
+            return ''
+        return self._advance(clean_prompt(self.raw[:boundary], self.params_to_remove, fallback=''))
+    
+    def finish(self) -> str:
+        return self._advance(clean_prompt(self.raw, self.params_to_remove, fallback=''))
+    
+    def _advance(self, cleaned: str) -> str:
+        if not cleaned.startswith(self.sent):
+            return ''
+        delta, self.sent = cleaned[len(self.sent):], cleaned
+        return delta
 
 def clean_imagen_prompt(prompt_text):
     """Clean and format Google Imagen 4 prompts"""
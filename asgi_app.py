@@ -0,0 +1,299 @@
+"""
+ASGI entry point for MJ Microstock Prompter
+
+The generation endpoints run as coroutines: provider calls are awaited and pacing uses
+asyncio.sleep, so one process can keep hundreds of generation requests in flight instead of
+parking a worker thread on each. Every other route is served by the Flask app through a WSGI
+bridge. Request parsing, validation and response bodies are shared with app.py.
+
+Run with any ASGI server, e.g.:
+    uvicorn asgi_app:app --port 5000
+"""
+
+import asyncio
+import io
+import json
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app import (PROMPT_PACING_SECONDS, PromptJob, PrompterGenerator, app as flask_app, build_generator,
+                 bulk_entry, bulk_token_plan, flux_prompt_job, generator_options, has_credentials, imagen_prompt_job,
+                 job_token_budget, midjourney_prompt_job, over_budget_error, plan_prompt_job, pregen_spec, prompt_slots,
+                 storyboard_args, stream_format, take_pregenerated)
+from config import Config
+from pregeneration import pregeneration_pool
+from token_estimator import TokenBudgetExceeded
+
+logger = logging.getLogger(__name__)
+
+
+async def arun_prompt_job(job_factory: Callable[[Dict], PromptJob], data: Dict) -> Tuple[Dict, int]:
+    """Async run_prompt_job"""
+    job = job_factory(data)
+    if not has_credentials(data) or not job.subject:
+        return {'error': 'API key and main subject are required'}, 400
+
+    generator = build_generator(data, PrompterGenerator)
+    limit, token_report = plan_prompt_job(generator, job, data)
+    if token_report and not limit:
+        return over_budget_error(token_report['tokens_per_prompt'], token_report['budget']), 400
+    spec = pregen_spec(job, data)
+    if spec:
+        pregeneration_pool.observe(spec, limit)
+    generated_prompts = []
+
+    for round_num, i in prompt_slots(data, limit):
+        try:
+            result = take_pregenerated(spec)
+            if result is None:
+                result = await getattr(generator, 'a' + job.method)(**job.kwargs)
+                await asyncio.sleep(PROMPT_PACING_SECONDS)
+            generated_prompts.append(job.make_entry(result, round_num, i))
+        except Exception as e:
+            return {'error': f'Error generating {job.label}: {str(e)}'}, 500
+
+    payload = {'prompts': generated_prompts}
+    if token_report:
+        payload['token_budget'] = token_report
+    return payload, 200
+
+
+async def generate_prompts(data: Dict) -> Tuple[Dict, int]:
+    return await arun_prompt_job(midjourney_prompt_job, data)
+
+
+async def generate_flux_prompts(data: Dict) -> Tuple[Dict, int]:
+    return await arun_prompt_job(flux_prompt_job, data)
+
+
+async def generate_imagen_prompts(data: Dict) -> Tuple[Dict, int]:
+    return await arun_prompt_job(imagen_prompt_job, data)
+
+
+async def generate_storyboard(data: Dict) -> Tuple[Dict, int]:
+    args = storyboard_args(data)
+    if args is None:
+        return {'error': 'API key, context, and keywords are required'}, 400
+
+    generator = build_generator(data, PrompterGenerator)
+    budget = job_token_budget(data)
+    if budget:
+        tokens = generator.estimate_call_tokens('storyboard_generator', **args)
+        if tokens > budget:
+            return over_budget_error(tokens, budget), 400
+    return await generator.astoryboard_generator(**args), 200
+
+
+async def bulk_generate(data: Dict) -> Tuple[Dict, int]:
+    prompts_data = data.get('prompts_data', [])
+    delay_between = data.get('delay_between', 3)
+    max_retries = data.get('max_retries', 2)
+
+    if not has_credentials(data) or not prompts_data:
+        return {'error': 'API key and prompts data are required'}, 400
+
+    options = generator_options(data)
+    generator = build_generator(data, PrompterGenerator)
+    fits = bulk_token_plan(generator, prompts_data, job_token_budget(data))
+    if not any(fits):
+        tokens = generator.estimate_call_tokens('prompt_generator', **prompts_data[0])
+        return over_budget_error(tokens, job_token_budget(data)), 400
+    generated_prompts = []
+
+    for i, prompt_config in enumerate(prompts_data):
+        if not fits[i]:
+            generated_prompts.append(bulk_entry(i, prompt_config, error=TokenBudgetExceeded(
+                'Skipped: over the job token budget'), provider=options['provider']))
+            continue
+        for attempt in range(1, max_retries + 1):
+            try:
+                result = await generator.aprompt_generator(**prompt_config)
+                generated_prompts.append(bulk_entry(i, prompt_config, result))
+                break
+            except Exception as e:
+                if attempt >= max_retries:
+                    generated_prompts.append(bulk_entry(i, prompt_config, error=e, provider=options['provider']))
+
+        await asyncio.sleep(delay_between)
+
+    return {'prompts': generated_prompts}, 200
+
+
+ASYNC_ROUTES: Dict[str, Callable[[Dict], Awaitable[Tuple[Dict, int]]]] = {
+    '/api/generate_prompts': generate_prompts,
+    '/api/generate_flux_prompts': generate_flux_prompts,
+    '/api/generate_imagen_prompts': generate_imagen_prompts,
+    '/api/generate_storyboard': generate_storyboard,
+    '/api/bulk_generate': bulk_generate,
+}
+
+# Routes whose streaming (NDJSON/SSE) responses are produced by the Flask app
+STREAMING_ROUTES = {'/api/generate_prompts', '/api/generate_flux_prompts', '/api/generate_imagen_prompts',
+                    '/api/generate_storyboard'}
+
+
+async def read_body(receive) -> bytes:
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def send_json(send, payload: Dict, status: int):
+    # Serialized exactly as Flask's jsonify would
+    body = flask_app.json.response(payload).get_data()
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def wsgi_environ(scope: Dict, body: bytes) -> Dict:
+    """Build a WSGI environ for an ASGI HTTP scope"""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        'CONTENT_LENGTH': str(len(body)),
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+async def call_wsgi(wsgi_app, scope: Dict, receive, send):
+    """Serve one request with a WSGI app in the thread pool, forwarding body chunks as they are produced"""
+    loop = asyncio.get_running_loop()
+    environ = wsgi_environ(scope, await read_body(receive))
+    started: List[Tuple[str, List[Tuple[str, str]]]] = []
+
+    def start_response(status, headers, exc_info=None):
+        started[:] = [(status, headers)]
+
+    chunks = await loop.run_in_executor(None, wsgi_app, environ, start_response)
+    iterator = iter(chunks)
+    header_sent = False
+    try:
+        while True:
+            chunk = await loop.run_in_executor(None, next, iterator, None)
+            if not header_sent:
+                status, headers = started[0]
+                await send({'type': 'http.response.start', 'status': int(status.split(' ', 1)[0]),
+                            'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]})
+                header_sent = True
+            if chunk is None:
+                break
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        if hasattr(chunks, 'close'):
+            await loop.run_in_executor(None, chunks.close)
+
+
+def requested_stream(scope: Dict, body: bytes, data) -> Optional[str]:
+    """The streaming format Flask's stream_format would pick for this request"""
+    with flask_app.request_context(wsgi_environ(scope, body)):
+        return stream_format(data if isinstance(data, dict) else None)
+
+
+def replay_body(body: bytes):
+    """An ASGI receive callable that hands an already-read body to another app"""
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {'type': 'http.disconnect'}
+        sent = True
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+    return receive
+
+
+def wsgi_fallback(wsgi_app):
+    """asgiref's WsgiToAsgi when installed, otherwise the built-in bridge"""
+    try:
+        from asgiref.wsgi import WsgiToAsgi  # type: ignore
+        return WsgiToAsgi(wsgi_app)
+    except ImportError:
+        async def bridge(scope, receive, send):
+            await call_wsgi(wsgi_app, scope, receive, send)
+        return bridge
+
+
+class AsgiApp:
+    """Routes generation endpoints to coroutines and everything else to the Flask app"""
+
+    def __init__(self, wsgi_app, routes: Dict[str, Callable], thread_pool_size: Optional[int] = None,
+                 streaming_routes: Optional[set] = None):
+        self.routes = routes
+        self.streaming_routes = streaming_routes or set()
+        self.fallback = wsgi_fallback(wsgi_app)
+        self.thread_pool_size = thread_pool_size or Config.ASGI_THREAD_POOL_SIZE
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+
+        if scope['type'] != 'http':
+            return
+        handler = self.routes.get(scope['path'])
+        if handler is None or scope['method'] != 'POST':
+            await self.fallback(scope, receive, send)
+            return
+
+        body = await read_body(receive)
+        try:
+            data = json.loads(body) if body else None
+            if scope['path'] in self.streaming_routes and requested_stream(scope, body, data):
+                await self.fallback(scope, replay_body(body), send)
+                return
+            payload, status = await handler(data)
+        except Exception as e:
+            logger.error(f"Error handling {scope['path']}: {e}")
+            payload, status = {'error': str(e)}, 500
+        await send_json(send, payload, status)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # Sync fallbacks (Flask routes, providers without async clients) share this pool
+                asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(self.thread_pool_size))
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+app = AsgiApp(flask_app, ASYNC_ROUTES, streaming_routes=STREAMING_ROUTES)
+
+if __name__ == '__main__':
+    try:
+        import uvicorn  # type: ignore
+    except ImportError:
+        sys.exit("Install an ASGI server to use async mode: pip install uvicorn")
+    uvicorn.run(app, host='0.0.0.0', port=5000)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark: streaming CSV report writer vs the previous pandas DataFrame path
+
+Usage:
+    python benchmarks/bench_csv_report.py --rows 100000
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterator
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from image_metadata_extractor import CsvReportWriter, report_row
+
+
+def synthetic_results(count: int) -> Iterator[Dict]:
+    """Yield batch results shaped like ImageMetadataExtractor.process_image output"""
+    for i in range(count):
+        if i % 50 == 49:
+            yield {
+                'image_path': f'/library/img_{i:06d}.jpg',
+                'error': 'cannot identify image file',
+                'processed_at': '2024-01-01T00:00:00',
+                'success': False
+            }
+            continue
+        yield {
+            'image_path': f'/library/img_{i:06d}.jpg',
+            'processed_at': '2024-01-01T00:00:00',
+            'success': True,
+            'metadata': {
+                'filename': f'img_{i:06d}.jpg',
+                'width': 6000,
+                'height': 4000,
+                'file_size': 8 * 1024 * 1024 + i,
+                'format': 'JPEG',
+                'exif': {'has_gps': i % 7 == 0},
+                'ai_analysis': {
+                    'ai_title': f'Diverse business team meeting in modern office {i}',
+                    'ai_keywords': 'business, teamwork, office, meeting, diverse, professional, modern',
+                    'ai_category': 'Business'
+                },
+                'microstock_optimization': {'quality_score': 70, 'microstock_ready': True}
+            }
+        }
+
+
+def streaming_report(count: int, path: str) -> None:
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        CsvReportWriter(f).write_all(synthetic_results(count))
+
+
+def pandas_report(count: int, path: str) -> None:
+    """The pre-streaming implementation: materialize every row, then a DataFrame"""
+    import pandas as pd
+
+    csv_data = [report_row(result) for result in synthetic_results(count)]
+    pd.DataFrame(csv_data).to_csv(path, index=False)
+
+
+def measure(label: str, fn: Callable[[int, str], None], count: int) -> Dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'report.csv')
+        tracemalloc.start()
+        started = time.perf_counter()
+        fn(count, path)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        size = os.path.getsize(path)
+
+    return {'label': label, 'seconds': elapsed, 'peak_mb': peak / 1024 / 1024, 'file_mb': size / 1024 / 1024}
+
+
+def pandas_import_seconds() -> float:
+    """Cold import time of pandas in a fresh interpreter"""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'import pandas'], check=True)
+    cold = time.perf_counter() - started
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'], check=True)
+    return cold - (time.perf_counter() - started)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    results = [measure('streaming csv', streaming_report, args.rows)]
+    try:
+        import pandas  # noqa: F401
+    except ImportError:
+        print("pandas not installed - skipping the DataFrame comparison")
+    else:
+        results.append(measure('pandas DataFrame', pandas_report, args.rows))
+        print(f"pandas cold import: {pandas_import_seconds() * 1000:.0f} ms")
+
+    print(f"{'writer':<18}{'rows':>10}{'seconds':>10}{'rows/s':>12}{'peak MB':>10}{'file MB':>10}")
+    for r in results:
+        print(f"{r['label']:<18}{args.rows:>10}{r['seconds']:>10.2f}{args.rows / r['seconds']:>12.0f}"
+              f"{r['peak_mb']:>10.2f}{r['file_mb']:>10.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
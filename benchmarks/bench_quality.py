@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark: technical quality analysis (sharpness, noise, exposure) on synthetic images
+
+Generates sharp, blurred, noisy and badly exposed JPEGs at a typical microstock resolution,
+then times analyze_technical_quality per image and prints the metrics and detected issues.
+
+Usage:
+    python benchmarks/bench_quality.py --width 6000 --height 4000 --repeat 5
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from image_quality import analyze_technical_quality, assess_technical_quality
+
+
+def synthetic_scene(width: int, height: int, seed: int = 0):
+    """A smooth random background with hard-edged shapes, so it has real focus detail"""
+    import numpy as np
+    from PIL import Image, ImageDraw
+
+    rng = np.random.default_rng(seed)
+    coarse = Image.fromarray(rng.integers(60, 200, (6, 9, 3), dtype=np.uint8))
+    scene = coarse.resize((width, height), Image.BICUBIC)
+    draw = ImageDraw.Draw(scene)
+    for _ in range(600):
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        w, h = int(rng.integers(width // 200, width // 12)), int(rng.integers(height // 200, height // 12))
+        color = tuple(int(c) for c in rng.integers(30, 225, 3))
+        if rng.random() < 0.5:
+            draw.rectangle([x, y, x + w, y + h], fill=color)
+        else:
+            draw.ellipse([x, y, x + w, y + h], fill=color)
+    return scene
+
+
+def variants(width: int, height: int) -> Dict[str, object]:
+    import numpy as np
+    from PIL import Image, ImageFilter
+
+    sharp = synthetic_scene(width, height)
+    pixels = np.asarray(sharp, dtype=np.float32)
+    rng = np.random.default_rng(1)
+    scale = max(width, height) / 512
+
+    def from_array(array):
+        return Image.fromarray(np.clip(array, 0, 255).astype(np.uint8))
+
+    return {
+        'sharp': sharp,
+        'blurred': sharp.filter(ImageFilter.GaussianBlur(radius=3 * scale)),
+        # High-ISO luminance mottling: grain coarse enough to survive the analysis downsampling
+        'noisy': from_array(pixels + np.asarray(Image.fromarray(
+            rng.normal(0, 12, (int(height / scale), int(width / scale))).astype(np.float32)
+        ).resize((width, height), Image.NEAREST))[..., None]),
+        'underexposed': from_array(pixels * 0.2),
+        'overexposed': from_array(pixels * 1.8 + 40),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--width', type=int, default=6000)
+    parser.add_argument('--height', type=int, default=4000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {}
+        for name, img in variants(args.width, args.height).items():
+            paths[name] = os.path.join(tmp, f'{name}.jpg')
+            img.save(paths[name], 'JPEG', quality=92)
+
+        print(f"{'image':<14}{'median ms':>10}{'sharpness':>11}{'noise':>8}{'mean':>8}"
+              f"{'shadow%':>9}{'hilite%':>9}{'score':>7}  issues")
+        all_timings = []
+        for name, path in paths.items():
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                metrics = analyze_technical_quality(path)
+                timings.append((time.perf_counter() - started) * 1000)
+            all_timings.extend(timings)
+            score, issues = assess_technical_quality(metrics)
+            print(f"{name:<14}{statistics.median(timings):>10.1f}{metrics['sharpness']:>11.1f}"
+                  f"{metrics['noise_sigma']:>8.2f}{metrics['mean_brightness']:>8.1f}"
+                  f"{metrics['shadow_clipping'] * 100:>9.1f}{metrics['highlight_clipping'] * 100:>9.1f}"
+                  f"{score:>7}  {'; '.join(issues) or '-'}")
+
+    print(f"\n{args.width}x{args.height} JPEG: median {statistics.median(all_timings):.1f} ms, "
+          f"max {max(all_timings):.1f} ms per image")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cold import time of the Flask app against a startup budget
+
+Each run imports the module in a fresh interpreter, so the measurement matches what a new
+worker (or the test suite) pays.  Exits non-zero when the median exceeds the budget or when
+a heavy dependency is imported eagerly.
+
+Usage:
+    python benchmarks/bench_startup.py --budget-ms 800
+    STARTUP_BUDGET_MS=800 python benchmarks/bench_startup.py --module app
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Dependencies that must only be loaded on first use
+LAZY_MODULES = ["google.generativeai", "openai", "pandas", "PIL", "piexif", "numpy"]
+
+CHILD_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"ms": elapsed * 1000, "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def import_once(module: str) -> Tuple[Dict, str]:
+    """Import the module in a fresh interpreter, returning its timing and the -X importtime log"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD_SCRIPT.format(module=module, lazy=LAZY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def parse_importtime(importtime_log: str, module: str, limit: int = 10) -> List[Tuple[str, float]]:
+    """Return the measured module's direct imports with the largest cumulative cost (ms)"""
+    children = []
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        # Nesting is shown as two spaces per level and children are listed before their parent
+        name = fields[2][1:]
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        if depth == 1:
+            children.append((name.strip(), float(fields[1]) / 1000))
+        elif depth == 0:
+            if name.strip() == module:
+                break
+            children = []
+    children.sort(key=lambda row: row[1], reverse=True)
+    return children[:limit]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure cold import time against a startup budget")
+    parser.add_argument("--module", default="app", help="Module to import (default: app)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_BUDGET_MS", "1000")))
+    args = parser.parse_args()
+
+    timings = []
+    loaded = set()
+    log = ""
+    for _ in range(args.runs):
+        result, log = import_once(args.module)
+        timings.append(result["ms"])
+        loaded.update(result["loaded"])
+
+    median = statistics.median(timings)
+    print(f"import {args.module}: median {median:.1f} ms, min {min(timings):.1f} ms, "
+          f"max {max(timings):.1f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    print("heaviest direct imports (last run):")
+    for name, ms in parse_importtime(log, args.module):
+        print(f"  {ms:8.1f} ms  {name}")
+
+    failed = False
+    if loaded:
+        print(f"❌ Eagerly imported heavy dependencies: {', '.join(sorted(loaded))}")
+        failed = True
+    if median > args.budget_ms:
+        print(f"❌ Startup {median:.1f} ms exceeds budget {args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print("✅ Startup within budget")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Command-line bulk ingest for large image directories
+Walks a directory tree, extracts metadata in parallel and writes results incrementally,
+keeping a checkpoint file so an interrupted run resumes where it stopped
+
+Usage:
+    python bulk_ingest.py /path/to/library -o results.jsonl --workers 8
+    python bulk_ingest.py /path/to/library -o results.csv --ai-key $GEMINI_API_KEY
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, TextIO
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'tif', 'tiff', 'bmp', 'webp'}
+
+
+def iter_image_files(root: str, extensions: Iterable[str] = IMAGE_EXTENSIONS,
+                     recursive: bool = True) -> Iterator[str]:
+    """Yield absolute paths of image files under root in a stable order"""
+    extensions = {ext.lower().lstrip('.') for ext in extensions}
+    stack = [os.path.abspath(root)]
+
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+        except OSError as e:
+            logger.warning(f"Skipping unreadable directory {directory}: {e}")
+            continue
+
+        subdirectories = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    subdirectories.append(entry.path)
+            elif entry.is_file() and entry.name.rsplit('.', 1)[-1].lower() in extensions:
+                yield entry.path
+
+        stack.extend(reversed(subdirectories))
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    """Return the set of image paths already recorded as processed"""
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, encoding='utf-8') as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+
+class ResultWriter:
+    """Appends batch results to a JSONL or CSV file as they arrive"""
+
+    def __init__(self, path: str, output_format: Optional[str] = None):
+        self.path = path
+        self.format = (output_format or os.path.splitext(path)[1].lstrip('.') or 'jsonl').lower()
+        if self.format not in ('jsonl', 'csv'):
+            raise ValueError(f"Unsupported output format: {self.format}")
+
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file: TextIO = open(path, 'a', newline='', encoding='utf-8')
+        self._csv = None
+
+        if self.format == 'csv':
+            from image_metadata_extractor import CsvReportWriter
+            self._csv = CsvReportWriter(self._file, write_header=is_new)
+
+    def write(self, result: Dict[str, Any]) -> None:
+        if self._csv is not None:
+            self._csv.write(result)
+        else:
+            self._file.write(json.dumps(result, default=str) + '\n')
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ProgressReporter:
+    """Prints throughput and ETA at a fixed interval"""
+
+    def __init__(self, total: int, already_done: int = 0, interval: float = 5.0, stream: TextIO = None):
+        self.total = total
+        self.already_done = already_done
+        self.interval = interval
+        self.stream = stream or sys.stderr
+        self.processed = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self._last_report = self.started
+
+    def update(self, success: bool) -> None:
+        self.processed += 1
+        if not success:
+            self.failed += 1
+        now = time.monotonic()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report()
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        rate = self.processed / elapsed
+        remaining = self.total - self.already_done - self.processed
+        return {
+            'processed': self.processed,
+            'failed': self.failed,
+            'skipped': self.already_done,
+            'total': self.total,
+            'elapsed_seconds': round(elapsed, 2),
+            'images_per_second': round(rate, 2),
+            'eta_seconds': round(remaining / rate, 1) if rate > 0 else None
+        }
+
+    def report(self) -> None:
+        stats = self.snapshot()
+        done = stats['skipped'] + stats['processed']
+        eta = f"{stats['eta_seconds']:.0f}s" if stats['eta_seconds'] is not None else "unknown"
+        print(
+            f"[{done}/{stats['total']}] {stats['images_per_second']:.2f} img/s, "
+            f"{stats['failed']} failed, ETA {eta}",
+            file=self.stream, flush=True
+        )
+
+
+def ingest(image_paths: List[str], extractor, writer: ResultWriter, checkpoint_path: Optional[str] = None,
+           workers: int = 4, force_refresh: bool = False, output_dir: Optional[str] = None,
+           reporter: Optional[ProgressReporter] = None, duplicate_index=None) -> Dict[str, Any]:
+    """Process images in parallel, writing each result and checkpointing it as soon as it completes
+
+    Results are written before the checkpoint entry, so an interrupted run never skips an image. On an
+    interrupt, queued images are cancelled and images already being processed are written and checkpointed.
+    """
+    done = load_checkpoint(checkpoint_path)
+    pending = [path for path in image_paths if path not in done]
+    reporter = reporter or ProgressReporter(total=len(image_paths), already_done=len(image_paths) - len(pending))
+    checkpoint = open(checkpoint_path, 'a', encoding='utf-8') if checkpoint_path else None
+    max_in_flight = max(1, workers) * 4
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    in_flight = set()
+
+    def record(result: Dict[str, Any]) -> None:
+        writer.write(result)
+        if checkpoint is not None:
+            checkpoint.write(result['image_path'] + '\n')
+            checkpoint.flush()
+        reporter.update(result.get('success', False))
+
+    try:
+        queue = iter(pending)
+        while True:
+            # Keep a bounded number of submitted images so memory stays flat on huge trees
+            for path in queue:
+                in_flight.add(pool.submit(extractor.process_image, path, output_dir, force_refresh,
+                                          duplicate_index))
+                if len(in_flight) >= max_in_flight:
+                    break
+            if not in_flight:
+                break
+
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                in_flight.discard(future)
+                record(future.result())
+        pool.shutdown()
+    except BaseException:
+        # On Ctrl-C drop the queued images, let the running ones finish and keep their (paid) results
+        pool.shutdown(wait=True, cancel_futures=True)
+        for future in in_flight:
+            if not future.cancelled() and future.exception() is None:
+                record(future.result())
+        raise
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+
+    reporter.report()
+    return reporter.snapshot()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Extract microstock metadata for every image in a directory tree")
+    parser.add_argument('root', help="Directory to scan for images")
+    parser.add_argument('-o', '--output', required=True, help="Results file (.jsonl or .csv)")
+    parser.add_argument('--format', choices=['jsonl', 'csv'], help="Override the format implied by --output")
+    parser.add_argument('--checkpoint', help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4, help="Parallel workers")
+    parser.add_argument('--ai-key', default=None, help="AI provider API key for keyword generation")
+    parser.add_argument('--ai-provider', default='gemini', help="AI provider (gemini or openai)")
+    parser.add_argument('--output-dir', default=None, help="Also write images with embedded metadata here")
+    parser.add_argument('--no-recursive', action='store_true', help="Only scan the top-level directory")
+    parser.add_argument('--no-cache', action='store_true', help="Disable the image analysis cache")
+    parser.add_argument('--force-refresh', action='store_true', help="Ignore cached analysis results")
+    parser.add_argument('--near-duplicate-threshold', type=int, default=None,
+                        help="Group near-identical frames within this perceptual-hash distance (default from config)")
+    parser.add_argument('--progress-interval', type=float, default=5.0, help="Seconds between progress lines")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    if not os.path.isdir(args.root):
+        print(f"❌ Not a directory: {args.root}", file=sys.stderr)
+        return 2
+
+    from analysis_cache import get_default_cache
+    from config import Config
+    from image_metadata_extractor import create_metadata_extractor
+
+    cache = None if args.no_cache else get_default_cache()
+    extractor = create_metadata_extractor(args.ai_key, args.ai_provider, cache=cache)
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint"
+
+    image_paths = list(iter_image_files(args.root, recursive=not args.no_recursive))
+    already_done = len(load_checkpoint(checkpoint_path).intersection(image_paths))
+    print(f"📁 Found {len(image_paths)} images, {already_done} already processed", file=sys.stderr)
+
+    threshold = args.near_duplicate_threshold
+    if threshold is None:
+        threshold = Config.NEAR_DUPLICATE_THRESHOLD
+    duplicate_index = extractor.create_duplicate_index(threshold)
+
+    writer = ResultWriter(args.output, args.format)
+    reporter = ProgressReporter(len(image_paths), already_done, interval=args.progress_interval)
+    try:
+        summary = ingest(image_paths, extractor, writer, checkpoint_path, args.workers,
+                         args.force_refresh, args.output_dir, reporter, duplicate_index)
+    except KeyboardInterrupt:
+        print("⏸️ Interrupted - rerun the same command to resume", file=sys.stderr)
+        return 130
+    finally:
+        writer.close()
+
+    print(f"✅ Done: {json.dumps(summary)}", file=sys.stderr)
+    if cache is not None:
+        print(f"📊 Cache: {json.dumps(cache.stats())}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
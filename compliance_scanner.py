@@ -0,0 +1,108 @@
+"""
+Forbidden-term compliance scanner for microstock metadata
+Avoid-list, trademark and platform-specific terms are compiled once into a first-word index, so
+each item's title, description and keywords are scanned in a single pass for every platform at once
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from microstock_templates import FORBIDDEN_TERMS, MICROSTOCK_AVOID
+
+SCANNED_FIELDS = ("title", "description", "keywords")
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+", re.IGNORECASE)
+
+
+def term_words(text: str) -> Tuple[str, ...]:
+    """Lowercase words of a term, ignoring spaces, hyphens and punctuation"""
+    return tuple(word.lower() for word in WORD_PATTERN.findall(text))
+
+
+class ComplianceScanner:
+    """Flags forbidden terms in metadata and attributes each finding to the platforms that forbid it"""
+
+    def __init__(self, platform_terms: Optional[Mapping[str, Iterable[str]]] = None,
+                 avoid_terms: Sequence[str] = MICROSTOCK_AVOID,
+                 trademark_terms: Sequence[str] = FORBIDDEN_TERMS):
+        # term words -> (source, platforms); an empty platform set means every platform forbids it
+        self.terms: Dict[Tuple[str, ...], tuple] = {}
+        for source, terms in (("avoid", avoid_terms), ("trademark", trademark_terms)):
+            for term in terms:
+                self.terms.setdefault(term_words(term), (source, frozenset()))
+        for platform, terms in (platform_terms or {}).items():
+            for term in terms:
+                key = term_words(term)
+                source, platforms = self.terms.get(key, ("platform", frozenset([platform])))
+                if platforms:
+                    self.terms[key] = (source, platforms | {platform})
+        self.terms.pop((), None)
+
+        # First word (and its plural forms for single-word terms) -> candidate terms, longest first,
+        # so "getty images" wins over "getty" and a text costs one dictionary lookup per word
+        self.index: Dict[str, List[Tuple[str, ...]]] = {}
+        for words in sorted(self.terms, key=len, reverse=True):
+            heads = [words[0]] + ([words[0] + "s", words[0] + "es"] if len(words) == 1 else [])
+            for head in heads:
+                self.index.setdefault(head, []).append(words)
+
+    @classmethod
+    def from_rules(cls, rules: Mapping[str, Any]) -> "ComplianceScanner":
+        """Build a scanner from a compiled PlatformRules registry"""
+        return cls({name: platform_rules.forbidden_terms for name, platform_rules in rules.items()})
+
+    @staticmethod
+    def _matches(tokens: List[str], start: int, words: Tuple[str, ...]) -> bool:
+        end = start + len(words)
+        if end > len(tokens):
+            return False
+        if len(words) > 1 and tokens[start:end - 1] != list(words[:-1]):
+            return False
+        last = tokens[end - 1]
+        return last == words[-1] or last == words[-1] + "s" or last == words[-1] + "es"
+
+    @staticmethod
+    def _span_text(text: str, start: int, end: int) -> str:
+        """Original text covering words start..end-1, for reporting the match as written"""
+        spans = [match.span() for match in WORD_PATTERN.finditer(text)]
+        return text[spans[start][0]:spans[end - 1][1]]
+
+    def scan(self, title: str = "", description: str = "", keywords: Any = "") -> List[Dict[str, Any]]:
+        """Return every forbidden term found in the item's text fields, once per term and field"""
+        if not isinstance(keywords, str):
+            keywords = ", ".join(str(kw) for kw in keywords or [])
+
+        findings = []
+        seen = set()
+        index = self.index
+        for field, text in zip(SCANNED_FIELDS, (title, description, keywords)):
+            if not text:
+                continue
+            tokens = WORD_PATTERN.findall(text.lower())
+            # Only words that start some forbidden term need a closer look
+            hits = [position for position, token in enumerate(tokens) if token in index]
+            consumed = 0
+            for position in hits:
+                if position < consumed:
+                    continue
+                words = next((w for w in index[tokens[position]] if self._matches(tokens, position, w)), None)
+                if words is None:
+                    continue
+                consumed = position + len(words)
+                if (words, field) in seen:
+                    continue
+                seen.add((words, field))
+                source, platforms = self.terms[words]
+                findings.append({
+                    "term": " ".join(words),
+                    "field": field,
+                    "match": self._span_text(text, position, consumed),
+                    "source": source,
+                    "platforms": sorted(platforms),
+                })
+        return findings
+
+    @staticmethod
+    def for_platform(findings: List[Dict[str, Any]], platform: str) -> List[Dict[str, Any]]:
+        """Findings that apply to one platform (common terms apply everywhere)"""
+        return [f for f in findings if not f["platforms"] or platform in f["platforms"]]
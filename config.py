@@ -13,6 +13,11 @@ class Config:
     # API Configuration
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+    # Alternative provider endpoints (e.g. the load-test stand-in in loadtest/fake_provider.py)
+    GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "")
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")
+    # Simulated latency of the offline "local" provider: fixed:MS, uniform:MIN,MAX, normal:MEAN,SD, lognormal:MEDIAN,SIGMA
+    LOCAL_PROVIDER_LATENCY = os.getenv("LOCAL_PROVIDER_LATENCY", "fixed:0")
     
     # Default Settings
     DEFAULT_PROVIDER = os.getenv("DEFAULT_PROVIDER", "gemini")
@@ -20,10 +25,84 @@ class Config:
     MAX_PROMPTS_PER_REQUEST = int(os.getenv("MAX_PROMPTS_PER_REQUEST", "10"))
     DEFAULT_DELAY_SECONDS = int(os.getenv("DEFAULT_DELAY_SECONDS", "3"))
     
+    # Image analysis cache
+    ANALYSIS_CACHE_ENABLED = os.getenv("ANALYSIS_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    # Relative paths are resolved against the app directory, not the working directory
+    ANALYSIS_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                       os.getenv("ANALYSIS_CACHE_PATH", "cache/analysis_cache.sqlite3"))
+    ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "10000"))
+    ANALYSIS_CACHE_MAX_MB = int(os.getenv("ANALYSIS_CACHE_MAX_MB", "256"))
+    
+    # Near-duplicate grouping: max Hamming distance between 64-bit perceptual hashes (-1 disables)
+    NEAR_DUPLICATE_THRESHOLD = int(os.getenv("NEAR_DUPLICATE_THRESHOLD", "6"))
+    
+    # Images keyworded per multi-image AI request in batch extraction (1 = one request per image)
+    AI_BATCH_SIZE = int(os.getenv("AI_BATCH_SIZE", "8"))
+    
+    # Storyboards longer than this many scenes are generated as parallel scene ranges
+    STORYBOARD_CHUNK_SCENES = int(os.getenv("STORYBOARD_CHUNK_SCENES", "8"))
+    STORYBOARD_MAX_PARALLEL = int(os.getenv("STORYBOARD_MAX_PARALLEL", "8"))
+    STORYBOARD_CHUNK_ATTEMPTS = int(os.getenv("STORYBOARD_CHUNK_ATTEMPTS", "2"))
+    
+    # Hedged requests: when the request has a key for another provider, a call slower than the primary's
+    # HEDGE_PERCENTILE latency (or failing) is raced against that provider
+    HEDGING_ENABLED = os.getenv("HEDGING_ENABLED", "true").lower() in ("1", "true", "yes")
+    # Backups use the keys a request sends in backup_api_keys; the server's own keys only when opted in
+    HEDGE_SERVER_KEYS = os.getenv("HEDGE_SERVER_KEYS", "false").lower() in ("1", "true", "yes")
+    HEDGE_PROVIDERS = [p.strip() for p in os.getenv("HEDGE_PROVIDERS", "gemini,openai").split(",") if p.strip()]
+    HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+    HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+    HEDGE_MIN_DELAY_SECONDS = float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "0.5"))
+    HEDGE_DEFAULT_DELAY_SECONDS = float(os.getenv("HEDGE_DEFAULT_DELAY_SECONDS", "8"))
+    # A provider is skipped while its circuit is open or its recent error rate is too high
+    ROUTER_CIRCUIT_FAILURES = int(os.getenv("ROUTER_CIRCUIT_FAILURES", "3"))
+    ROUTER_CIRCUIT_COOLDOWN_SECONDS = float(os.getenv("ROUTER_CIRCUIT_COOLDOWN_SECONDS", "30"))
+    ROUTER_MAX_ERROR_RATE = float(os.getenv("ROUTER_MAX_ERROR_RATE", "0.5"))
+    
+    # Output token caps per provider call (storyboards get at least 60 tokens per scene)
+    PROMPT_MAX_TOKENS = int(os.getenv("PROMPT_MAX_TOKENS", "150"))
+    STORYBOARD_MAX_TOKENS = int(os.getenv("STORYBOARD_MAX_TOKENS", "300"))
+    # Estimated-token budgets (0 = unlimited): a call's output cap shrinks to fit REQUEST_TOKEN_BUDGET
+    # (rejected below MIN_OUTPUT_TOKENS); a request's whole job is trimmed to fit JOB_TOKEN_BUDGET
+    REQUEST_TOKEN_BUDGET = int(os.getenv("REQUEST_TOKEN_BUDGET", "0"))
+    JOB_TOKEN_BUDGET = int(os.getenv("JOB_TOKEN_BUDGET", "0"))
+    MIN_OUTPUT_TOKENS = int(os.getenv("MIN_OUTPUT_TOKENS", "32"))
+    
+    # Send the invariant prompt instructions once as a condensed system instruction instead of in every prompt
+    COMPACT_PROMPTS = os.getenv("COMPACT_PROMPTS", "false").lower() in ("1", "true", "yes")
+    
+    # Identical concurrent generation requests share one provider call (singleflight.py)
+    COALESCING_ENABLED = os.getenv("COALESCING_ENABLED", "true").lower() in ("1", "true", "yes")
+
+    # Idle-time pre-generation of the most requested prompts with the server keys (pregeneration.py).
+    # The budget, demand counts and pool are per process: under prefork up to workers x PREGEN_TOKEN_BUDGET is spent
+    PREGEN_ENABLED = os.getenv("PREGEN_ENABLED", "false").lower() in ("1", "true", "yes")
+    PREGEN_TOKEN_BUDGET = int(os.getenv("PREGEN_TOKEN_BUDGET", "20000"))  # Estimated tokens per hour
+    PREGEN_PER_SPEC = int(os.getenv("PREGEN_PER_SPEC", "3"))
+    PREGEN_BATCH = int(os.getenv("PREGEN_BATCH", "5"))
+    PREGEN_MAX_TRACKED = int(os.getenv("PREGEN_MAX_TRACKED", "500"))
+    PREGEN_IDLE_SECONDS = float(os.getenv("PREGEN_IDLE_SECONDS", "5"))
+    PREGEN_INTERVAL_SECONDS = float(os.getenv("PREGEN_INTERVAL_SECONDS", "10"))
+    PREGEN_TTL_SECONDS = float(os.getenv("PREGEN_TTL_SECONDS", "86400"))
+    # Serve each pre-generated prompt once, so no two users receive the same text
+    PREGEN_UNIQUE = os.getenv("PREGEN_UNIQUE", "true").lower() in ("1", "true", "yes")
+    
+    # Worker threads for Flask routes and sync provider calls under the ASGI entry point (asgi_app.py)
+    ASGI_THREAD_POOL_SIZE = int(os.getenv("ASGI_THREAD_POOL_SIZE", "64"))
+    
+    # Prefork production launcher (prefork.py)
+    PREFORK_HOST = os.getenv("PREFORK_HOST", "0.0.0.0")
+    PREFORK_PORT = int(os.getenv("PREFORK_PORT", "5000"))
+    PREFORK_WORKERS = int(os.getenv("PREFORK_WORKERS", str(os.cpu_count() or 1)))
+    PREFORK_MAX_REQUESTS = int(os.getenv("PREFORK_MAX_REQUESTS", "1000"))
+    PREFORK_MAX_REQUESTS_JITTER = int(os.getenv("PREFORK_MAX_REQUESTS_JITTER", "100"))
+    PREFORK_GRACEFUL_TIMEOUT = float(os.getenv("PREFORK_GRACEFUL_TIMEOUT", "30"))
+    
     # Model mappings
     PROVIDER_MODELS = {
         "gemini": ["gemini-2.5-flash", "gemini-1.5-pro"],
-        "openai": ["gpt-3.5-turbo", "gpt-4", "gpt-4-turbo"]
+        "openai": ["gpt-3.5-turbo", "gpt-4", "gpt-4-turbo"],
+        "local": ["local"]
     }
     
     # Aspect ratio options
@@ -39,9 +118,16 @@ class Config:
             return cls.GEMINI_API_KEY
         elif provider.lower() == "openai":
             return cls.OPENAI_API_KEY
+        elif provider.lower() == "local":
+            return ""
         else:
             raise ValueError(f"Unknown provider: {provider}")
     
+    @classmethod
+    def requires_api_key(cls, provider: str) -> bool:
+        """Whether the provider needs an API key (the offline local provider does not)"""
+        return (provider or "").lower() != "local"
+    
     @classmethod
     def get_models_for_provider(cls, provider: str) -> list:
         """Get available models for specified provider"""
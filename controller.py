@@ -1,8 +1,16 @@
 
+import asyncio
 import logging
 import json
-from typing import Optional, Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, AsyncIterator, Iterable, Iterator, List, Tuple
 from enum import Enum
+from config import Config
+from json_extract import JsonStreamExtractor, extract_json
+from local_provider import LocalProvider
+from token_estimator import (TokenBudgetExceeded, estimate_tokens, fit_output_tokens, prompt_token_stats,
+                             token_ledger)
 from microstock_templates import (
     get_microstock_enhancements,
     build_microstock_prompt_enhancement,
@@ -10,23 +18,53 @@ from microstock_templates import (
 )
 import random
 
-try:  # Optional dependency used in tests
-    import google.generativeai as genai  # type: ignore
-except Exception:  # pragma: no cover - library may not be installed
-    class _GenAIStub:  # pragma: no cover - minimal stub for tests
-        class GenerativeModel:  # noqa: D401 - simple stand-in
-            pass
+# Provider SDKs are heavy to import and most requests never touch them, so they are
+# loaded on first use by _load_genai()/_load_openai().  Tests patch these names directly.
+genai = None
+openai = None
 
-        @staticmethod
-        def configure(*args, **kwargs):  # noqa: D401 - simple stand-in
+
+class _GenAIStub:  # pragma: no cover - minimal stub for tests
+    class GenerativeModel:  # noqa: D401 - simple stand-in
+        pass
+
+    @staticmethod
+    def configure(*args, **kwargs):  # noqa: D401 - simple stand-in
+        return None
+
+
+def _load_genai():
+    """Import google.generativeai on first use, falling back to a stub if it is missing"""
+    global genai
+    if genai is None:
+        try:
+            import google.generativeai as genai_module  # type: ignore
+        except Exception:  # pragma: no cover - library may not be installed
+            genai_module = _GenAIStub()
+        genai = genai_module
+    return genai
+
+
+def _load_openai():
+    """Import openai on first use, returning None if it is missing"""
+    global openai
+    if openai is None:
+        try:
+            import openai as openai_module  # type: ignore
+        except Exception:  # pragma: no cover - library may not be installed
             return None
+        openai = openai_module
+    return openai
 
-    genai = _GenAIStub()
 
-try:  # Optional dependency used in tests
-    import openai  # type: ignore
-except Exception:  # pragma: no cover - library may not be installed
-    openai = None
+def _openai_errors() -> tuple:
+    """OpenAI exception classes worth translating, empty until the SDK has been loaded"""
+    if openai is None:
+        return ()
+    return tuple(
+        error for error in (getattr(openai, name, None) for name in ("APIError", "RateLimitError", "AuthenticationError"))
+        if isinstance(error, type) and issubclass(error, BaseException)
+    )
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -34,30 +72,97 @@ logger = logging.getLogger(__name__)
 class AIProvider(Enum):
     GEMINI = "gemini"
     OPENAI = "openai"
+    LOCAL = "local"
+
+OPENAI_CHAT_MODEL = "gpt-3.5-turbo"
+MIDJOURNEY_SYSTEM_PROMPT = "You are an expert at creating Midjourney prompts for microstock photography."
+FLUX_SYSTEM_PROMPT = ("You are an expert at creating FLUX1.dev Stable Diffusion prompts for microstock photography. "
+                      "NEVER include Midjourney parameters like --ar, --v, --zoom, --style, --chaos, etc.")
+STORYBOARD_SYSTEM_PROMPT = "You are an expert video storyboard generator."
+# Compact mode (Config.COMPACT_PROMPTS): the invariant instructions of _build_prompt/_build_flux_prompt,
+# condensed and sent as the system instruction so each call only carries the request's own fields
+_COMPACT_RULES = (
+    "Apply these microstock rules: use the trending and top-selling keywords given; high commercial value, "
+    "broadly usable, premium quality; diverse, inclusive people (age, ethnicity, gender); studio lighting, "
+    "strong composition, sharp focus; no text, logos, brands or copyrighted material; modern, evergreen, "
+    "advertising-ready and brand-safe; suits websites, ads, presentations and social media."
+)
+MIDJOURNEY_COMPACT_SYSTEM_PROMPT = (
+    f"{MIDJOURNEY_SYSTEM_PROMPT} Each request lists a subject, category and details. Write one concise Midjourney "
+    f"prompt for a bestselling microstock image, leaving negative space for text where it fits. {_COMPACT_RULES}"
+)
+FLUX_COMPACT_SYSTEM_PROMPT = (
+    f"{FLUX_SYSTEM_PROMPT} Each request lists a subject, category and details. Write one concise, purely descriptive "
+    f"prompt for a bestselling microstock image, including photorealistic, detailed, sharp focus, high resolution. "
+    f"{_COMPACT_RULES}"
+)
+# Output budget per scene for storyboards, so a long one is never cut off mid-JSON
+STORYBOARD_TOKENS_PER_SCENE = 60
+
+
+def storyboard_chunks(num_scenes: int, chunk_size: int) -> List[Tuple[int, int]]:
+    """Split scenes 1..num_scenes into inclusive (first, last) ranges of at most chunk_size scenes"""
+    chunk_size = max(1, chunk_size)
+    return [(first, min(first + chunk_size - 1, num_scenes)) for first in range(1, num_scenes + 1, chunk_size)]
+
+
+def reported_tokens(usage: Any) -> Tuple[Optional[int], Optional[int]]:
+    """(input, output) token counts from an OpenAI or Gemini usage object, or None where not reported"""
+    for input_name, output_name in (("prompt_tokens", "completion_tokens"),
+                                    ("prompt_token_count", "candidates_token_count")):
+        actual_input = getattr(usage, input_name, None)
+        if isinstance(actual_input, int):
+            actual_output = getattr(usage, output_name, None)
+            return actual_input, actual_output if isinstance(actual_output, int) else None
+    return None, None
+
+
+def number_scenes(scenes: Any, first: int, last: int) -> List[Dict[str, Any]]:
+    """Renumber a chunk's scenes into its range, dropping any beyond it"""
+    if not isinstance(scenes, list):
+        raise ValueError("Storyboard chunk is not a JSON list")
+    return [dict(scene, scene=first + i) if isinstance(scene, dict) else {"scene": first + i, "prompt": str(scene)}
+            for i, scene in enumerate(scenes[:last - first + 1])]
+
 
 class PrompterGenerator:
     """
     Enhanced prompt generator supporting multiple AI providers
     """
-    def __init__(self, api_key: str = None, model_name: str = "gemini-1.5-pro", provider: str = "gemini"):
-        if not api_key:
+    def __init__(self, api_key: str = None, model_name: str = "gemini-1.5-pro", provider: str = "gemini",
+                 compact_prompts: Optional[bool] = None, max_tokens: Optional[int] = None):
+        if not api_key and Config.requires_api_key(provider):
             raise ValueError("Error: Please provide an API key")
         
         self.api_key = api_key
         self.model_name = model_name
         self.provider = AIProvider(provider.lower())
+        self.compact_prompts = Config.COMPACT_PROMPTS if compact_prompts is None else compact_prompts
+        # Output token cap for prompt generations, overriding PROMPT_MAX_TOKENS
+        self.max_tokens = max_tokens
+        self._async_client = None
+        self._gemini_models: Dict[str, Any] = {}
 
         try:
             if self.provider == AIProvider.GEMINI:
-                if genai is None:
+                gemini_sdk = _load_genai()
+                if gemini_sdk is None:
                     raise ImportError("google-generativeai library is required for Gemini provider")
-                genai.configure(api_key=self.api_key)
-                self.model = genai.GenerativeModel(model_name=self.model_name)
+                if Config.GEMINI_BASE_URL:
+                    # Custom endpoints (e.g. loadtest/fake_provider.py) speak the REST API
+                    gemini_sdk.configure(api_key=self.api_key, transport="rest",
+                                         client_options={"api_endpoint": Config.GEMINI_BASE_URL})
+                else:
+                    gemini_sdk.configure(api_key=self.api_key)
+                self.model = gemini_sdk.GenerativeModel(model_name=self.model_name)
             elif self.provider == AIProvider.OPENAI:
-                if openai is None or not hasattr(openai, "OpenAI"):
+                openai_sdk = _load_openai()
+                if openai_sdk is None or not hasattr(openai_sdk, "OpenAI"):
                     raise ImportError("openai library is required for OpenAI provider")
-                openai.api_key = self.api_key
-                self.client = openai.OpenAI(api_key=self.api_key)
+                openai_sdk.api_key = self.api_key
+                self.client = openai_sdk.OpenAI(api_key=self.api_key, **self._openai_options())
+            elif self.provider == AIProvider.LOCAL:
+                self.local = LocalProvider(Config.LOCAL_PROVIDER_LATENCY)
         except Exception as e:
             logger.error(f"Failed to initialize {self.provider.value} client: {e}")
             raise
@@ -72,29 +177,265 @@ class PrompterGenerator:
         if not main_base.strip():
             raise ValueError("Main base cannot be empty")
         
-        try:
-            create_prompt = self._build_prompt(main_base, image_style, theme, elements, 
-                                             emotional, color, image_detail, aspect)
-            
-            if self.provider == AIProvider.GEMINI:
-                response = self.model.generate_content(create_prompt)
-                return {"text": response.text, "provider": "gemini"}
-            elif self.provider == AIProvider.OPENAI:
-                response = self.client.chat.completions.create(
-                    model="gpt-3.5-turbo",
+        with self._provider_errors("prompt"):
+            create_prompt, system_prompt, usage = self._midjourney_request(
+                main_base, image_style, theme, elements, emotional, color, image_detail, aspect)
+            text = self._complete(create_prompt, system_prompt, max_tokens=self._prompt_max_tokens())
+            return {"text": text, "provider": self.provider.value, "usage": usage}
+
+    def stream_prompt_generator(self, main_base: str, image_style: str = "Photography",
+                                theme: Optional[str] = None, elements: Optional[str] = None,
+                                emotional: Optional[str] = None, color: Optional[str] = None,
+                                image_detail: Optional[str] = None, aspect: Optional[str] = None) -> Iterator[str]:
+        """prompt_generator that yields the raw reply text in chunks as the provider produces them"""
+        if not main_base.strip():
+            raise ValueError("Main base cannot be empty")
+
+        create_prompt, system_prompt, _usage = self._midjourney_request(
+            main_base, image_style, theme, elements, emotional, color, image_detail, aspect)
+        return self._stream_text(create_prompt, system_prompt, self._prompt_max_tokens(), "prompt")
+
+    async def aprompt_generator(self, main_base: str, image_style: str = "Photography",
+                                theme: Optional[str] = None, elements: Optional[str] = None,
+                                emotional: Optional[str] = None, color: Optional[str] = None,
+                                image_detail: Optional[str] = None, aspect: Optional[str] = None) -> Dict[str, Any]:
+        """Async prompt_generator: awaits the provider instead of blocking the calling thread"""
+        if not main_base.strip():
+            raise ValueError("Main base cannot be empty")
+
+        with self._provider_errors("prompt"):
+            create_prompt, system_prompt, usage = self._midjourney_request(
+                main_base, image_style, theme, elements, emotional, color, image_detail, aspect)
+            text = await self._acomplete(create_prompt, system_prompt, max_tokens=self._prompt_max_tokens())
+            return {"text": text, "provider": self.provider.value, "usage": usage}
+
+    def _complete(self, prompt: str, system_prompt: str, max_tokens: int) -> str:
+        """Send one text prompt to the configured provider and return the reply text"""
+        estimated, max_tokens = self._budget_call(prompt, system_prompt, max_tokens)
+        text, usage = self._send(prompt, system_prompt, max_tokens)
+        self._record_call(estimated, max_tokens, usage)
+        return text
+
+    def _send(self, prompt: str, system_prompt: str, max_tokens: int) -> Tuple[str, Any]:
+        """The provider call behind _complete: the reply text and the response's token usage, if any"""
+        if self.provider == AIProvider.GEMINI:
+            response = self._gemini(system_prompt).generate_content(
+                prompt, generation_config=self._gemini_config(max_tokens))
+            return response.text, getattr(response, "usage_metadata", None)
+        if self.provider == AIProvider.LOCAL:
+            return self.local.generate(prompt), None
+        response = self.client.chat.completions.create(
+            model=OPENAI_CHAT_MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=max_tokens,
+            temperature=0.7
+        )
+        return response.choices[0].message.content, getattr(response, "usage", None)
+
+    def _stream(self, prompt: str, system_prompt: str, max_tokens: int) -> Iterator[str]:
+        """_complete through the provider's streaming API, yielding text chunks as they arrive"""
+        estimated, max_tokens = self._budget_call(prompt, system_prompt, max_tokens)
+        if self.provider == AIProvider.LOCAL:
+            yield from self.local.stream(prompt)
+        elif self.provider == AIProvider.GEMINI:
+            for chunk in self._gemini(system_prompt).generate_content(
+                    prompt, stream=True, generation_config=self._gemini_config(max_tokens)):
+                # Chunks without text parts (e.g. a final finish-reason chunk) raise on .text
+                if chunk.parts:
+                    yield chunk.text
+        else:
+            response = self.client.chat.completions.create(
+                model=OPENAI_CHAT_MODEL,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=max_tokens,
+                temperature=0.7,
+                stream=True
+            )
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        self._record_call(estimated, max_tokens, None)
+
+    def _stream_text(self, prompt: str, system_prompt: str, max_tokens: int, task: str) -> Iterator[str]:
+        with self._provider_errors(task):
+            yield from self._stream(prompt, system_prompt, max_tokens)
+
+    async def _acomplete(self, prompt: str, system_prompt: str, max_tokens: int) -> str:
+        """Async _complete"""
+        estimated, max_tokens = self._budget_call(prompt, system_prompt, max_tokens)
+        text, usage = await self._asend(prompt, system_prompt, max_tokens)
+        self._record_call(estimated, max_tokens, usage)
+        return text
+
+    async def _asend(self, prompt: str, system_prompt: str, max_tokens: int) -> Tuple[str, Any]:
+        """Async _send using the SDKs' native async clients, else the sync call in a worker thread"""
+        if self.provider == AIProvider.LOCAL:
+            return await self.local.agenerate(prompt), None
+        # The Gemini SDK's async client is gRPC-only, so custom REST endpoints use a worker thread
+        if (self.provider == AIProvider.GEMINI and not Config.GEMINI_BASE_URL
+                and hasattr(self._gemini(system_prompt), "generate_content_async")):
+            response = await self._gemini(system_prompt).generate_content_async(
+                prompt, generation_config=self._gemini_config(max_tokens))
+            return response.text, getattr(response, "usage_metadata", None)
+        if self.provider == AIProvider.OPENAI:
+            client = self._get_async_client()
+            if client is not None:
+                response = await client.chat.completions.create(
+                    model=OPENAI_CHAT_MODEL,
                     messages=[
-                        {"role": "system", "content": "You are an expert at creating Midjourney prompts for microstock photography."},
-                        {"role": "user", "content": create_prompt}
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": prompt}
                     ],
-                    max_tokens=150,
+                    max_tokens=max_tokens,
                     temperature=0.7
                 )
-                return {"text": response.choices[0].message.content, "provider": "openai"}
-        except (openai.APIError, openai.RateLimitError, openai.AuthenticationError) as e:
+                return response.choices[0].message.content, getattr(response, "usage", None)
+        return await asyncio.to_thread(self._send, prompt, system_prompt, max_tokens)
+
+    def _sends_system_prompt(self) -> bool:
+        # Gemini only receives a system instruction in compact mode; the local provider never does
+        return self.provider == AIProvider.OPENAI or (self.provider == AIProvider.GEMINI and self.compact_prompts)
+
+    def _estimate_input(self, prompt: str, system_prompt: str) -> int:
+        return estimate_tokens(prompt) + (estimate_tokens(system_prompt) if self._sends_system_prompt() else 0)
+
+    def _budget_call(self, prompt: str, system_prompt: str, max_tokens: int) -> Tuple[int, int]:
+        """Estimated input tokens of a call and its output cap, shrunk to REQUEST_TOKEN_BUDGET
+
+        Raises TokenBudgetExceeded when even MIN_OUTPUT_TOKENS of output would not fit.
+        """
+        estimated = self._estimate_input(prompt, system_prompt)
+        return estimated, fit_output_tokens(estimated, max_tokens, Config.REQUEST_TOKEN_BUDGET,
+                                            Config.MIN_OUTPUT_TOKENS)
+
+    def _gemini_config(self, max_tokens: int) -> Dict[str, Any]:
+        """Gemini generation config: the fitted cap only when a request max_tokens or REQUEST_TOKEN_BUDGET asks for one
+
+        Thinking models (gemini-2.5-*) count their thinking against max_output_tokens, so the default
+        caps alone would cut most answers off.
+        """
+        if self.max_tokens or Config.REQUEST_TOKEN_BUDGET:
+            return {"max_output_tokens": max_tokens}
+        return {}
+
+    def _record_call(self, estimated: int, max_tokens: int, usage: Any):
+        actual_input, actual_output = reported_tokens(usage)
+        token_ledger.record(self.provider.value, estimated, max_tokens, actual_input, actual_output)
+
+    def _prompt_max_tokens(self) -> int:
+        return self.max_tokens or Config.PROMPT_MAX_TOKENS
+
+    @staticmethod
+    def _storyboard_max_tokens(num_scenes: int) -> int:
+        return max(Config.STORYBOARD_MAX_TOKENS, num_scenes * STORYBOARD_TOKENS_PER_SCENE)
+
+    def estimate_call_tokens(self, method: str, **kwargs) -> int:
+        """Estimated input plus output-cap tokens of one generation call, without sending it
+
+        method is a sync generator name; a chunked storyboard counts all of its chunk calls.
+        """
+        if method == "prompt_generator":
+            prompt, system_prompt, _usage = self._midjourney_request(record=False, **kwargs)
+            return self._estimate_input(prompt, system_prompt) + self._prompt_max_tokens()
+        if method == "flux_prompt_generator":
+            prompt, system_prompt, _usage = self._flux_request(record=False, **kwargs)
+            return self._estimate_input(prompt, system_prompt) + self._prompt_max_tokens()
+        if method == "storyboard_generator":
+            context, keywords, num_scenes = kwargs["context"], kwargs["keywords"], kwargs["num_scenes"]
+            chunk_size = kwargs.get("chunk_size") or Config.STORYBOARD_CHUNK_SCENES
+            ranges = storyboard_chunks(num_scenes, chunk_size) if num_scenes > chunk_size else [(1, None)]
+            return sum(self._estimate_input(self._build_storyboard_prompt(context, keywords, num_scenes, first, last),
+                                            STORYBOARD_SYSTEM_PROMPT)
+                       + self._storyboard_max_tokens((last or num_scenes) - first + 1)
+                       for first, last in ranges)
+        return 0  # Built locally (e.g. Imagen prompts), no provider call
+
+    def _gemini(self, system_prompt: str):
+        """The Gemini model; in compact mode one per system prompt, which it carries as its system instruction"""
+        if not self.compact_prompts:
+            return self.model
+        if system_prompt not in self._gemini_models:
+            self._gemini_models[system_prompt] = _load_genai().GenerativeModel(
+                model_name=self.model_name, system_instruction=system_prompt)
+        return self._gemini_models[system_prompt]
+
+    def _midjourney_request(self, main_base: str, image_style: str = "Photography", theme: Optional[str] = None,
+                            elements: Optional[str] = None, emotional: Optional[str] = None,
+                            color: Optional[str] = None, image_detail: Optional[str] = None,
+                            aspect: Optional[str] = None, record: bool = True) -> Tuple[str, str, Dict[str, int]]:
+        """Prompt, system prompt and input-token report for one Midjourney generation"""
+        full_prompt = self._build_prompt(main_base, image_style, theme, elements, emotional, color, image_detail, aspect)
+        if not self.compact_prompts:
+            return full_prompt, MIDJOURNEY_SYSTEM_PROMPT, self._input_tokens(
+                full_prompt, MIDJOURNEY_SYSTEM_PROMPT, full_prompt, MIDJOURNEY_SYSTEM_PROMPT, record)
+        create_prompt = self._build_compact_prompt("Midjourney", main_base, image_style, theme, elements,
+                                                   emotional, color, image_detail, aspect=aspect)
+        return create_prompt, MIDJOURNEY_COMPACT_SYSTEM_PROMPT, self._input_tokens(
+            create_prompt, MIDJOURNEY_COMPACT_SYSTEM_PROMPT, full_prompt, MIDJOURNEY_SYSTEM_PROMPT, record)
+
+    def _flux_request(self, main_base: str, image_style: str = "Photography", theme: Optional[str] = None,
+                      elements: Optional[str] = None, emotional: Optional[str] = None,
+                      color: Optional[str] = None, image_detail: Optional[str] = None,
+                      lighting: Optional[str] = None, composition: Optional[str] = None,
+                      record: bool = True) -> Tuple[str, str, Dict[str, int]]:
+        """Prompt, system prompt and input-token report for one FLUX generation"""
+        full_prompt = self._build_flux_prompt(main_base, image_style, theme, elements, emotional, color,
+                                              image_detail, lighting, composition)
+        if not self.compact_prompts:
+            return full_prompt, FLUX_SYSTEM_PROMPT, self._input_tokens(
+                full_prompt, FLUX_SYSTEM_PROMPT, full_prompt, FLUX_SYSTEM_PROMPT, record)
+        create_prompt = self._build_compact_prompt("FLUX1.dev", main_base, image_style, theme, elements,
+                                                   emotional, color, image_detail, lighting, composition)
+        return create_prompt, FLUX_COMPACT_SYSTEM_PROMPT, self._input_tokens(
+            create_prompt, FLUX_COMPACT_SYSTEM_PROMPT, full_prompt, FLUX_SYSTEM_PROMPT, record)
+
+    def _input_tokens(self, prompt: str, system_prompt: str, full_prompt: str, full_system_prompt: str,
+                      record: bool = True) -> Dict[str, int]:
+        """Estimated input tokens of this call and of the same call with the full instruction prompt"""
+        system_tokens = estimate_tokens(system_prompt) if self._sends_system_prompt() else 0
+        usage = {
+            "input_tokens": estimate_tokens(prompt) + system_tokens,
+            "system_tokens": system_tokens,
+            "full_input_tokens": estimate_tokens(full_prompt)
+            + (estimate_tokens(full_system_prompt) if self.provider == AIProvider.OPENAI else 0),
+        }
+        if record:
+            prompt_token_stats.record(usage["input_tokens"], usage["full_input_tokens"])
+        return usage
+
+    def _get_async_client(self):
+        """AsyncOpenAI client created on first async call, or None if the SDK has none"""
+        if self._async_client is None:
+            openai_sdk = _load_openai()
+            if openai_sdk is not None and hasattr(openai_sdk, "AsyncOpenAI"):
+                self._async_client = openai_sdk.AsyncOpenAI(api_key=self.api_key, **self._openai_options())
+        return self._async_client
+
+    @staticmethod
+    def _openai_options() -> Dict[str, Any]:
+        return {"base_url": Config.OPENAI_BASE_URL} if Config.OPENAI_BASE_URL else {}
+
+    @contextmanager
+    def _provider_errors(self, task: str):
+        """Log provider failures and re-raise them as ValueError"""
+        try:
+            yield
+        except TokenBudgetExceeded:
+            raise
+        except json.JSONDecodeError as e:
+            logger.error(f"Invalid JSON from {self.provider.value}: {e}")
+            raise ValueError("Invalid response format from model") from e
+        except _openai_errors() as e:
             logger.error(f"OpenAI API error: {e}")
             raise ValueError(f"OpenAI API error: {e}") from e
         except Exception as e:
-            logger.error(f"Error generating prompt with {self.provider.value}: {e}")
+            logger.error(f"Error generating {task} with {self.provider.value}: {e}")
             raise ValueError(f"An unexpected error occurred: {e}") from e
     
     def _build_prompt(self, main_base: str, image_style: str, theme: Optional[str], 
@@ -171,31 +512,66 @@ class PrompterGenerator:
         if not main_base.strip():
             raise ValueError("Main base cannot be empty")
         
-        try:
-            create_prompt = self._build_flux_prompt(main_base, image_style, theme, elements, 
-                                                  emotional, color, image_detail, lighting, composition)
-            
-            if self.provider == AIProvider.GEMINI:
-                response = self.model.generate_content(create_prompt)
-                return {"text": response.text, "provider": "gemini"}
-            elif self.provider == AIProvider.OPENAI:
-                response = self.client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": "You are an expert at creating FLUX1.dev Stable Diffusion prompts for microstock photography. NEVER include Midjourney parameters like --ar, --v, --zoom, --style, --chaos, etc."},
-                        {"role": "user", "content": create_prompt}
-                    ],
-                    max_tokens=150,
-                    temperature=0.7
-                )
-                return {"text": response.choices[0].message.content, "provider": "openai"}
-        except (openai.APIError, openai.RateLimitError, openai.AuthenticationError) as e:
-            logger.error(f"OpenAI API error: {e}")
-            raise ValueError(f"OpenAI API error: {e}") from e
-        except Exception as e:
-            logger.error(f"Error generating FLUX prompt with {self.provider.value}: {e}")
-            raise ValueError(f"An unexpected error occurred: {e}") from e
+        with self._provider_errors("FLUX prompt"):
+            create_prompt, system_prompt, usage = self._flux_request(
+                main_base, image_style, theme, elements, emotional, color, image_detail, lighting, composition)
+            text = self._complete(create_prompt, system_prompt, max_tokens=self._prompt_max_tokens())
+            return {"text": text, "provider": self.provider.value, "usage": usage}
+
+    def stream_flux_prompt_generator(self, main_base: str, image_style: str = "Photography",
+                                     theme: Optional[str] = None, elements: Optional[str] = None,
+                                     emotional: Optional[str] = None, color: Optional[str] = None,
+                                     image_detail: Optional[str] = None, lighting: Optional[str] = None,
+                                     composition: Optional[str] = None) -> Iterator[str]:
+        """flux_prompt_generator that yields the raw reply text in chunks as the provider produces them"""
+        if not main_base.strip():
+            raise ValueError("Main base cannot be empty")
+
+        create_prompt, system_prompt, _usage = self._flux_request(
+            main_base, image_style, theme, elements, emotional, color, image_detail, lighting, composition)
+        return self._stream_text(create_prompt, system_prompt, self._prompt_max_tokens(), "FLUX prompt")
+
+    async def aflux_prompt_generator(self, main_base: str, image_style: str = "Photography",
+                                     theme: Optional[str] = None, elements: Optional[str] = None,
+                                     emotional: Optional[str] = None, color: Optional[str] = None,
+                                     image_detail: Optional[str] = None, lighting: Optional[str] = None,
+                                     composition: Optional[str] = None) -> Dict[str, Any]:
+        """Async flux_prompt_generator"""
+        if not main_base.strip():
+            raise ValueError("Main base cannot be empty")
+
+        with self._provider_errors("FLUX prompt"):
+            create_prompt, system_prompt, usage = self._flux_request(
+                main_base, image_style, theme, elements, emotional, color, image_detail, lighting, composition)
+            text = await self._acomplete(create_prompt, system_prompt, max_tokens=self._prompt_max_tokens())
+            return {"text": text, "provider": self.provider.value, "usage": usage}
     
+    def _build_compact_prompt(self, target: str, main_base: str, image_style: str, theme: Optional[str],
+                              elements: Optional[str], emotional: Optional[str], color: Optional[str],
+                              image_detail: Optional[str], lighting: Optional[str] = None,
+                              composition: Optional[str] = None, aspect: Optional[str] = None) -> str:
+        """
+        Per-request part of _build_prompt/_build_flux_prompt; the rules are in the compact system prompt
+        """
+        category = self._detect_category(main_base, theme, elements)
+        microstock_data = get_microstock_enhancements(category)
+        top_selling = INDUSTRY_KEYWORDS.get(category, [])
+        lines = [
+            f"{target} {image_style} prompt, {category} industry",
+            f"CORE SUBJECT: {main_base}",
+            f"TRENDING KEYWORDS: Include {', '.join(microstock_data['keywords'][:5])}",
+            f"SCENARIOS: {', '.join(microstock_data['scenarios'][:3])}",
+            f"LIGHTING: {lighting or microstock_data['lighting']}",
+            f"COMPOSITION: {composition or microstock_data['composition']}",
+        ]
+        if top_selling:
+            lines.insert(3, f"TOP SELLING: {', '.join(random.sample(top_selling, min(3, len(top_selling))))}")
+        for label, value in (("THEME", theme), ("ELEMENTS", elements), ("EMOTION", emotional),
+                             ("COLORS", color), ("DETAILS", image_detail), ("FORMAT", aspect)):
+            if value:
+                lines.append(f"{label}: {value}")
+        return "\n".join(lines)
+
     def _build_flux_prompt(self, main_base: str, image_style: str, theme: Optional[str], 
                           elements: Optional[str], emotional: Optional[str], color: Optional[str], 
                           image_detail: Optional[str], lighting: Optional[str], composition: Optional[str]) -> str:
@@ -266,8 +642,148 @@ f"• PROFESSIONAL QUALITY: Studio lighting, perfect composition, sharp focus\n"
         
         return create_prompt
 
-    def storyboard_generator(self, context: str, keywords: List[str], num_scenes: int) -> Dict[str, Any]:
-        """Generate storyboard scene prompts for video creation."""
+    def storyboard_generator(self, context: str, keywords: List[str], num_scenes: int,
+                             chunk_size: Optional[int] = None) -> Dict[str, Any]:
+        """Generate storyboard scene prompts for video creation.
+
+        Storyboards longer than chunk_size scenes are generated as parallel scene ranges and merged in order.
+        """
+        if num_scenes > (chunk_size or Config.STORYBOARD_CHUNK_SCENES):
+            return self._merge_storyboard(self.iter_storyboard_chunks(context, keywords, num_scenes, chunk_size))
+
+        create_prompt = self._build_storyboard_prompt(context, keywords, num_scenes)
+
+        with self._provider_errors("storyboard"):
+            text = self._complete(create_prompt, STORYBOARD_SYSTEM_PROMPT,
+                                  max_tokens=self._storyboard_max_tokens(num_scenes))
+            scenes = extract_json(text, list)
+            return {"scenes": scenes, "provider": self.provider.value}
+
+    async def astoryboard_generator(self, context: str, keywords: List[str], num_scenes: int,
+                                    chunk_size: Optional[int] = None) -> Dict[str, Any]:
+        """Async storyboard_generator"""
+        if num_scenes > (chunk_size or Config.STORYBOARD_CHUNK_SCENES):
+            chunks = self.aiter_storyboard_chunks(context, keywords, num_scenes, chunk_size)
+            return self._merge_storyboard([chunk async for chunk in chunks])
+
+        create_prompt = self._build_storyboard_prompt(context, keywords, num_scenes)
+
+        with self._provider_errors("storyboard"):
+            text = await self._acomplete(create_prompt, STORYBOARD_SYSTEM_PROMPT,
+                                         max_tokens=self._storyboard_max_tokens(num_scenes))
+            scenes = extract_json(text, list)
+            return {"scenes": scenes, "provider": self.provider.value}
+
+    def stream_storyboard_generator(self, context: str, keywords: List[str], num_scenes: int) -> Iterator[Dict[str, Any]]:
+        """storyboard_generator in one streamed call, yielding each scene as soon as its JSON is complete"""
+        create_prompt = self._build_storyboard_prompt(context, keywords, num_scenes)
+        return self._stream_scenes(create_prompt, num_scenes)
+
+    def _stream_scenes(self, create_prompt: str, num_scenes: int) -> Iterator[Dict[str, Any]]:
+        extractor = JsonStreamExtractor()
+        count = 0
+        with self._provider_errors("storyboard"):
+            for text in self._stream(create_prompt, STORYBOARD_SYSTEM_PROMPT, self._storyboard_max_tokens(num_scenes)):
+                for scene in number_scenes(extractor.feed(text), count + 1, num_scenes):
+                    count += 1
+                    yield scene
+            for scene in number_scenes(extractor.close(), count + 1, num_scenes):
+                count += 1
+                yield scene
+            if not count:
+                raise ValueError("No scenes found in the model output")
+
+    def iter_storyboard_chunks(self, context: str, keywords: List[str], num_scenes: int,
+                               chunk_size: Optional[int] = None,
+                               max_parallel: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Generate a storyboard as parallel scene ranges, yielding each chunk as soon as it completes
+
+        Each chunk is a dict with first_scene, last_scene and scenes; a chunk that still fails after
+        STORYBOARD_CHUNK_ATTEMPTS tries carries an error and no scenes instead of failing the storyboard.
+        """
+        self._validate_storyboard(context, keywords, num_scenes)
+        chunks = storyboard_chunks(num_scenes, chunk_size or Config.STORYBOARD_CHUNK_SCENES)
+        workers = max(1, min(len(chunks), max_parallel or Config.STORYBOARD_MAX_PARALLEL))
+        return self._run_storyboard_chunks(context, keywords, num_scenes, chunks, workers)
+
+    def _run_storyboard_chunks(self, context: str, keywords: List[str], num_scenes: int,
+                               chunks: List[Tuple[int, int]], workers: int) -> Iterator[Dict[str, Any]]:
+        pool = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = [pool.submit(self._storyboard_chunk, context, keywords, num_scenes, first, last)
+                       for first, last in chunks]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # A client that stops reading should not keep queued chunks running
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _storyboard_chunk(self, context: str, keywords: List[str], num_scenes: int,
+                          first: int, last: int) -> Dict[str, Any]:
+        create_prompt = self._build_storyboard_prompt(context, keywords, num_scenes, first, last)
+        max_tokens = self._storyboard_max_tokens(last - first + 1)
+        error = None
+        for _attempt in range(max(1, Config.STORYBOARD_CHUNK_ATTEMPTS)):
+            try:
+                with self._provider_errors("storyboard"):
+                    text = self._complete(create_prompt, STORYBOARD_SYSTEM_PROMPT, max_tokens=max_tokens)
+                    return {"first_scene": first, "last_scene": last,
+                            "scenes": number_scenes(extract_json(text, list), first, last)}
+            except ValueError as e:
+                error = e
+        return {"first_scene": first, "last_scene": last, "scenes": [], "error": str(error)}
+
+    def aiter_storyboard_chunks(self, context: str, keywords: List[str], num_scenes: int,
+                                chunk_size: Optional[int] = None,
+                                max_parallel: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Async iter_storyboard_chunks"""
+        self._validate_storyboard(context, keywords, num_scenes)
+        chunks = storyboard_chunks(num_scenes, chunk_size or Config.STORYBOARD_CHUNK_SCENES)
+        limit = asyncio.Semaphore(max(1, max_parallel or Config.STORYBOARD_MAX_PARALLEL))
+        return self._arun_storyboard_chunks(context, keywords, num_scenes, chunks, limit)
+
+    async def _arun_storyboard_chunks(self, context: str, keywords: List[str], num_scenes: int,
+                                      chunks: List[Tuple[int, int]],
+                                      limit: asyncio.Semaphore) -> AsyncIterator[Dict[str, Any]]:
+        async def run(first: int, last: int) -> Dict[str, Any]:
+            async with limit:
+                return await self._astoryboard_chunk(context, keywords, num_scenes, first, last)
+
+        tasks = [asyncio.ensure_future(run(first, last)) for first, last in chunks]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _astoryboard_chunk(self, context: str, keywords: List[str], num_scenes: int,
+                                 first: int, last: int) -> Dict[str, Any]:
+        create_prompt = self._build_storyboard_prompt(context, keywords, num_scenes, first, last)
+        max_tokens = self._storyboard_max_tokens(last - first + 1)
+        error = None
+        for _attempt in range(max(1, Config.STORYBOARD_CHUNK_ATTEMPTS)):
+            try:
+                with self._provider_errors("storyboard"):
+                    text = await self._acomplete(create_prompt, STORYBOARD_SYSTEM_PROMPT, max_tokens=max_tokens)
+                    return {"first_scene": first, "last_scene": last,
+                            "scenes": number_scenes(extract_json(text, list), first, last)}
+            except ValueError as e:
+                error = e
+        return {"first_scene": first, "last_scene": last, "scenes": [], "error": str(error)}
+
+    def _merge_storyboard(self, chunks: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Join chunk results in scene order, listing the ranges that failed"""
+        ordered = sorted(chunks, key=lambda chunk: chunk["first_scene"])
+        return {
+            "scenes": [scene for chunk in ordered for scene in chunk["scenes"]],
+            "provider": self.provider.value,
+            "failed_chunks": [{key: chunk[key] for key in ("first_scene", "last_scene", "error")}
+                              for chunk in ordered if chunk.get("error")],
+        }
+
+    @staticmethod
+    def _validate_storyboard(context: str, keywords: List[str], num_scenes: int):
         if not context.strip():
             raise ValueError("Context cannot be empty")
         if not keywords:
@@ -275,41 +791,33 @@ f"• PROFESSIONAL QUALITY: Studio lighting, perfect composition, sharp focus\n"
         if num_scenes <= 0:
             raise ValueError("Number of scenes must be positive")
 
+    def _build_storyboard_prompt(self, context: str, keywords: List[str], num_scenes: int,
+                                 first_scene: int = 1, last_scene: Optional[int] = None) -> str:
+        """Prompt for a whole storyboard, or for scenes first_scene..last_scene of a chunked one"""
+        self._validate_storyboard(context, keywords, num_scenes)
+
         keyword_str = ", ".join(keywords)
-        create_prompt = (
-            f"Create a storyboard for a video using the context '{context}'. "
-            f"Include the following keywords: {keyword_str}. Generate {num_scenes} scenes. "
+        if last_scene is None:
+            return (
+                f"Create a storyboard for a video using the context '{context}'. "
+                f"Include the following keywords: {keyword_str}. Generate {num_scenes} scenes. "
+                "Return the result as JSON list where each item has 'scene' and 'prompt' describing the scene for video generation."
+            )
+
+        # Every chunk shares the context, keywords and overall length so the ranges read as one story
+        if first_scene == 1:
+            position = "These scenes open the video."
+        elif last_scene == num_scenes:
+            position = "These scenes continue the story and close the video."
+        else:
+            position = "These scenes continue the story from the scenes before them."
+        return (
+            f"Create part of a {num_scenes}-scene storyboard for a video using the context '{context}'. "
+            f"Include the following keywords: {keyword_str}. "
+            f"Generate {last_scene - first_scene + 1} scenes, numbered {first_scene} to {last_scene}. {position} "
             "Return the result as JSON list where each item has 'scene' and 'prompt' describing the scene for video generation."
         )
 
-        try:
-            if self.provider == AIProvider.GEMINI:
-                response = self.model.generate_content(create_prompt)
-                text = response.text
-            elif self.provider == AIProvider.OPENAI:
-                response = self.client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": "You are an expert video storyboard generator."},
-                        {"role": "user", "content": create_prompt}
-                    ],
-                    max_tokens=300,
-                    temperature=0.7
-                )
-                text = response.choices[0].message.content
-
-            scenes = json.loads(text)
-            return {"scenes": scenes, "provider": self.provider.value}
-        except json.JSONDecodeError as e:
-            logger.error(f"Invalid JSON from {self.provider.value}: {e}")
-            raise ValueError("Invalid response format from model") from e
-        except (openai.APIError, openai.RateLimitError, openai.AuthenticationError) as e:
-            logger.error(f"OpenAI API error: {e}")
-            raise ValueError(f"OpenAI API error: {e}") from e
-        except Exception as e:
-            logger.error(f"Error generating storyboard with {self.provider.value}: {e}")
-            raise ValueError(f"An unexpected error occurred: {e}") from e
-
     def imagen_prompt_generator(self, main_base: str, image_style: str = "Photography",
                                theme: Optional[str] = None, elements: Optional[str] = None,
                                emotional: Optional[str] = None, color: Optional[str] = None,
@@ -335,6 +843,10 @@ f"• PROFESSIONAL QUALITY: Studio lighting, perfect composition, sharp focus\n"
             logger.error(f"Error generating Imagen prompt: {e}")
             raise ValueError(f"An unexpected error occurred while generating the Imagen prompt: {e}") from e
     
+    async def aimagen_prompt_generator(self, **kwargs) -> Dict[str, Any]:
+        """Async counterpart of imagen_prompt_generator (built locally, so nothing to await)"""
+        return self.imagen_prompt_generator(**kwargs)
+    
     def _build_imagen_prompt(self, main_base: str, image_style: str, theme: Optional[str], 
                             elements: Optional[str], emotional: Optional[str], color: Optional[str], 
                             image_detail: Optional[str], lighting: Optional[str], composition: Optional[str],
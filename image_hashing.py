@@ -0,0 +1,131 @@
+"""
+Perceptual hashing for near-duplicate detection in image batches
+Hashes are 64-bit integers computed with NumPy on a small decoded grayscale thumbnail
+"""
+
+import threading
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple
+
+HASH_SIZE = 8
+PHASH_SAMPLE_SIZE = HASH_SIZE * 4
+HASH_METHODS = ("phash", "dhash")
+
+
+def load_grayscale_array(image_path: str, size: Optional[Tuple[int, int]] = None,
+                         max_side: Optional[int] = None):
+    """Decode an image straight to a small float32 grayscale array
+
+    JPEGs are decoded at a reduced DCT scale via Image.draft, so the full-resolution
+    pixels are never materialized. Pass either an exact size or a max_side bound.
+    """
+    import numpy as np
+    from PIL import Image
+
+    with Image.open(image_path) as img:
+        target = size or (max_side, max_side)
+        img.draft("L", (target[0] * 2, target[1] * 2))
+        gray = img.convert("L")
+        if size:
+            gray = gray.resize(size, Image.BILINEAR)
+        elif max_side and max(gray.size) > max_side:
+            gray.thumbnail((max_side, max_side), Image.BILINEAR)
+        return np.asarray(gray, dtype=np.float32)
+
+
+@lru_cache(maxsize=4)
+def _dct_matrix(n: int):
+    """Orthonormal DCT-II basis, so a 2-D DCT is two matrix products"""
+    import numpy as np
+
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+def _bits_to_int(bits) -> int:
+    import numpy as np
+
+    return int.from_bytes(np.packbits(bits.astype(np.uint8).ravel()).tobytes(), "big")
+
+
+def dhash_array(pixels) -> int:
+    """Difference hash of a (HASH_SIZE, HASH_SIZE + 1) grayscale array"""
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def phash_array(pixels) -> int:
+    """DCT hash of a (PHASH_SAMPLE_SIZE, PHASH_SAMPLE_SIZE) grayscale array"""
+    import numpy as np
+
+    matrix = _dct_matrix(pixels.shape[0])
+    low = (matrix @ pixels @ matrix.T)[:HASH_SIZE, :HASH_SIZE]
+    return _bits_to_int(low > np.median(low.ravel()[1:]))
+
+
+def perceptual_hash(image_path: str, method: str = "phash") -> int:
+    """Compute a 64-bit perceptual hash for an image file"""
+    if method == "dhash":
+        return dhash_array(load_grayscale_array(image_path, size=(HASH_SIZE + 1, HASH_SIZE)))
+    if method == "phash":
+        return phash_array(load_grayscale_array(image_path, size=(PHASH_SAMPLE_SIZE, PHASH_SAMPLE_SIZE)))
+    raise ValueError(f"Unknown hash method: {method}")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _popcount64(values):
+    """Vectorized population count for a uint64 array"""
+    import numpy as np
+
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return np.unpackbits(values.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+class NearDuplicateIndex:
+    """Hamming-distance index over 64-bit perceptual hashes with an attached payload per hash"""
+
+    def __init__(self, max_distance: int = 6):
+        import numpy as np
+
+        if not 0 <= max_distance <= 64:
+            raise ValueError("max_distance must be between 0 and 64")
+        self.max_distance = max_distance
+        self._hashes = np.zeros(64, dtype=np.uint64)
+        self._payloads: List[Any] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+    def add(self, phash: int, payload: Any) -> None:
+        import numpy as np
+
+        with self._lock:
+            count = len(self._payloads)
+            if count == len(self._hashes):
+                grown = np.zeros(count * 2, dtype=np.uint64)
+                grown[:count] = self._hashes
+                self._hashes = grown
+            self._hashes[count] = np.uint64(phash)
+            self._payloads.append(payload)
+
+    def nearest(self, phash: int) -> Optional[Tuple[Any, int]]:
+        """Return (payload, distance) of the closest hash within max_distance, or None"""
+        import numpy as np
+
+        with self._lock:
+            count = len(self._payloads)
+            if not count:
+                return None
+            distances = _popcount64(self._hashes[:count] ^ np.uint64(phash))
+            best = int(np.argmin(distances))
+            distance = int(distances[best])
+            if distance > self.max_distance:
+                return None
+            return self._payloads[best], distance
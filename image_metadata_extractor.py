@@ -5,38 +5,203 @@ Handles EXIF data, AI-powered keyword generation, and batch processing
 
 import os
 import json
-import tempfile
-from typing import Dict, List, Optional, Tuple, Any
-from PIL import Image, ExifTags
-from PIL.ExifTags import TAGS
-import piexif
+import csv
+from typing import TYPE_CHECKING, BinaryIO, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Any
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from controller import PrompterGenerator, AIProvider
 from microstock_optimizer import optimizer
+from analysis_cache import AnalysisCache
+from config import Config
+from json_extract import extract_json
+from image_hashing import NearDuplicateIndex, perceptual_hash
+from image_quality import analyze_technical_quality, assess_technical_quality
 import base64
 import io
 
+# Pillow and piexif are imported inside the methods that decode or write images,
+# so importing this module (and the Flask app) stays cheap.
+if TYPE_CHECKING:  # pragma: no cover
+    from PIL import Image
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class ImageMetadataExtractor:
     """Handles image metadata extraction, EXIF data, and AI-powered keyword generation"""
     
-    def __init__(self, ai_api_key: str = None, ai_provider: str = "gemini"):
+    OPENAI_VISION_MODEL = "gpt-4.1-mini"
+    # Longest side of each image packed into a multi-image keywording request
+    AI_BATCH_IMAGE_MAX_SIDE = 768
+    
+    def __init__(self, ai_api_key: str = None, ai_provider: str = "gemini",
+                 cache: Optional[AnalysisCache] = None, hash_method: str = "phash"):
         self.ai_api_key = ai_api_key
         self.ai_provider = ai_provider
         self.generator = None
+        self.cache = cache
+        self.hash_method = hash_method
+        self._cached_hash_index = None
         
-        if ai_api_key:
+        if ai_api_key or not Config.requires_api_key(ai_provider):
             try:
                 self.generator = PrompterGenerator(api_key=ai_api_key, provider=ai_provider)
             except Exception as e:
                 logger.warning(f"AI generator initialization failed: {e}")
     
-    def extract_image_metadata(self, image_path: str) -> Dict[str, Any]:
-        """Extract comprehensive metadata from image file"""
+    def _cache_identity(self) -> Tuple[str, str]:
+        """Provider/model pair that cached analysis results are keyed on"""
+        if not self.generator:
+            return "none", "none"
+        if self.generator.provider == AIProvider.OPENAI:
+            return self.generator.provider.value, self.OPENAI_VISION_MODEL
+        return self.generator.provider.value, self.generator.model_name
+    
+    def extract_image_metadata(self, image_path: str, force_refresh: bool = False,
+                               duplicate_index: Optional[NearDuplicateIndex] = None,
+                               prefetched_ai: Optional[Dict[str, Any]] = None,
+                               digest: Optional[str] = None, phash: Optional[str] = None) -> Dict[str, Any]:
+        """Extract comprehensive metadata from image file, reusing cached results when available
+        
+        When a duplicate_index is given, the image is perceptually hashed and grouped with the
+        closest earlier image in the batch; near-duplicates reuse that image's AI analysis.
+        prefetched_ai is an AI analysis already produced by a multi-image request; digest and
+        phash are the image's content and perceptual hashes when the caller already has them.
+        """
+        provider, model = self._cache_identity()
+        
+        if self.cache is not None:
+            try:
+                digest = digest or self.cache.hash_file(image_path)
+                if not force_refresh:
+                    cached = self.cache.get(digest, provider, model)
+                    if cached is not None:
+                        metadata = self._rebind_cached_metadata(cached, image_path)
+                        self._assign_duplicate_group(metadata, image_path, duplicate_index, phash)
+                        return metadata
+            except OSError as e:
+                logger.warning(f"Analysis cache lookup failed for {image_path}: {e}")
+                digest = None
+        else:
+            digest = None
+        
+        metadata = self._extract_image_metadata(image_path, digest, force_refresh, duplicate_index, prefetched_ai,
+                                                phash)
+        
+        if digest and 'error' not in metadata:
+            # Fresh results take the shape a later cache hit will have
+            metadata = self.cache.json_compatible(metadata)
+        
+        if digest and 'error' not in metadata and self._is_cacheable(metadata):
+            # Group membership is per batch, so it is not part of the cached result
+            self.cache.set(digest, provider, model,
+                           {k: v for k, v in metadata.items() if k != 'duplicate_group'})
+            if 'perceptual_hash' in metadata:
+                self.cache.set_phash(digest, provider, model, int(metadata['perceptual_hash'], 16))
+                if self._cached_hash_index is not None:
+                    self._cached_hash_index.add(int(metadata['perceptual_hash'], 16), digest)
+        
+        if 'error' not in metadata:
+            self._assign_duplicate_group(metadata, image_path, duplicate_index)
+        
+        return metadata
+    
+    def _perceptual_hash(self, image_path: str) -> Optional[str]:
+        """Hex perceptual hash of an image, or None if it cannot be computed"""
+        try:
+            return format(perceptual_hash(image_path, self.hash_method), '016x')
+        except Exception as e:
+            logger.warning(f"Perceptual hashing failed for {image_path}: {e}")
+            return None
+    
+    def _assign_duplicate_group(self, metadata: Dict[str, Any], image_path: str,
+                                duplicate_index: Optional[NearDuplicateIndex], phash: Optional[str] = None) -> None:
+        """Attach the batch cluster an image belongs to, registering it as a representative if new"""
+        if duplicate_index is None or 'duplicate_group' in metadata:
+            return
+        
+        if 'perceptual_hash' not in metadata:
+            phash = phash or self._perceptual_hash(image_path)
+            if phash is None:
+                return
+            metadata['perceptual_hash'] = phash
+        
+        phash = int(metadata['perceptual_hash'], 16)
+        match = duplicate_index.nearest(phash)
+        if match:
+            representative, distance = match
+            metadata['duplicate_group'] = {'representative': representative['filename'], 'distance': distance}
+        else:
+            duplicate_index.add(phash, {'filename': metadata['filename'], 'ai_analysis': metadata.get('ai_analysis')})
+            metadata['duplicate_group'] = {'representative': metadata['filename'], 'distance': 0}
+    
+    def _near_duplicate_ai_keywords(self, metadata: Dict[str, Any],
+                                    duplicate_index: NearDuplicateIndex) -> Optional[Dict[str, Any]]:
+        """Reuse the AI analysis of a near-duplicate seen earlier in the batch or in the cache"""
+        phash = int(metadata['perceptual_hash'], 16)
+        
+        match = duplicate_index.nearest(phash)
+        if match and (match[0].get('ai_analysis') or {}).get('ai_generated'):
+            representative, distance = match
+            metadata['duplicate_group'] = {'representative': representative['filename'], 'distance': distance}
+            return dict(representative['ai_analysis'], reused_from=representative['filename'])
+        
+        cached_index = self._cache_hash_index(duplicate_index.max_distance)
+        match = cached_index.nearest(phash) if cached_index is not None else None
+        if match:
+            digest, distance = match
+            provider, model = self._cache_identity()
+            ai_analysis = self.cache.get(digest, provider, model, kind='ai_analysis')
+            if ai_analysis is not None:
+                return dict(ai_analysis, reused_from=f"cache:{digest[:12]}")
+        return None
+    
+    def _cache_hash_index(self, max_distance: int) -> Optional[NearDuplicateIndex]:
+        """Index of perceptual hashes in the cache for this provider/model, loaded once and kept up to date"""
+        if self.cache is None:
+            return None
+        if self._cached_hash_index is None or self._cached_hash_index.max_distance != max_distance:
+            index = NearDuplicateIndex(max_distance)
+            for digest, phash in self.cache.iter_phashes(*self._cache_identity()):
+                index.add(phash, digest)
+            self._cached_hash_index = index
+        return self._cached_hash_index
+    
+    def _rebind_cached_metadata(self, cached: Dict[str, Any], image_path: str) -> Dict[str, Any]:
+        """Point a cached result at the file currently being processed"""
+        metadata = dict(cached)
+        metadata['filename'] = os.path.basename(image_path)
+        metadata['created_date'] = datetime.fromtimestamp(os.path.getctime(image_path)).isoformat()
+        metadata['modified_date'] = datetime.fromtimestamp(os.path.getmtime(image_path)).isoformat()
+        metadata['cache_hit'] = True
+        return metadata
+    
+    def _is_cacheable(self, metadata: Dict[str, Any]) -> bool:
+        """Placeholder AI results are not cached so a later run retries the provider call
+        
+        Nor are analyses borrowed from a near-duplicate (outside a grouped batch the image must get its own)
+        or salvaged from a truncated answer.
+        """
+        ai_analysis = metadata.get('ai_analysis')
+        if self.generator and (not ai_analysis or not ai_analysis.get('ai_generated')):
+            return False
+        return not self._is_partial(ai_analysis or {})
+    
+    @staticmethod
+    def _is_partial(ai_analysis: Dict[str, Any]) -> bool:
+        """Borrowed or repaired-from-truncation analyses are served but never cached"""
+        return bool(ai_analysis.get('reused_from') or ai_analysis.get('truncated'))
+    
+    def _extract_image_metadata(self, image_path: str, digest: Optional[str] = None,
+                                force_refresh: bool = False,
+                                duplicate_index: Optional[NearDuplicateIndex] = None,
+                                prefetched_ai: Optional[Dict[str, Any]] = None,
+                                phash: Optional[str] = None) -> Dict[str, Any]:
+        """Run the full, uncached metadata extraction for an image file"""
         try:
+            from PIL import Image
+            
             with Image.open(image_path) as img:
                 # Basic image info
                 metadata = {
@@ -49,16 +214,33 @@ class ImageMetadataExtractor:
                     'aspect_ratio': round(img.width / img.height, 2),
                     'file_size': os.path.getsize(image_path),
                     'created_date': datetime.fromtimestamp(os.path.getctime(image_path)).isoformat(),
-                    'modified_date': datetime.fromtimestamp(os.path.getmtime(image_path)).isoformat()
+                    'modified_date': datetime.fromtimestamp(os.path.getmtime(image_path)).isoformat(),
+                    'cache_hit': False
                 }
+                if digest:
+                    metadata['content_hash'] = digest
                 
                 # Extract EXIF data
                 exif_data = self._extract_exif_data(img)
                 metadata['exif'] = exif_data
                 
-                # Analyze image for AI keywords if available
+                # Sharpness, noise and exposure measured on a downsampled copy
+                technical_quality = self._technical_quality(image_path)
+                if technical_quality is not None:
+                    metadata['technical_quality'] = technical_quality
+                
+                if duplicate_index is not None:
+                    phash = phash or self._perceptual_hash(image_path)
+                    if phash is not None:
+                        metadata['perceptual_hash'] = phash
+                
+                # Analyze image for AI keywords if available, reusing a near-duplicate's analysis
                 if self.generator:
-                    ai_analysis = self._generate_ai_keywords(image_path)
+                    ai_analysis = None
+                    if 'perceptual_hash' in metadata and not force_refresh:
+                        ai_analysis = self._near_duplicate_ai_keywords(metadata, duplicate_index)
+                    if ai_analysis is None:
+                        ai_analysis = self._cached_ai_keywords(image_path, digest, force_refresh, prefetched_ai)
                     metadata['ai_analysis'] = ai_analysis
                 
                 # Generate microstock optimization suggestions
@@ -71,11 +253,22 @@ class ImageMetadataExtractor:
             logger.error(f"Error extracting metadata from {image_path}: {e}")
             return {'error': str(e)}
     
-    def _extract_exif_data(self, img: Image.Image) -> Dict[str, Any]:
+    def _technical_quality(self, image_path: str) -> Optional[Dict[str, Any]]:
+        """Return sharpness/noise/exposure metrics, or None if the image cannot be measured"""
+        try:
+            return analyze_technical_quality(image_path)
+        except Exception as e:
+            logger.warning(f"Technical quality analysis failed for {image_path}: {e}")
+            return None
+    
+    def _extract_exif_data(self, img: "Image.Image") -> Dict[str, Any]:
         """Extract EXIF data from image"""
         exif_data = {}
         
         try:
+            from PIL.ExifTags import TAGS
+            import piexif
+            
             if hasattr(img, '_getexif') and img._getexif() is not None:
                 exif_dict = img._getexif()
                 
@@ -117,6 +310,96 @@ class ImageMetadataExtractor:
         
         return exif_data
     
+    def _cached_ai_keywords(self, image_path: str, digest: Optional[str] = None,
+                            force_refresh: bool = False,
+                            prefetched_ai: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Return the AI analysis block from the cache, generating and storing it on a miss"""
+        if self.cache is None or not digest:
+            return prefetched_ai or self._generate_ai_keywords(image_path)
+        
+        provider, model = self._cache_identity()
+        if not force_refresh and prefetched_ai is None:
+            cached = self.cache.get(digest, provider, model, kind='ai_analysis')
+            if cached is not None:
+                return cached
+        
+        ai_analysis = prefetched_ai or self._generate_ai_keywords(image_path)
+        if ai_analysis.get('ai_generated') and not self._is_partial(ai_analysis):
+            self.cache.set(digest, provider, model, ai_analysis, kind='ai_analysis')
+        return ai_analysis
+    
+    def _has_cached_ai_analysis(self, digest: Optional[str]) -> bool:
+        """Whether an image's AI analysis is already cached, without touching cache statistics"""
+        if self.cache is None or not digest:
+            return False
+        provider, model = self._cache_identity()
+        return (self.cache.contains(digest, provider, model)
+                or self.cache.contains(digest, provider, model, kind='ai_analysis'))
+    
+    @staticmethod
+    def _encode_image(image_path: str, max_side: Optional[int] = None) -> str:
+        """Base64 JPEG of an image, optionally downscaled so its longest side is max_side"""
+        from PIL import Image
+        
+        with Image.open(image_path) as img:
+            if max_side:
+                img.draft("RGB", (max_side, max_side))
+            img = img.convert("RGB")
+            if max_side and max(img.size) > max_side:
+                img.thumbnail((max_side, max_side))
+            buffer = io.BytesIO()
+            img.save(buffer, format="JPEG")
+        return base64.b64encode(buffer.getvalue()).decode("utf-8")
+    
+    @staticmethod
+    def _ai_analysis_from_data(data: Dict[str, Any]) -> Dict[str, Any]:
+        """Normalize one parsed provider answer into the ai_analysis block
+        
+        Raises ValueError when the answer lacks a title or keywords, so it is not passed off as generated.
+        """
+        keywords = data.get('ai_keywords', [])
+        if isinstance(keywords, list):
+            keywords = ', '.join(str(k) for k in keywords)
+        if not data.get('ai_title') or not keywords:
+            raise ValueError("AI answer is missing ai_title or ai_keywords")
+        return {
+            'ai_title': data.get('ai_title', ''),
+            'ai_description': data.get('ai_description', ''),
+            'ai_keywords': keywords,
+            'ai_category': data.get('ai_category', ''),
+            'commercial_appeal': data.get('commercial_appeal', 0),
+            'ai_generated': True,
+            'generation_timestamp': datetime.now().isoformat()
+        }
+    
+    def _request_ai_analysis(self, prompt: str, images_b64: List[str], max_tokens: int) -> Optional[str]:
+        """Send one vision request carrying every image and return the provider's text"""
+        if self.generator.provider == AIProvider.GEMINI:
+            parts = []
+            for index, img_b64 in enumerate(images_b64):
+                if len(images_b64) > 1:
+                    parts.append(f"Image {index}:")
+                parts.append({"mime_type": "image/jpeg", "data": img_b64})
+            parts.append(prompt)
+            return self.generator.model.generate_content(parts).text
+        
+        if self.generator.provider == AIProvider.LOCAL:
+            return self.generator.local.generate(prompt, images_b64)
+        
+        if self.generator.provider == AIProvider.OPENAI:
+            content = [{"type": "text", "text": prompt}]
+            for img_b64 in images_b64:
+                content.append({"type": "image_url",
+                                "image_url": {"url": f"data:image/jpeg;base64,{img_b64}"}})
+            response = self.generator.client.chat.completions.create(
+                model=self.OPENAI_VISION_MODEL,
+                messages=[{"role": "user", "content": content}],
+                max_tokens=max_tokens,
+            )
+            return response.choices[0].message.content
+        
+        return None
+    
     def _generate_ai_keywords(self, image_path: str) -> Dict[str, Any]:
         """Generate keywords, title and description for an image.
 
@@ -136,42 +419,10 @@ class ImageMetadataExtractor:
 
             if self.generator:
                 try:
-                    with Image.open(image_path) as img:
-                        buffer = io.BytesIO()
-                        img.save(buffer, format="JPEG")
-                        img_b64 = base64.b64encode(buffer.getvalue()).decode("utf-8")
-
-                    if self.generator.provider == AIProvider.GEMINI:
-                        response = self.generator.model.generate_content([
-                            {"mime_type": "image/jpeg", "data": img_b64},
-                            analysis_prompt,
-                        ])
-                        ai_text = response.text
-                    elif self.generator.provider == AIProvider.OPENAI:
-                        response = self.generator.client.chat.completions.create(
-                            model="gpt-4.1-mini",
-                            messages=[{
-                                "role": "user",
-                                "content": analysis_prompt +
-                                           f"\nIMAGE_BASE64:{img_b64}"
-                            }],
-                            max_tokens=500,
-                        )
-                        ai_text = response.choices[0].message.content
-                    else:
-                        ai_text = None
-
+                    ai_text = self._request_ai_analysis(analysis_prompt, [self._encode_image(image_path)],
+                                                        max_tokens=500)
                     if ai_text:
-                        data = json.loads(ai_text)
-                        return {
-                            'ai_title': data.get('ai_title', ''),
-                            'ai_description': data.get('ai_description', ''),
-                            'ai_keywords': ', '.join(data.get('ai_keywords', [])),
-                            'ai_category': data.get('ai_category', ''),
-                            'commercial_appeal': data.get('commercial_appeal', 0),
-                            'ai_generated': True,
-                            'generation_timestamp': datetime.now().isoformat()
-                        }
+                        return self._parse_single_answer(ai_text)
                 except Exception as e:
                     logger.warning(f"AI keyword generation failed, using placeholder: {e}")
 
@@ -197,6 +448,101 @@ class ImageMetadataExtractor:
             logger.error(f"Error generating AI keywords: {e}")
             return {'error': str(e)}
     
+    def _parse_single_answer(self, ai_text: str) -> Dict[str, Any]:
+        """Parse a one-image answer, flagging one salvaged from truncation so it is not cached"""
+        try:
+            return self._ai_analysis_from_data(extract_json(ai_text, dict, repair=False))
+        except json.JSONDecodeError:
+            ai_analysis = self._ai_analysis_from_data(extract_json(ai_text, dict))
+            ai_analysis['truncated'] = True
+            return ai_analysis
+    
+    def _generate_ai_keywords_batch(self, image_paths: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Keyword several images with a single provider request
+        
+        Images are downscaled and sent together; the provider answers with a JSON array of
+        per-image objects tagged by index. Images missing from the answer (or the whole batch,
+        if the request fails) are left out, for the per-image path to keyword one at a time.
+        """
+        results = {}
+        if self.generator and len(image_paths) > 1:
+            batch_prompt = (
+                f"You are given {len(image_paths)} images, labelled Image 0 to Image {len(image_paths) - 1}. "
+                "Analyze each one for microstock purposes and respond with a JSON array containing "
+                "one object per image with the keys: index (the image number), ai_title, "
+                "ai_description, ai_keywords (list of words), ai_category, and commercial_appeal (1-10)."
+            )
+            try:
+                images_b64 = [self._encode_image(path, self.AI_BATCH_IMAGE_MAX_SIDE) for path in image_paths]
+                ai_text = self._request_ai_analysis(batch_prompt, images_b64, max_tokens=500 * len(image_paths))
+                for item in self._parse_batch_answer(ai_text):
+                    index = item.get('index')
+                    if isinstance(index, int) and 0 <= index < len(image_paths) and image_paths[index] not in results:
+                        try:
+                            results[image_paths[index]] = self._ai_analysis_from_data(item)
+                        except ValueError as e:
+                            logger.info(f"Skipping batched answer for image {index}: {e}")
+            except Exception as e:
+                logger.warning(f"Batched AI keyword generation failed, falling back to single requests: {e}")
+        
+        if results and len(results) < len(image_paths):
+            logger.info(f"Batched AI answer missed {len(image_paths) - len(results)} of {len(image_paths)} images")
+        return results
+    
+    @staticmethod
+    def _parse_batch_answer(ai_text: Optional[str]) -> List[Dict[str, Any]]:
+        """Pull the per-image objects out of a batched answer, keeping the complete ones of a truncated array"""
+        if not ai_text:
+            return []
+        return [item for item in extract_json(ai_text, list) if isinstance(item, dict)]
+    
+    def _image_hashes(self, image_path: str,
+                      duplicate_index: Optional[NearDuplicateIndex]) -> Tuple[Optional[str], Optional[str]]:
+        """Content digest (with a cache) and perceptual hash (when grouping) of an image, computed once per batch"""
+        digest = None
+        if self.cache is not None:
+            try:
+                digest = self.cache.hash_file(image_path)
+            except OSError as e:
+                logger.warning(f"Hashing failed for {image_path}: {e}")
+        phash = self._perceptual_hash(image_path) if duplicate_index is not None else None
+        return digest, phash
+    
+    def _plan_ai_chunk(self, image_paths: List[str], hashes: Dict[str, Tuple[Optional[str], Optional[str]]],
+                       force_refresh: bool = False,
+                       duplicate_index: Optional[NearDuplicateIndex] = None) -> Tuple[List[str], List[str]]:
+        """Split a chunk into images to keyword with one batched request and images that wait for them
+        
+        Images whose analysis is cached, or that are near-duplicates of an image analyzed in an
+        earlier chunk or the cache, need neither. Near-duplicates within the chunk wait, so they can
+        reuse the analysis of the chunk image they match.
+        """
+        if not self.generator:
+            return [], []
+        
+        chunk_index = NearDuplicateIndex(duplicate_index.max_distance) if duplicate_index is not None else None
+        cached_index = self._cache_hash_index(duplicate_index.max_distance) if duplicate_index is not None else None
+        pending, waiting = [], []
+        for path in image_paths:
+            digest, phash = hashes[path]
+            if not force_refresh and self._has_cached_ai_analysis(digest):
+                continue
+            if chunk_index is not None and not force_refresh and phash is not None:
+                phash = int(phash, 16)
+                match = duplicate_index.nearest(phash)
+                if (match and (match[0].get('ai_analysis') or {}).get('ai_generated')) \
+                        or (cached_index is not None and cached_index.nearest(phash)):
+                    continue
+                if chunk_index.nearest(phash):
+                    waiting.append(path)
+                    continue
+                chunk_index.add(phash, path)
+            pending.append(path)
+        
+        if len(pending) < 2:
+            return [], []
+        return pending, waiting
+    
     def _analyze_microstock_potential(self, metadata: Dict) -> Dict[str, Any]:
         """Analyze image potential for microstock platforms"""
         try:
@@ -236,6 +582,13 @@ class ImageMetadataExtractor:
             if any(abs(aspect_ratio - ratio) < 0.1 for ratio in common_ratios):
                 quality_score += 10
             
+            # Blur, noise and exposure are the most common agency rejection reasons
+            technical_quality = metadata.get('technical_quality')
+            if technical_quality:
+                technical_score, technical_issues = assess_technical_quality(technical_quality)
+                quality_score += technical_score
+                quality_issues.extend(technical_issues)
+            
             return {
                 'quality_score': max(0, min(100, quality_score)),
                 'quality_issues': quality_issues,
@@ -301,118 +654,168 @@ class ImageMetadataExtractor:
                 name, ext = os.path.splitext(image_path)
                 output_path = f"{name}_with_metadata{ext}"
             
-            with Image.open(image_path) as img:
-                # Prepare EXIF data
-                exif_dict = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}, "thumbnail": None}
-                
-                # Add basic metadata
-                if 'ai_title' in metadata:
-                    exif_dict["0th"][piexif.ImageIFD.ImageDescription] = metadata['ai_title']
-                
-                if 'ai_keywords' in metadata:
-                    exif_dict["0th"][piexif.ImageIFD.XPKeywords] = metadata['ai_keywords'].encode('utf-16le')
-                
-                # Add creation date
-                exif_dict["0th"][piexif.ImageIFD.DateTime] = datetime.now().strftime("%Y:%m:%d %H:%M:%S")
-                
-                # Convert to bytes
-                exif_bytes = piexif.dump(exif_dict)
-                
-                # Save image with new EXIF data
-                img.save(output_path, "JPEG", exif=exif_bytes, quality=95)
-                
-                logger.info(f"Metadata written to {output_path}")
-                return output_path
+            with open(output_path, 'wb') as output:
+                self.embed_metadata(image_path, metadata, output)
+            
+            logger.info(f"Metadata written to {output_path}")
+            return output_path
                 
         except Exception as e:
             logger.error(f"Error writing metadata to image: {e}")
             raise
     
-    def batch_process_images(self, image_paths: List[str], output_dir: str = None) -> List[Dict]:
-        """Process multiple images in batch"""
-        results = []
+    def embed_metadata(self, image_path: str, metadata: Dict, output: BinaryIO) -> None:
+        """Save a JPEG copy of an image into a binary file object with title and keywords in EXIF
+        
+        Accepts extractor metadata (AI fields nested under 'ai_analysis') or flat ai_* fields.
+        """
+        from PIL import Image
+        import piexif
+        
+        ai_analysis = metadata.get('ai_analysis') or {}
+        title = metadata.get('ai_title') or ai_analysis.get('ai_title', '')
+        description = metadata.get('ai_description') or ai_analysis.get('ai_description', '')
+        keywords = metadata.get('ai_keywords') or ai_analysis.get('ai_keywords', '')
+        if isinstance(keywords, list):
+            keywords = ', '.join(keywords)
+        
+        with Image.open(image_path) as img:
+            # Prepare EXIF data
+            exif_dict = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}, "thumbnail": None}
+            
+            # Add basic metadata; XP* tags are UTF-16 so non-ASCII text survives
+            if title:
+                exif_dict["0th"][piexif.ImageIFD.ImageDescription] = title.encode('ascii', 'replace')
+                exif_dict["0th"][piexif.ImageIFD.XPTitle] = title.encode('utf-16le') + b'\x00\x00'
+            if description:
+                exif_dict["0th"][piexif.ImageIFD.XPSubject] = description.encode('utf-16le') + b'\x00\x00'
+            if keywords:
+                exif_dict["0th"][piexif.ImageIFD.XPKeywords] = keywords.encode('utf-16le') + b'\x00\x00'
+            
+            # Add creation date
+            exif_dict["0th"][piexif.ImageIFD.DateTime] = datetime.now().strftime("%Y:%m:%d %H:%M:%S")
+            
+            # Convert to bytes
+            exif_bytes = piexif.dump(exif_dict)
+            
+            # Save image with new EXIF data (JPEG has no alpha channel)
+            if img.mode not in ('RGB', 'L', 'CMYK'):
+                img = img.convert('RGB')
+            img.save(output, "JPEG", exif=exif_bytes, quality=95)
+    
+    def batch_process_images(self, image_paths: List[str], output_dir: str = None,
+                             force_refresh: bool = False,
+                             near_duplicate_threshold: Optional[int] = None,
+                             ai_batch_size: int = 1) -> List[Dict]:
+        """Process multiple images in batch, returning the results in input order"""
+        position = {path: i for i, path in reversed(list(enumerate(image_paths)))}
+        results = self.iter_process_images(image_paths, output_dir, force_refresh, near_duplicate_threshold,
+                                           ai_batch_size)
+        return sorted(results, key=lambda result: position[result['image_path']])
+    
+    def iter_process_images(self, image_paths: List[str], output_dir: str = None,
+                            force_refresh: bool = False,
+                            near_duplicate_threshold: Optional[int] = None,
+                            ai_batch_size: int = 1) -> Iterator[Dict]:
+        """Process multiple images, yielding each result as soon as it is ready
         
+        A near_duplicate_threshold (max Hamming distance between 64-bit perceptual hashes)
+        groups near-identical frames so only the first of each group pays for AI keywording.
+        With ai_batch_size > 1, images are keyworded ai_batch_size at a time with a single
+        multi-image provider request per chunk. While that request runs, the chunk's cache hits
+        and near-duplicates of earlier images are yielded, so results can arrive out of input order.
+        """
         if output_dir and not os.path.exists(output_dir):
             os.makedirs(output_dir)
         
-        for i, image_path in enumerate(image_paths):
-            try:
-                logger.info(f"Processing image {i+1}/{len(image_paths)}: {image_path}")
-                
-                # Extract metadata
-                metadata = self.extract_image_metadata(image_path)
-                
-                # Prepare result
-                result = {
-                    'image_path': image_path,
-                    'metadata': metadata,
-                    'processed_at': datetime.now().isoformat(),
-                    'success': 'error' not in metadata
-                }
-                
-                # Optionally save processed image
-                if output_dir and 'error' not in metadata:
-                    output_path = os.path.join(output_dir, f"processed_{os.path.basename(image_path)}")
-                    try:
-                        processed_path = self.write_metadata_to_image(image_path, metadata, output_path)
-                        result['processed_image_path'] = processed_path
-                    except Exception as e:
-                        result['processing_error'] = str(e)
-                
-                results.append(result)
-                
-            except Exception as e:
-                logger.error(f"Error processing {image_path}: {e}")
-                results.append({
-                    'image_path': image_path,
-                    'error': str(e),
-                    'processed_at': datetime.now().isoformat(),
-                    'success': False
-                })
+        duplicate_index = self.create_duplicate_index(near_duplicate_threshold)
+        chunk_size = max(1, ai_batch_size or 1)
+        batch_pool = ThreadPoolExecutor(max_workers=1) if chunk_size > 1 and self.generator else None
+        done = 0
         
-        return results
+        try:
+            for start in range(0, len(image_paths), chunk_size):
+                chunk = image_paths[start:start + chunk_size]
+                hashes = {path: self._image_hashes(path, duplicate_index) for path in chunk}
+                pending, waiting = ([], []) if batch_pool is None else \
+                    self._plan_ai_chunk(chunk, hashes, force_refresh, duplicate_index)
+                batch = batch_pool.submit(self._generate_ai_keywords_batch, pending) if pending else None
+                deferred = set(pending) | set(waiting)
+                order = [path for path in chunk if path not in deferred] + [path for path in chunk if path in deferred]
+                
+                prefetched = {}
+                for image_path in order:
+                    if batch is not None and image_path in deferred:
+                        prefetched, batch = batch.result(), None
+                    done += 1
+                    logger.info(f"Processing image {done}/{len(image_paths)}: {image_path}")
+                    digest, phash = hashes[image_path]
+                    yield self.process_image(image_path, output_dir, force_refresh, duplicate_index,
+                                             prefetched.get(image_path), digest, phash)
+        finally:
+            if batch_pool is not None:
+                batch_pool.shutdown(wait=False)
     
-    def generate_csv_report(self, results: List[Dict], output_path: str = None) -> str:
-        """Generate CSV report from batch processing results"""
+    @staticmethod
+    def create_duplicate_index(near_duplicate_threshold: Optional[int]) -> Optional[NearDuplicateIndex]:
+        """Per-batch near-duplicate index, or None when grouping is disabled"""
+        if near_duplicate_threshold is None or near_duplicate_threshold < 0:
+            return None
+        return NearDuplicateIndex(max_distance=near_duplicate_threshold)
+    
+    def process_image(self, image_path: str, output_dir: str = None, force_refresh: bool = False,
+                      duplicate_index: Optional[NearDuplicateIndex] = None,
+                      prefetched_ai: Optional[Dict[str, Any]] = None,
+                      digest: Optional[str] = None, phash: Optional[str] = None) -> Dict:
+        """Process a single image into a batch result record"""
         try:
-            import pandas as pd
+            # Extract metadata
+            metadata = self.extract_image_metadata(image_path, force_refresh=force_refresh,
+                                                   duplicate_index=duplicate_index,
+                                                   prefetched_ai=prefetched_ai, digest=digest, phash=phash)
             
-            # Flatten results for CSV
-            csv_data = []
+            # Prepare result
+            result = {
+                'image_path': image_path,
+                'metadata': metadata,
+                'processed_at': datetime.now().isoformat(),
+                'success': 'error' not in metadata
+            }
             
-            for result in results:
-                if result.get('success') and 'metadata' in result:
-                    metadata = result['metadata']
-                    row = {
-                        'filename': metadata.get('filename', ''),
-                        'width': metadata.get('width', 0),
-                        'height': metadata.get('height', 0),
-                        'file_size_mb': round(metadata.get('file_size', 0) / 1024 / 1024, 2),
-                        'format': metadata.get('format', ''),
-                        'ai_title': metadata.get('ai_analysis', {}).get('ai_title', ''),
-                        'ai_keywords': metadata.get('ai_analysis', {}).get('ai_keywords', ''),
-                        'ai_category': metadata.get('ai_analysis', {}).get('ai_category', ''),
-                        'quality_score': metadata.get('microstock_optimization', {}).get('quality_score', 0),
-                        'microstock_ready': metadata.get('microstock_optimization', {}).get('microstock_ready', False),
-                        'has_gps': metadata.get('exif', {}).get('has_gps', False),
-                        'processed_at': result.get('processed_at', '')
-                    }
-                else:
-                    row = {
-                        'filename': os.path.basename(result.get('image_path', '')),
-                        'error': result.get('error', 'Processing failed'),
-                        'processed_at': result.get('processed_at', '')
-                    }
-                
-                csv_data.append(row)
+            # Optionally save processed image
+            if output_dir and 'error' not in metadata:
+                output_path = os.path.join(output_dir, f"processed_{os.path.basename(image_path)}")
+                try:
+                    processed_path = self.write_metadata_to_image(image_path, metadata, output_path)
+                    result['processed_image_path'] = processed_path
+                except Exception as e:
+                    result['processing_error'] = str(e)
             
-            df = pd.DataFrame(csv_data)
+            return result
             
+        except Exception as e:
+            logger.error(f"Error processing {image_path}: {e}")
+            return {
+                'image_path': image_path,
+                'error': str(e),
+                'processed_at': datetime.now().isoformat(),
+                'success': False
+            }
+    
+    def generate_csv_report(self, results: Iterable[Dict], output_path: str = None) -> str:
+        """Generate CSV report from batch processing results
+        
+        Accepts any iterable (e.g. iter_process_images) and writes each row as it arrives,
+        so memory stays constant regardless of batch size.
+        """
+        try:
             if not output_path:
                 output_path = f"image_metadata_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
             
-            df.to_csv(output_path, index=False)
-            logger.info(f"CSV report saved to {output_path}")
+            with open(output_path, 'w', newline='', encoding='utf-8') as f:
+                row_count = CsvReportWriter(f).write_all(results)
+            
+            logger.info(f"CSV report with {row_count} rows saved to {output_path}")
             
             return output_path
             
@@ -420,6 +823,77 @@ class ImageMetadataExtractor:
             logger.error(f"Error generating CSV report: {e}")
             raise
 
-def create_metadata_extractor(api_key: str = None, provider: str = "gemini") -> ImageMetadataExtractor:
+REPORT_COLUMNS = [
+    'filename', 'width', 'height', 'file_size_mb', 'format', 'ai_title', 'ai_keywords',
+    'ai_category', 'quality_score', 'microstock_ready', 'has_gps', 'processed_at', 'error',
+    'duplicate_of'
+]
+
+def report_row(result: Dict) -> Dict[str, Any]:
+    """Flatten a batch processing result into a CSV report row"""
+    if result.get('success') and 'metadata' in result:
+        metadata = result['metadata']
+        return {
+            'filename': metadata.get('filename', ''),
+            'width': metadata.get('width', 0),
+            'height': metadata.get('height', 0),
+            'file_size_mb': round(metadata.get('file_size', 0) / 1024 / 1024, 2),
+            'format': metadata.get('format', ''),
+            'ai_title': metadata.get('ai_analysis', {}).get('ai_title', ''),
+            'ai_keywords': metadata.get('ai_analysis', {}).get('ai_keywords', ''),
+            'ai_category': metadata.get('ai_analysis', {}).get('ai_category', ''),
+            'quality_score': metadata.get('microstock_optimization', {}).get('quality_score', 0),
+            'microstock_ready': metadata.get('microstock_optimization', {}).get('microstock_ready', False),
+            'has_gps': metadata.get('exif', {}).get('has_gps', False),
+            'processed_at': result.get('processed_at', ''),
+            'duplicate_of': duplicate_of(metadata)
+        }
+    
+    return {
+        'filename': os.path.basename(result.get('image_path', '')),
+        'error': result.get('error', 'Processing failed'),
+        'processed_at': result.get('processed_at', '')
+    }
+
+def duplicate_of(metadata: Dict) -> str:
+    """Filename of the representative a near-duplicate was grouped with, or '' for representatives"""
+    group = metadata.get('duplicate_group') or {}
+    representative = group.get('representative', '')
+    return representative if representative != metadata.get('filename') else ''
+
+def summarize_duplicate_groups(results: Iterable[Dict]) -> Dict[str, List[str]]:
+    """Map each representative filename to the near-duplicates grouped with it"""
+    groups: Dict[str, List[str]] = {}
+    for result in results:
+        metadata = result.get('metadata') or {}
+        representative = duplicate_of(metadata)
+        if representative:
+            groups.setdefault(representative, []).append(metadata.get('filename', ''))
+    return groups
+
+class CsvReportWriter:
+    """Streams batch results into a CSV report one row at a time
+    
+    Every REPORT_COLUMNS column is always present (error and duplicate_of stay empty when unused),
+    since the header is written before any row is seen.
+    """
+    
+    def __init__(self, file_obj: TextIO, write_header: bool = True):
+        self._writer = csv.DictWriter(file_obj, fieldnames=REPORT_COLUMNS, extrasaction='ignore')
+        self.rows_written = 0
+        if write_header:
+            self._writer.writeheader()
+    
+    def write(self, result: Dict) -> None:
+        self._writer.writerow(report_row(result))
+        self.rows_written += 1
+    
+    def write_all(self, results: Iterable[Dict]) -> int:
+        for result in results:
+            self.write(result)
+        return self.rows_written
+
+def create_metadata_extractor(api_key: str = None, provider: str = "gemini",
+                              cache: Optional[AnalysisCache] = None) -> ImageMetadataExtractor:
     """Factory function to create metadata extractor"""
-    return ImageMetadataExtractor(ai_api_key=api_key, ai_provider=provider)
\ No newline at end of file
+    return ImageMetadataExtractor(ai_api_key=api_key, ai_provider=provider, cache=cache)
\ No newline at end of file
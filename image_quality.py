@@ -0,0 +1,120 @@
+"""
+Technical quality metrics for microstock submissions
+Sharpness, noise and exposure are measured with NumPy on a downsampled grayscale array,
+so they describe the image as seen at review-preview scale and cost tens of milliseconds
+"""
+
+import time
+from typing import Any, Dict, List, Tuple
+
+from image_hashing import load_grayscale_array
+
+# Metrics are computed on an image whose longest side is at most this many pixels;
+# the thresholds below are calibrated for that scale
+ANALYSIS_MAX_SIDE = 512
+
+BLUR_THRESHOLD = 100.0          # Laplacian variance below this reads as soft/out of focus
+NOISE_THRESHOLD = 2.0           # Estimated noise sigma (0-255 scale) above this reads as noisy
+CLIPPING_THRESHOLD = 0.05       # Fraction of pixels at pure black/white that counts as clipped
+SHADOW_LEVEL = 3
+HIGHLIGHT_LEVEL = 252
+NOISE_BLOCK_SIZE = 16
+NOISE_PERCENTILE = 10
+UNDEREXPOSED_MEAN = 50.0
+OVEREXPOSED_MEAN = 205.0
+
+
+def laplacian_variance(pixels) -> float:
+    """Variance of the 4-neighbour Laplacian, a standard focus measure"""
+    center = pixels[1:-1, 1:-1]
+    laplacian = (pixels[:-2, 1:-1] + pixels[2:, 1:-1] + pixels[1:-1, :-2] + pixels[1:-1, 2:]
+                 - 4.0 * center)
+    return float(laplacian.var())
+
+
+def estimate_noise(pixels, block: int = NOISE_BLOCK_SIZE) -> float:
+    """Immerkaer's fast noise sigma estimate, taken over the flattest blocks of the image
+
+    Scene texture and edges also respond to the mask, so the per-block estimates are
+    ranked and a low percentile is reported: flat sky or backdrop shows pure noise.
+    """
+    import numpy as np
+
+    height, width = pixels.shape
+    if height < 3 or width < 3:
+        return 0.0
+    # Mask [[1, -2, 1], [-2, 4, -2], [1, -2, 1]] applied with array slices
+    response = np.abs(pixels[:-2, :-2] + pixels[:-2, 2:] + pixels[2:, :-2] + pixels[2:, 2:]
+                      - 2.0 * (pixels[:-2, 1:-1] + pixels[2:, 1:-1] + pixels[1:-1, :-2] + pixels[1:-1, 2:])
+                      + 4.0 * pixels[1:-1, 1:-1])
+    rows, cols = response.shape[0] // block, response.shape[1] // block
+    if rows and cols:
+        blocks = response[:rows * block, :cols * block].reshape(rows, block, cols, block).mean(axis=(1, 3))
+        mean_response = float(np.percentile(blocks, NOISE_PERCENTILE))
+    else:
+        mean_response = float(response.mean())
+    return float(np.sqrt(np.pi / 2.0) * mean_response / 6.0)
+
+
+def exposure_metrics(pixels) -> Dict[str, float]:
+    """Mean brightness and the fraction of clipped shadow/highlight pixels"""
+    total = pixels.size or 1
+    return {
+        'mean_brightness': round(float(pixels.mean()), 2),
+        'shadow_clipping': round(float((pixels <= SHADOW_LEVEL).sum()) / total, 4),
+        'highlight_clipping': round(float((pixels >= HIGHLIGHT_LEVEL).sum()) / total, 4),
+    }
+
+
+def measure_array(pixels) -> Dict[str, Any]:
+    """Compute every technical metric for a float32 grayscale array"""
+    metrics = {
+        'sharpness': round(laplacian_variance(pixels), 2),
+        'noise_sigma': round(estimate_noise(pixels), 2),
+        'analyzed_size': [int(pixels.shape[1]), int(pixels.shape[0])],
+    }
+    metrics.update(exposure_metrics(pixels))
+    return metrics
+
+
+def analyze_technical_quality(image_path: str, max_side: int = ANALYSIS_MAX_SIDE) -> Dict[str, Any]:
+    """Measure sharpness, noise and exposure of an image file on a downsampled copy"""
+    started = time.perf_counter()
+    metrics = measure_array(load_grayscale_array(image_path, max_side=max_side))
+    metrics['analysis_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return metrics
+
+
+def assess_technical_quality(metrics: Dict[str, Any]) -> Tuple[int, List[str]]:
+    """Turn technical metrics into a score contribution (0-30) and a list of issues"""
+    score = 0
+    issues = []
+
+    if metrics.get('sharpness', 0) >= BLUR_THRESHOLD:
+        score += 15
+    else:
+        issues.append("Image appears soft or out of focus - agencies reject blurry images")
+
+    if metrics.get('noise_sigma', 0) <= NOISE_THRESHOLD:
+        score += 5
+    else:
+        issues.append("Visible noise/grain detected - reduce ISO noise before submitting")
+
+    exposure_ok = True
+    mean = metrics.get('mean_brightness', 128)
+    if mean < UNDEREXPOSED_MEAN:
+        issues.append("Image is underexposed")
+        exposure_ok = False
+    elif mean > OVEREXPOSED_MEAN:
+        issues.append("Image is overexposed")
+        exposure_ok = False
+    if metrics.get('highlight_clipping', 0) > CLIPPING_THRESHOLD:
+        issues.append("Clipped highlights - detail lost in bright areas")
+        exposure_ok = False
+    if metrics.get('shadow_clipping', 0) > CLIPPING_THRESHOLD:
+        issues.append("Clipped shadows - detail lost in dark areas")
+        exposure_ok = False
+    if exposure_ok:
+        score += 10
+
+    return score, issues
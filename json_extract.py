@@ -0,0 +1,205 @@
+"""
+Tolerant JSON extraction for model output
+Finds JSON objects and arrays inside free text (markdown fences, preambles, trailing notes),
+yields array elements as soon as they are complete and salvages truncated answers
+"""
+
+import json
+import re
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+CLOSERS = {"[": "]", "{": "}"}
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+# How many earlier cut points a truncated object is retried at before giving up
+MAX_REPAIR_ATTEMPTS = 20
+
+
+def _loads(text: str) -> Any:
+    """json.loads that forgives trailing commas"""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        repaired = TRAILING_COMMA.sub(r"\1", text)
+        if repaired == text:
+            raise
+        return json.loads(repaired)
+
+
+class JsonStreamExtractor:
+    """Incrementally pull JSON values out of model text as it arrives
+
+    feed() returns the items completed by each chunk: every element of a top-level array,
+    or a whole top-level object. close() salvages what a truncated answer left open.
+    Complete top-level values are collected in `values`.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.values: List[Any] = []
+        self._pos = 0
+        self._reset_root()
+
+    def _reset_root(self):
+        self._root_start: Optional[int] = None
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._element_start: Optional[int] = None
+        self._elements: List[Any] = []
+        self._commas: List[Tuple[int, Tuple[str, ...]]] = []
+
+    def feed(self, text: str) -> List[Any]:
+        self.buffer += text
+        items: List[Any] = []
+        buffer = self.buffer
+        while self._pos < len(buffer):
+            i = self._pos
+            self._pos += 1
+            char = buffer[i]
+
+            if self._root_start is None:
+                if char in CLOSERS:
+                    self._root_start = i
+                    self._stack = [char]
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            in_array = self._stack[0] == "[" and len(self._stack) == 1
+            if char == '"':
+                self._in_string = True
+                if in_array and self._element_start is None:
+                    self._element_start = i
+            elif char in CLOSERS:
+                if in_array and self._element_start is None:
+                    self._element_start = i
+                self._stack.append(char)
+            elif char in "]}":
+                if CLOSERS[self._stack[-1]] != char:
+                    # Not JSON after all (e.g. "[see below}"): look for a value after this start
+                    self._pos = self._root_start + 1
+                    self._reset_root()
+                    continue
+                if in_array:
+                    self._end_element(buffer[self._element_start:i] if self._element_start is not None else "", items)
+                self._stack.pop()
+                if not self._stack:
+                    self._end_root(buffer[self._root_start:i + 1], items)
+                elif self._stack[0] == "[" and len(self._stack) == 1:
+                    # A container element of the top-level array just closed
+                    self._end_element(buffer[self._element_start:i + 1], items)
+            elif char == ",":
+                if in_array:
+                    self._end_element(buffer[self._element_start:i] if self._element_start is not None else "", items)
+                else:
+                    self._commas.append((i, tuple(self._stack)))
+            elif in_array and self._element_start is None and not char.isspace():
+                self._element_start = i
+        return items
+
+    def _end_element(self, text: str, items: List[Any]):
+        self._element_start = None
+        text = text.strip()
+        if not text:
+            return
+        try:
+            item = _loads(text)
+        except ValueError:
+            return  # One malformed element should not cost the rest of the array
+        self._elements.append(item)
+        items.append(item)
+
+    def _end_root(self, text: str, items: List[Any]):
+        if text.startswith("["):
+            # Bracketed prose such as "[1-3]" is not an array of anything
+            if self._elements or not text[1:-1].strip():
+                self.values.append(self._elements)
+        else:
+            try:
+                value = _loads(text)
+            except ValueError:
+                value = None
+            if isinstance(value, dict):
+                self.values.append(value)
+                items.append(value)
+        self._reset_root()
+
+    def close(self) -> List[Any]:
+        """Salvage a value left open by a truncated answer and return any item it completes"""
+        items: List[Any] = []
+        if self._root_start is None:
+            return items
+        if self.buffer[self._root_start] == "[":
+            # Complete elements were already yielded; the cut-off one is dropped
+            if self._elements:
+                self.values.append(self._elements)
+        else:
+            value = self._repair_object()
+            if isinstance(value, dict):
+                self.values.append(value)
+                items.append(value)
+        self._reset_root()
+        return items
+
+    def _repair_object(self) -> Optional[Any]:
+        """Close a truncated object, backing off to earlier commas until it parses"""
+        text = self.buffer[self._root_start:]
+        candidates = [(len(self.buffer), tuple(self._stack), self._in_string)]
+        candidates += [(pos, stack, False) for pos, stack in reversed(self._commas[-MAX_REPAIR_ATTEMPTS:])]
+        for end, stack, in_string in candidates:
+            prefix = text[:end - self._root_start]
+            if in_string:
+                prefix += '"'
+            try:
+                return _loads(prefix + "".join(CLOSERS[opener] for opener in reversed(stack)))
+            except ValueError:
+                continue
+        return None
+
+
+def iter_json_items(chunks: Iterable[str]) -> Iterator[Any]:
+    """Yield each top-level array element or object from streamed text as soon as it is complete"""
+    extractor = JsonStreamExtractor()
+    for chunk in chunks:
+        yield from extractor.feed(chunk)
+    yield from extractor.close()
+
+
+def extract_json(text: Optional[str], expect: Optional[type] = None, repair: bool = True) -> Any:
+    """The first JSON value in model text, optionally of the expected type (list or dict)
+
+    Fenced, prefixed and (unless repair is False) truncated answers are handled; a list wrapped in a
+    one-key object ({"scenes": [...]}) counts as a list. Raises json.JSONDecodeError if nothing usable is found.
+    """
+    text = text or ""
+    try:
+        value = json.loads(text)
+        if expect is None or isinstance(value, expect):
+            return value
+    except json.JSONDecodeError:
+        pass
+
+    extractor = JsonStreamExtractor()
+    extractor.feed(text)
+    if repair:
+        extractor.close()
+    for value in extractor.values:
+        if expect is None or isinstance(value, expect):
+            return value
+        if expect is list and isinstance(value, dict):
+            lists = [item for item in value.values() if isinstance(item, list)]
+            if len(lists) == 1:
+                return lists[0]
+        if expect is dict and isinstance(value, list):
+            objects = [item for item in value if isinstance(item, dict)]
+            if objects:
+                return objects[0]
+    kind = {list: "array", dict: "object"}.get(expect, "value")
+    raise json.JSONDecodeError(f"No JSON {kind} found in model output", text, 0)
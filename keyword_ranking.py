@@ -0,0 +1,109 @@
+"""
+Keyword relevance ranking and word-boundary trimming for platform metadata limits
+Keywords are scored against the title, description and category vocabulary, with stem/plural
+duplicates removed, so truncation keeps the most relevant terms instead of the first N
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from microstock_templates import INDUSTRY_KEYWORDS, MICROSTOCK_CATEGORIES
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Weight of a keyword token appearing in each part of the item's own text
+TITLE_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.5
+CATEGORY_WEIGHT = 1.0
+# Tie-breaker favouring the order the keywords were supplied in (AI output lists the strongest first)
+POSITION_WEIGHT = 0.5
+
+
+@lru_cache(maxsize=16384)
+def stem(word: str) -> str:
+    """Light suffix-stripping stemmer: folds plurals and -ing/-ed forms onto one key"""
+    if len(word) <= 3:
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("sses", "shes", "ches", "xes", "zes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        word = word[:-1]
+    for suffix in ("ing", "ed"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            word = word[:-len(suffix)]
+            if len(word) > 2 and word[-1] == word[-2] and word[-1] not in "lsz":
+                word = word[:-1]
+            break
+    return word
+
+
+def stems(text: str) -> List[str]:
+    return [stem(token) for token in TOKEN_PATTERN.findall(text.lower())]
+
+
+@lru_cache(maxsize=65536)
+def keyword_stems(keyword: str) -> Tuple[str, ...]:
+    """Stem key of a keyword; cached because the same keywords recur across a batch"""
+    return tuple(stems(keyword))
+
+
+@lru_cache(maxsize=64)
+def category_stems(category: str) -> frozenset:
+    """Stems of the curated vocabulary for a category"""
+    category = (category or "").strip().lower()
+    vocabulary = list(MICROSTOCK_CATEGORIES.get(category, {}).get("keywords", []))
+    vocabulary += INDUSTRY_KEYWORDS.get(category, [])
+    return frozenset(s for term in vocabulary for s in stems(term))
+
+
+def dedupe_keywords(keywords: Sequence[str]) -> List[str]:
+    """Drop empty keywords and later keywords that share a stem key with an earlier one"""
+    seen = set()
+    unique = []
+    for keyword in keywords:
+        keyword = keyword.strip()
+        key = keyword_stems(keyword)
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(keyword)
+    return unique
+
+
+def rank_keywords(keywords: Sequence[str], title: str = "", description: str = "", category: str = "",
+                  limit: Optional[int] = None) -> List[str]:
+    """Return de-duplicated keywords ordered by relevance to the item, optionally keeping the best `limit`"""
+    unique = dedupe_keywords(keywords)
+    if limit is not None and len(unique) <= limit:
+        return unique
+
+    weights: Dict[str, float] = dict.fromkeys(category_stems(category), CATEGORY_WEIGHT)
+    for token in stems(description):
+        weights[token] = max(weights.get(token, 0.0), DESCRIPTION_WEIGHT)
+    for token in stems(title):
+        weights[token] = TITLE_WEIGHT
+
+    count = len(unique)
+    scored = []
+    for position, keyword in enumerate(unique):
+        tokens = keyword_stems(keyword)
+        relevance = sum(weights.get(token, 0.0) for token in tokens) / len(tokens)
+        scored.append((relevance + POSITION_WEIGHT * (1 - position / count), -position, keyword))
+    scored.sort(reverse=True)
+
+    ranked = [keyword for _, _, keyword in scored]
+    return ranked[:limit] if limit is not None else ranked
+
+
+def trim_to_word_boundary(text: str, max_length: int) -> str:
+    """Shorten text to at most max_length characters without cutting a word in half"""
+    if len(text) <= max_length:
+        return text
+    if text[max_length].isspace():
+        cut = text[:max_length]
+    else:
+        boundary = text.rfind(" ", 0, max_length)
+        cut = text[:boundary] if boundary > 0 else text[:max_length]
+    return cut.rstrip(" ,;:-–—")
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Gemini and OpenAI HTTP APIs used by load tests
+
+Answers Gemini REST generateContent and OpenAI chat completions with the in-process local
+provider's replies (local_provider.py), wrapped in each API's response format.
+Latency, HTTP 429 rate limiting and server errors are injected at configurable rates.
+
+Point the app at it with:
+    GEMINI_BASE_URL=http://127.0.0.1:8090  OPENAI_BASE_URL=http://127.0.0.1:8090/v1
+
+Usage:
+    python loadtest/fake_provider.py --port 8090 --latency lognormal:800,0.5 --rate-429 0.02 --error-rate 0.01
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from local_provider import latency_sampler, local_answer  # noqa: E402
+
+GEMINI_PATH = re.compile(r"^/v1(?:beta)?/models/(?P<model>[^/:]+):generateContent$")
+OPENAI_PATHS = ("/v1/chat/completions", "/chat/completions")
+
+
+class FakeProviderStats:
+    """Thread-safe counters exposed at GET /_stats"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+
+    def add(self, key: str):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # noqa: A002 - signature from BaseHTTPRequestHandler
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status: int, payload: Dict, headers: Dict[str, str] = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/_stats":
+            self.send_json(200, self.server.stats.snapshot())
+        else:
+            self.send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        path = self.path.split("?", 1)[0]
+        gemini = GEMINI_PATH.match(path)
+        if not gemini and path not in OPENAI_PATHS:
+            self.send_json(404, {"error": {"message": f"Unknown endpoint {path}"}})
+            return
+        api = "gemini" if gemini else "openai"
+        server = self.server
+
+        time.sleep(server.latency())
+        roll = random.random()
+        if roll < server.rate_429:
+            server.stats.add(f"{api}_429")
+            self.send_json(429, {"error": {"code": 429, "message": "Resource has been exhausted (fake)",
+                                           "status": "RESOURCE_EXHAUSTED"}}, {"Retry-After": "1"})
+            return
+        if roll < server.rate_429 + server.error_rate:
+            server.stats.add(f"{api}_500")
+            self.send_json(500, {"error": {"code": 500, "message": "Injected server error (fake)",
+                                           "status": "INTERNAL"}})
+            return
+
+        server.stats.add(f"{api}_ok")
+        if gemini:
+            prompt = " ".join(part.get("text", "") for content in body.get("contents", [])
+                              for part in content.get("parts", []))
+            self.send_json(200, {"candidates": [{
+                "content": {"parts": [{"text": local_answer(prompt)}], "role": "model"},
+                "finishReason": "STOP", "index": 0}]})
+        else:
+            prompt = " ".join(part.get("text", "") if isinstance(part, dict) else str(part)
+                              for message in body.get("messages", []) if message.get("role") == "user"
+                              for part in (message["content"] if isinstance(message["content"], list)
+                                           else [message["content"]]))
+            self.send_json(200, {
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": local_answer(prompt)}}],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": 60,
+                          "total_tokens": len(prompt) // 4 + 60}})
+
+
+class FakeProviderServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, latency: str = "fixed:0", rate_429: float = 0.0, error_rate: float = 0.0,
+                 verbose: bool = False):
+        super().__init__(address, FakeProviderHandler)
+        self.latency = latency_sampler(latency)
+        self.rate_429 = rate_429
+        self.error_rate = error_rate
+        self.verbose = verbose
+        self.stats = FakeProviderStats()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_fake_provider(host: str = "127.0.0.1", port: int = 0, **options) -> FakeProviderServer:
+    """Start the stand-in on a background thread (port 0 picks a free port)"""
+    server = FakeProviderServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", default="lognormal:800,0.5",
+                        help="fixed:MS | uniform:MIN,MAX | normal:MEAN,SD | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of calls answered with HTTP 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with HTTP 500")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = FakeProviderServer((args.host, args.port), args.latency, args.rate_429, args.error_rate, args.verbose)
+    print(f"Fake provider on {server.base_url} (latency {args.latency}, 429 rate {args.rate_429}, "
+          f"error rate {args.error_rate})")
+    print(f"  GEMINI_BASE_URL={server.base_url}  OPENAI_BASE_URL={server.base_url}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Load-test harness: drive the app at a target request rate and report throughput and tail latency
+
+Requests are started on a fixed open-loop schedule (so a slow server cannot slow the offered
+load down) and spread over the chosen endpoints. Per endpoint the report shows completed and
+failed requests, throughput and p50/p95/p99 latency.
+
+By default the harness starts the fake provider (loadtest/fake_provider.py) and the app
+(prefork.py) itself, wired together through GEMINI_BASE_URL / OPENAI_BASE_URL, so no real
+provider quota is used. Pass --url to target an app that is already running.
+
+Usage:
+    python loadtest/run_load.py --rps 20 --duration 30 --endpoints generate_prompts,bulk_generate
+    python loadtest/run_load.py --latency lognormal:800,0.5 --rate-429 0.05 --error-rate 0.01 --json
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from loadtest.fake_provider import start_fake_provider  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+API_KEY = "loadtest-key"
+
+
+def generate_prompts_request(args) -> Tuple[str, bytes, str]:
+    payload = {"api_key": API_KEY, "provider": args.provider, "model": args.model,
+               "main_base": random.choice(["team meeting", "remote work", "healthy breakfast"]),
+               "num_prompts": 1, "round_count": 1}
+    return "/api/generate_prompts", json.dumps(payload).encode(), "application/json"
+
+
+def bulk_generate_request(args) -> Tuple[str, bytes, str]:
+    payload = {"api_key": API_KEY, "provider": args.provider, "model": args.model,
+               "delay_between": 0, "max_retries": 2,
+               "prompts_data": [{"main_base": subject} for subject in ("office desk", "city park", "coffee shop")]}
+    return "/api/bulk_generate", json.dumps(payload).encode(), "application/json"
+
+
+def batch_extract_metadata_request(args) -> Tuple[str, bytes, str]:
+    """Multipart upload of small random JPEGs (random pixels, so the analysis cache never hits)"""
+    from PIL import Image
+
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    fields = {"ai_key": API_KEY, "ai_provider": args.provider}
+    for name, value in fields.items():
+        body.write(f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n{value}\r\n".encode())
+    for index in range(args.images):
+        image = io.BytesIO()
+        Image.frombytes("RGB", (64, 64), os.urandom(64 * 64 * 3)).save(image, "JPEG")
+        body.write(f"--{boundary}\r\nContent-Disposition: form-data; name=\"images\"; "
+                   f"filename=\"load_{index}.jpg\"\r\nContent-Type: image/jpeg\r\n\r\n".encode())
+        body.write(image.getvalue() + b"\r\n")
+    body.write(f"--{boundary}--\r\n".encode())
+    return "/api/batch_extract_metadata", body.getvalue(), f"multipart/form-data; boundary={boundary}"
+
+
+ENDPOINTS: Dict[str, Callable] = {
+    "generate_prompts": generate_prompts_request,
+    "bulk_generate": bulk_generate_request,
+    "batch_extract_metadata": batch_extract_metadata_request,
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples: List[Tuple[str, int, float]], elapsed: float) -> Dict[str, Dict]:
+    """Per-endpoint throughput and latency percentiles from (endpoint, status, seconds) samples"""
+    report = {}
+    for endpoint in sorted({sample[0] for sample in samples}):
+        rows = [sample for sample in samples if sample[0] == endpoint]
+        ok = sorted(seconds for _, status, seconds in rows if 200 <= status < 300)
+        statuses: Dict[str, int] = {}
+        for _, status, _ in rows:
+            if not 200 <= status < 300:
+                statuses[str(status or "connection error")] = statuses.get(str(status or "connection error"), 0) + 1
+        report[endpoint] = {
+            "requests": len(rows),
+            "ok": len(ok),
+            "failed": statuses,
+            "throughput_rps": round(len(ok) / elapsed, 2) if elapsed > 0 else None,
+            "p50_ms": round(percentile(ok, 50) * 1000, 1) if ok else None,
+            "p95_ms": round(percentile(ok, 95) * 1000, 1) if ok else None,
+            "p99_ms": round(percentile(ok, 99) * 1000, 1) if ok else None,
+            "max_ms": round(ok[-1] * 1000, 1) if ok else None,
+        }
+    return report
+
+
+def run_load(base_url: str, endpoints: List[str], rps: float, duration: float, args,
+             max_workers: int = 512) -> Tuple[Dict[str, Dict], float]:
+    """Offer `rps` requests per second for `duration` seconds, cycling through endpoints"""
+    samples: List[Tuple[str, int, float]] = []
+    lock = threading.Lock()
+
+    def fire(endpoint: str):
+        path, body, content_type = ENDPOINTS[endpoint](args)
+        request = urllib.request.Request(base_url + path, data=body, headers={"Content-Type": content_type})
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=args.timeout) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except (urllib.error.URLError, OSError):
+            status = 0
+        with lock:
+            samples.append((endpoint, status, time.perf_counter() - started))
+
+    total = int(rps * duration)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for i in range(total):
+            delay = started + i / rps - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(fire, endpoints[i % len(endpoints)])
+    return summarize(samples, time.perf_counter() - started), time.perf_counter() - started
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_app(provider_url: str, workers: int) -> Tuple[subprocess.Popen, str]:
+    """Launch the app under the prefork launcher, pointed at the fake provider"""
+    port = free_port()
+    env = dict(os.environ, GEMINI_BASE_URL=provider_url, OPENAI_BASE_URL=f"{provider_url}/v1",
+               ANALYSIS_CACHE_ENABLED="false", PREFORK_MAX_REQUESTS="0")
+    process = subprocess.Popen([sys.executable, "prefork.py", "--host", "127.0.0.1", "--port", str(port),
+                                "--workers", str(workers)], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline and process.poll() is None:
+        # The socket is bound before the app is preloaded, so wait for a real response
+        try:
+            with urllib.request.urlopen(f"{base_url}/api/config", timeout=5):
+                return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("The app did not start")
+
+
+def print_report(report: Dict[str, Dict], elapsed: float, provider_stats: Optional[Dict] = None):
+    print(f"\n{'endpoint':<24}{'requests':>9}{'ok':>7}{'rps':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  failed")
+    for endpoint, row in report.items():
+        print(f"{endpoint:<24}{row['requests']:>9}{row['ok']:>7}{row['throughput_rps'] or 0:>8}"
+              f"{row['p50_ms'] or '-':>10}{row['p95_ms'] or '-':>10}{row['p99_ms'] or '-':>10}  {row['failed'] or ''}")
+    print(f"\nWall time {elapsed:.1f} s")
+    if provider_stats:
+        print(f"Fake provider calls: {provider_stats}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="Target an app that is already running instead of starting one")
+    parser.add_argument("--endpoints", default="generate_prompts,bulk_generate,batch_extract_metadata",
+                        help=f"Comma-separated mix of: {', '.join(ENDPOINTS)}")
+    parser.add_argument("--rps", type=float, default=10)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--provider", choices=["gemini", "openai"], default="gemini")
+    parser.add_argument("--model", default="gemini-2.5-flash")
+    parser.add_argument("--images", type=int, default=4, help="Images per batch_extract_metadata request")
+    parser.add_argument("--workers", type=int, default=4, help="App workers when the harness starts the app")
+    parser.add_argument("--latency", default="lognormal:800,0.5", help="Fake provider latency distribution (ms)")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = [e for e in endpoints if e not in ENDPOINTS]
+    if unknown or not endpoints:
+        parser.error(f"Unknown endpoints: {', '.join(unknown)}")
+
+    provider = None
+    app_process = None
+    base_url = args.url
+    if not base_url:
+        provider = start_fake_provider(latency=args.latency, rate_429=args.rate_429, error_rate=args.error_rate)
+        app_process, base_url = start_app(provider.base_url, args.workers)
+
+    try:
+        report, elapsed = run_load(base_url.rstrip("/"), endpoints, args.rps, args.duration, args)
+    finally:
+        if app_process is not None:
+            app_process.terminate()
+            app_process.wait(timeout=60)
+
+    provider_stats = provider.stats.snapshot() if provider else None
+    if args.json:
+        print(json.dumps({"endpoints": report, "elapsed_seconds": round(elapsed, 2),
+                          "offered_rps": args.rps, "provider_calls": provider_stats}, indent=2))
+    else:
+        print_report(report, elapsed, provider_stats)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
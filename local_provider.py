@@ -0,0 +1,123 @@
+"""
+Deterministic in-process AI provider for offline runs, benchmarks and tests
+Answers the same prompts as Gemini/OpenAI with plausible text derived from the prompt itself
+(and the image bytes for vision requests), after an optional simulated latency
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+from microstock_templates import INDUSTRY_KEYWORDS, MICROSTOCK_CATEGORIES
+
+SUBJECTS = ["team meeting", "remote work", "healthy breakfast", "city skyline", "yoga class", "solar panels"]
+STYLE_TERMS = ["soft natural light", "shallow depth of field", "clean composition", "vibrant colors",
+               "copy space", "high resolution", "sharp focus", "modern setting"]
+
+
+def latency_sampler(spec: str) -> Callable[[], float]:
+    """Parse a latency distribution in milliseconds and return a sampler in seconds
+
+    fixed:MS, uniform:MIN,MAX, normal:MEAN,SD or lognormal:MEDIAN,SIGMA
+    """
+    kind, _, args = spec.partition(":")
+    try:
+        values = [float(v) for v in args.split(",")] if args else []
+        if kind == "fixed" and len(values) == 1:
+            return lambda: values[0] / 1000
+        if kind == "uniform" and len(values) == 2:
+            return lambda: random.uniform(values[0], values[1]) / 1000
+        if kind == "normal" and len(values) == 2:
+            return lambda: max(0.0, random.gauss(values[0], values[1])) / 1000
+        if kind == "lognormal" and len(values) == 2 and values[0] > 0:
+            mu = math.log(values[0])
+            return lambda: random.lognormvariate(mu, values[1]) / 1000
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid latency distribution: {spec}")
+
+
+def _field(prompt: str, pattern: str) -> Optional[str]:
+    match = re.search(pattern, prompt)
+    return match.group(1).strip() if match else None
+
+
+def _category_keywords(category: str) -> List[str]:
+    return list(MICROSTOCK_CATEGORIES.get(category, {}).get("keywords", [])) + INDUSTRY_KEYWORDS.get(category, [])
+
+
+def image_analysis(rng: random.Random, category: str = "business") -> Dict:
+    """One image-analysis object with the keys the metadata extractor reads"""
+    subject = rng.choice(SUBJECTS)
+    vocabulary = _category_keywords(category) or ["business", "professional", "modern"]
+    keywords = rng.sample(vocabulary, min(10, len(vocabulary)))
+    return {
+        "ai_title": f"{subject.title()} Concept",
+        "ai_description": f"Professional stock photo of {subject} for commercial use",
+        "ai_keywords": keywords + [word for word in subject.split() if word not in keywords],
+        "ai_category": category,
+        "commercial_appeal": rng.randint(5, 9),
+    }
+
+
+def local_answer(prompt: str, images: Sequence[str] = ()) -> str:
+    """Plausible provider reply for a prompt; the same prompt and images always give the same text"""
+    seed = hashlib.sha256(prompt.encode("utf-8"))
+    for image in images:
+        seed.update(str(image).encode("utf-8"))
+    rng = random.Random(seed.hexdigest())
+
+    batch = _field(prompt, r"given (\d+) images")
+    if batch:
+        return json.dumps([dict(image_analysis(rng), index=i) for i in range(int(batch))])
+    if "JSON object" in prompt:
+        return json.dumps(image_analysis(rng))
+
+    scenes = _field(prompt, r"Generate (\d+) scenes")
+    if scenes:
+        context = _field(prompt, r"using the context '([^']*)'") or rng.choice(SUBJECTS)
+        keywords = [k.strip() for k in (_field(prompt, r"following keywords: ([^.]*)\.") or "").split(",") if k.strip()]
+        first = int(_field(prompt, r"numbered (\d+) to") or 1)
+        return json.dumps([
+            {"scene": i, "prompt": f"Scene {i}: {context}, {keywords[(i - 1) % len(keywords)] if keywords else 'wide shot'}, "
+                                   f"{rng.choice(STYLE_TERMS)}, cinematic framing"}
+            for i in range(first, first + int(scenes))
+        ])
+
+    subject = _field(prompt, r"CORE SUBJECT: ([^\n]+)") or rng.choice(SUBJECTS)
+    trending = _field(prompt, r"TRENDING KEYWORDS: Include ([^\n]+)")
+    details = [k.strip() for k in trending.split(",")][:3] if trending else []
+    text = ", ".join([subject] + details + rng.sample(STYLE_TERMS, 3) + ["commercial stock photography"])
+    if "FLUX1.dev" in prompt:
+        return f"{text}, photorealistic, detailed"
+    return f"/imagine prompt: {text} --ar 16:9 --v 6"
+
+
+class LocalProvider:
+    """Generates answers in-process after a simulated latency"""
+
+    def __init__(self, latency: str = "fixed:0"):
+        self.latency = latency_sampler(latency)
+
+    def generate(self, prompt: str, images: Sequence[str] = ()) -> str:
+        delay = self.latency()
+        if delay > 0:
+            time.sleep(delay)
+        return local_answer(prompt, images)
+
+    def stream(self, prompt: str, images: Sequence[str] = ()) -> Iterator[str]:
+        """generate() delivered a few words at a time, the first after the simulated latency"""
+        words = re.findall(r"\S+\s*", self.generate(prompt, images))
+        for start in range(0, len(words), 3):
+            yield "".join(words[start:start + 3])
+
+    async def agenerate(self, prompt: str, images: Sequence[str] = ()) -> str:
+        delay = self.latency()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return local_answer(prompt, images)
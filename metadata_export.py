@@ -0,0 +1,292 @@
+"""
+Streaming metadata export in generic and agency-specific formats
+Rows are rendered one at a time straight into the response or file, with no temp files
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+import zipfile
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+
+from keyword_ranking import rank_keywords
+from microstock_templates import PLATFORM_REQUIREMENTS
+
+# Bytes of rendered output buffered before a chunk is handed to the response
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+# Adobe Stock expects its numeric category IDs
+ADOBE_STOCK_CATEGORIES = {
+    'animals': 1, 'architecture': 2, 'buildings': 2, 'business': 3, 'drinks': 4,
+    'environment': 5, 'emotions': 6, 'states of mind': 6, 'food': 7, 'graphic resources': 8,
+    'hobbies': 9, 'leisure': 9, 'industry': 10, 'landscapes': 11, 'nature': 11,
+    'lifestyle': 12, 'people': 13, 'plants': 14, 'flowers': 14, 'culture': 15,
+    'religion': 15, 'science': 16, 'healthcare': 16, 'social issues': 17, 'sports': 18,
+    'technology': 19, 'transport': 20, 'travel': 21,
+}
+
+
+def _keyword_list(keywords: Any) -> List[str]:
+    if isinstance(keywords, str):
+        keywords = keywords.split(',')
+    return [str(k).strip() for k in keywords or [] if str(k).strip()]
+
+
+def normalize_record(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten an export item into one record
+
+    Accepts flat records (title/keywords/...), extractor metadata (nested ai_analysis)
+    and batch results (metadata under 'metadata').
+    """
+    metadata = item.get('metadata') if isinstance(item.get('metadata'), dict) else item
+    ai_analysis = metadata.get('ai_analysis') or {}
+    optimization = metadata.get('microstock_optimization') or {}
+    filename = metadata.get('filename') or item.get('filename') or os.path.basename(item.get('image_path', ''))
+
+    return {
+        'filename': filename,
+        'title': metadata.get('title') or ai_analysis.get('ai_title', ''),
+        'description': metadata.get('description') or ai_analysis.get('ai_description', ''),
+        'keywords': _keyword_list(metadata.get('keywords') or ai_analysis.get('ai_keywords', '')),
+        'category': metadata.get('category') or ai_analysis.get('ai_category', ''),
+        'width': metadata.get('width', ''),
+        'height': metadata.get('height', ''),
+        'file_size': metadata.get('file_size', ''),
+        'quality_score': metadata.get('quality_score', optimization.get('quality_score', '')),
+        'created_date': metadata.get('created_date', ''),
+        'editorial': bool(metadata.get('editorial', False)),
+        'releases': metadata.get('releases', ''),
+    }
+
+
+def _adobe_category(category: str) -> Any:
+    return ADOBE_STOCK_CATEGORIES.get(str(category).strip().lower(), '')
+
+
+# CSV layouts: header row, row renderer and the agency's keyword limit (None = unlimited)
+CSV_LAYOUTS: Dict[str, Dict[str, Any]] = {
+    'csv': {
+        'header': ['filename', 'title', 'description', 'keywords', 'category', 'width', 'height',
+                   'file_size', 'quality_score'],
+        'row': lambda r, kw: [r['filename'], r['title'], r['description'], kw, r['category'],
+                              r['width'], r['height'], r['file_size'], r['quality_score']],
+        'keywords_max': None,
+    },
+    'shutterstock': {
+        'header': ['Filename', 'Description', 'Keywords', 'Categories', 'Editorial', 'Mature content',
+                   'illustration'],
+        'row': lambda r, kw: [r['filename'], r['description'] or r['title'], kw, r['category'],
+                              'yes' if r['editorial'] else 'no', 'no', 'no'],
+        'keywords_max': PLATFORM_REQUIREMENTS['shutterstock']['keywords_max'],
+    },
+    'adobe_stock': {
+        'header': ['Filename', 'Title', 'Keywords', 'Category', 'Releases'],
+        'row': lambda r, kw: [r['filename'], r['title'], kw, _adobe_category(r['category']), r['releases']],
+        'keywords_max': PLATFORM_REQUIREMENTS['adobe_stock']['keywords_max'],
+    },
+    'istock': {
+        'header': ['file name', 'created date', 'description', 'country', 'brief code', 'title', 'keywords'],
+        'row': lambda r, kw: [r['filename'], r['created_date'][:10], r['description'], '', '', r['title'], kw],
+        'keywords_max': PLATFORM_REQUIREMENTS['istock']['keywords_max'],
+    },
+}
+
+EXPORT_FORMATS = list(CSV_LAYOUTS) + ['json', 'jsonl']
+
+EXPORT_MIMETYPES = {'json': 'application/json', 'jsonl': 'application/x-ndjson'}
+
+
+def export_mimetype(fmt: str) -> str:
+    return EXPORT_MIMETYPES.get(fmt, 'text/csv')
+
+
+def export_extension(fmt: str) -> str:
+    return fmt if fmt in ('json', 'jsonl') else 'csv'
+
+
+class ExportWriter:
+    """Writes export items to a text file object one at a time in a single format"""
+
+    def __init__(self, file_obj: TextIO, fmt: str = 'csv'):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+        self.fmt = fmt
+        self.file_obj = file_obj
+        self.items_written = 0
+        self._layout = CSV_LAYOUTS.get(fmt)
+        if self._layout:
+            self._writer = csv.writer(file_obj)
+            self._writer.writerow(self._layout['header'])
+        elif fmt == 'json':
+            file_obj.write('[')
+
+    def write(self, item: Dict[str, Any], record: Optional[Dict[str, Any]] = None) -> None:
+        """Write one item; pass its normalize_record result to avoid recomputing it"""
+        if self._layout:
+            record = record or normalize_record(item)
+            keywords = record['keywords']
+            if self._layout['keywords_max'] and len(keywords) > self._layout['keywords_max']:
+                keywords = rank_keywords(keywords, record['title'], record['description'], record['category'],
+                                         limit=self._layout['keywords_max'])
+            self._writer.writerow(self._layout['row'](record, ', '.join(keywords)))
+        elif self.fmt == 'json':
+            self.file_obj.write((',\n' if self.items_written else '\n') + json.dumps(item, default=str))
+        else:
+            self.file_obj.write(json.dumps(item, default=str) + '\n')
+        self.items_written += 1
+
+    def close(self) -> None:
+        """Finish the document (closes the JSON array); does not close the file object"""
+        if self.fmt == 'json':
+            self.file_obj.write('\n]\n' if self.items_written else ']\n')
+
+
+def write_exports(items: Iterable[Dict[str, Any]], writers: List[ExportWriter]) -> int:
+    """Render every item into several formats in a single pass, normalizing each item once"""
+    needs_record = any(writer.fmt in CSV_LAYOUTS for writer in writers)
+    count = 0
+    for item in items:
+        record = normalize_record(item) if needs_record else None
+        for writer in writers:
+            writer.write(item, record)
+        count += 1
+    for writer in writers:
+        writer.close()
+    return count
+
+
+def iter_export(items: Iterable[Dict[str, Any]], fmt: str = 'csv',
+                chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    """Yield the export document in chunks of roughly chunk_size characters"""
+    buffer = io.StringIO()
+    writer = ExportWriter(buffer, fmt)
+
+    def drain() -> str:
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return chunk
+
+    for item in items:
+        writer.write(item)
+        if buffer.tell() >= chunk_size:
+            yield drain()
+    writer.close()
+    yield drain()
+
+
+# Archive entries with these suffixes are deflated; images are already compressed and stored as-is
+ZIP_DEFLATE_SUFFIXES = ('.csv', '.json', '.jsonl', '.txt')
+
+ZIP_MANIFEST_COLUMNS = ['archive_name', 'source_filename', 'title', 'description', 'keywords', 'category',
+                        'quality_score', 'success', 'error']
+
+
+class _ZipStreamSink(io.RawIOBase):
+    """Write-only sink that zipfile treats as unseekable, so entries use data descriptors"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _iter_entry_chunks(data: Union[bytes, BinaryIO], chunk_size: int) -> Iterator[bytes]:
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        view = memoryview(data)
+        for start in range(0, len(view), chunk_size):
+            yield view[start:start + chunk_size]
+    else:
+        yield from iter(lambda: data.read(chunk_size), b'')
+
+
+def iter_zip_archive(entries: Iterable[Tuple[str, Union[bytes, BinaryIO]]],
+                     chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Build a ZIP on the fly from (archive name, data) pairs, yielding archive bytes as they are produced
+
+    data is bytes or a binary file read from its current position. Entries are consumed lazily,
+    so memory holds at most one in-memory entry at a time.
+    """
+    sink = _ZipStreamSink()
+    with zipfile.ZipFile(sink, 'w') as archive:
+        for name, data in entries:
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED if name.lower().endswith(ZIP_DEFLATE_SUFFIXES) \
+                else zipfile.ZIP_STORED
+            with archive.open(info, 'w') as entry:
+                for piece in _iter_entry_chunks(data, chunk_size):
+                    entry.write(piece)
+                    chunk = sink.drain()
+                    if chunk:
+                        yield chunk
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    # Closing the archive writes the central directory
+    yield sink.drain()
+
+
+def manifest_row(archive_name: str, source_filename: str, result: Dict[str, Any]) -> List[Any]:
+    """One ZIP manifest row for a batch result"""
+    metadata = result.get('metadata') or {}
+    record = normalize_record(metadata)
+    return [archive_name, source_filename, record['title'], record['description'], ', '.join(record['keywords']),
+            record['category'], record['quality_score'], bool(result.get('success')),
+            result.get('error') or metadata.get('error', '')]
+
+
+def iter_jsonl_results(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield the successful results of a bulk ingest JSONL file one line at a time"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                result = json.loads(line)
+                if result.get('success', True):
+                    yield result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export bulk ingest results in one or more formats in a single pass")
+    parser.add_argument('results', help="JSONL results file written by bulk_ingest.py")
+    parser.add_argument('-f', '--format', dest='formats', action='append', choices=EXPORT_FORMATS,
+                        help="Export format (repeat for several; default: csv)")
+    parser.add_argument('-o', '--output-dir', default='.', help="Directory for the exported files")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(args.results))[0]
+    files, writers = [], []
+    try:
+        for fmt in dict.fromkeys(args.formats or ['csv']):
+            suffix = '' if fmt in ('csv', 'json', 'jsonl') else f'_{fmt}'
+            path = os.path.join(args.output_dir, f"{stem}{suffix}.{export_extension(fmt)}")
+            files.append(open(path, 'w', newline='', encoding='utf-8'))
+            writers.append(ExportWriter(files[-1], fmt))
+        count = write_exports(iter_jsonl_results(args.results), writers)
+    finally:
+        for f in files:
+            f.close()
+
+    for f in files:
+        print(f"📤 {f.name}", file=sys.stderr)
+    print(f"✅ Exported {count} images", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -104,6 +104,15 @@ MICROSTOCK_AVOID = [
     "specific locations", "recognizable landmarks", "faces without model releases"
 ]
 
+# Brand, trademark and landmark terms that agencies reject in titles, descriptions and keywords
+FORBIDDEN_TERMS = [
+    "logo", "trademark", "copyright", "iphone", "ipad", "macbook", "samsung", "google", "facebook",
+    "instagram", "whatsapp", "tiktok", "youtube", "microsoft", "netflix", "coca cola", "pepsi",
+    "starbucks", "mcdonalds", "nike", "adidas", "lego", "disney", "barbie", "bmw",
+    "eiffel tower", "statue of liberty", "empire state building", "sydney opera house",
+    "burj khalifa", "golden gate bridge", "big ben"
+]
+
 def get_microstock_enhancements(category: str = "business") -> dict:
     """Get microstock-specific enhancements for a category"""
     return {
@@ -139,4 +148,55 @@ INDUSTRY_KEYWORDS = {
     "education": ["learning", "knowledge", "study", "skill", "training", "development", "academic"],
     "lifestyle": ["wellness", "balance", "happiness", "family", "home", "comfort", "leisure", "joy"],
     "finance": ["investment", "savings", "planning", "wealth", "security", "banking", "financial"]
-}
\ No newline at end of file
+}
+# Metadata limits and submission requirements per microstock platform
+PLATFORM_REQUIREMENTS = {
+    "shutterstock": {
+        "title_max": 100,
+        "description_max": 200,
+        "keywords_max": 50,
+        "requirements": [
+            "No people names or locations",
+            "Professional quality required",
+            "Model releases needed for people",
+            "Property releases for recognizable buildings"
+        ],
+        "forbidden_terms": ["shutterstock"]
+    },
+    "getty": {
+        "title_max": 80,
+        "description_max": 150,
+        "keywords_max": 30,
+        "requirements": [
+            "Premium quality only",
+            "Strict editorial guidelines",
+            "Comprehensive releases required",
+            "High commercial value"
+        ],
+        "forbidden_terms": ["getty", "getty images", "istock"]
+    },
+    "adobe_stock": {
+        "title_max": 70,
+        "description_max": 200,
+        "keywords_max": 49,
+        "requirements": [
+            "AI-generated content must be disclosed",
+            "No Adobe trademarks",
+            "Model releases required",
+            "Technical quality standards"
+        ],
+        "forbidden_terms": ["adobe", "photoshop", "lightroom"]
+    },
+    "istock": {
+        "title_max": 100,
+        "description_max": 200,
+        "keywords_max": 50,
+        "requirements": [
+            "Getty Images subsidiary",
+            "Professional standards",
+            "Exclusive content preferred",
+            "Diverse representation valued"
+        ],
+        "forbidden_terms": ["istock", "istockphoto", "getty images"]
+    }
+}
@@ -0,0 +1,180 @@
+"""
+Platform Metadata Optimizer - Fits titles, descriptions and keywords to each platform's limits
+Rules are compiled once from PLATFORM_REQUIREMENTS and shared by single and batch requests
+"""
+
+import time
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from compliance_scanner import ComplianceScanner
+from keyword_ranking import dedupe_keywords, rank_keywords, trim_to_word_boundary
+from metadata_export import normalize_record
+from microstock_templates import PLATFORM_REQUIREMENTS
+
+DEFAULT_PLATFORM = "shutterstock"
+
+
+class PlatformRules(NamedTuple):
+    """Compiled limits and requirements for one platform"""
+    name: str
+    title_max: int
+    description_max: int
+    keywords_max: int
+    requirements: Tuple[str, ...]
+    forbidden_terms: Tuple[str, ...]
+
+
+def compile_platform_rules(requirements: Dict[str, Dict[str, Any]]) -> Dict[str, PlatformRules]:
+    """Build the immutable rules registry from the platform requirements table"""
+    return {
+        name: PlatformRules(
+            name=name,
+            title_max=int(spec["title_max"]),
+            description_max=int(spec["description_max"]),
+            keywords_max=int(spec["keywords_max"]),
+            requirements=tuple(spec.get("requirements", ())),
+            forbidden_terms=tuple(spec.get("forbidden_terms", ())),
+        )
+        for name, spec in requirements.items()
+    }
+
+
+class PlatformOptimizer:
+    """Optimizes metadata for one or many platforms using a precompiled rules registry"""
+
+    def __init__(self, requirements: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.rules = compile_platform_rules(requirements or PLATFORM_REQUIREMENTS)
+        self.scanner = ComplianceScanner.from_rules(self.rules)
+
+    @property
+    def platforms(self) -> List[str]:
+        return list(self.rules)
+
+    def get_rules(self, platform: str, strict: bool = False) -> PlatformRules:
+        """Rules for a platform; unknown platforms fall back to the default unless strict"""
+        rules = self.rules.get(platform)
+        if rules is None:
+            if strict:
+                raise ValueError(f"Unknown platform: {platform}")
+            rules = self.rules[DEFAULT_PLATFORM]
+        return rules
+
+    def resolve_platforms(self, platforms: Any) -> List[PlatformRules]:
+        """Validate a list of platform names ('all' or empty selects every platform)"""
+        if not platforms or platforms == "all":
+            return list(self.rules.values())
+        if isinstance(platforms, str):
+            platforms = [p.strip() for p in platforms.split(",") if p.strip()]
+        return [self.get_rules(platform, strict=True) for platform in dict.fromkeys(platforms)]
+
+    def optimize(self, title: str, description: str, keywords: Any, category: str = "business",
+                 platform: str = DEFAULT_PLATFORM) -> Dict[str, Any]:
+        """Fit one item's metadata to one platform"""
+        keyword_list = self._keyword_list(keywords)
+        rules = self.get_rules(platform)
+        findings = self.scanner.for_platform(self.scanner.scan(title, description, keyword_list), rules.name)
+        return self._apply(rules, title, description, keyword_list, category, platform, findings=findings)
+
+    def optimize_batch(self, items: Iterable[Dict[str, Any]], platforms: Any) -> Iterator[Dict[str, Any]]:
+        """Yield a result for every item x platform pair, parsing each item only once
+
+        Items may be flat records (title/description/keywords/category) or extractor metadata.
+        """
+        rules = self.resolve_platforms(platforms)
+        smallest_limit = min(r.keywords_max for r in rules) if rules else 0
+        for index, item in enumerate(items):
+            record = normalize_record(item)
+            title, description = record["title"], record["description"]
+            category = record["category"] or "business"
+            # De-duplicate and rank once per item; each platform then keeps its own top N
+            unique = dedupe_keywords(record["keywords"])
+            ranked = None
+            if len(unique) > smallest_limit and title and description:
+                ranked = rank_keywords(unique, title, description, category)
+            # One scan of all text fields covers every platform's forbidden terms
+            findings = self.scanner.scan(title, description, record["keywords"])
+            for platform_rules in rules:
+                if not title or not description:
+                    yield {"index": index, "filename": record["filename"], "platform": platform_rules.name,
+                           "success": False, "error": "Title and description are required"}
+                    continue
+                yield {
+                    "index": index,
+                    "filename": record["filename"],
+                    "platform": platform_rules.name,
+                    "success": True,
+                    "optimized": self._apply(platform_rules, title, description, record["keywords"], category,
+                                             unique_keywords=unique, ranked=ranked,
+                                             findings=self.scanner.for_platform(findings, platform_rules.name)),
+                }
+
+    @staticmethod
+    def _keyword_list(keywords: Any) -> List[str]:
+        if isinstance(keywords, str):
+            keywords = keywords.split(",")
+        return [str(kw).strip() for kw in keywords or [] if str(kw).strip()]
+
+    @staticmethod
+    def _apply(rules: PlatformRules, title: str, description: str, keyword_list: List[str],
+               category: str, platform: Optional[str] = None, unique_keywords: Optional[List[str]] = None,
+               ranked: Optional[List[str]] = None,
+               findings: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        if unique_keywords is None:
+            unique_keywords = dedupe_keywords(keyword_list)
+        optimized = {
+            "platform": platform or rules.name,
+            "title": trim_to_word_boundary(title, rules.title_max),
+            "description": trim_to_word_boundary(description, rules.description_max),
+            "keywords": ", ".join(unique_keywords),
+            "category": category,
+            "requirements": list(rules.requirements),
+            "compliance_check": {
+                "title_length": len(title) <= rules.title_max,
+                "description_length": len(description) <= rules.description_max,
+                "keywords_count": len(keyword_list) <= rules.keywords_max,
+                "forbidden_terms": not findings
+            }
+        }
+
+        if len(unique_keywords) < len(keyword_list):
+            optimized["duplicates_removed"] = len(keyword_list) - len(unique_keywords)
+
+        # Limit keywords if needed, keeping the most relevant ones
+        if len(unique_keywords) > rules.keywords_max:
+            ranked = ranked or rank_keywords(unique_keywords, title, description, category)
+            optimized["keywords"] = ", ".join(ranked[:rules.keywords_max])
+            optimized["keywords_truncated"] = True
+
+        # Add optimization suggestions
+        suggestions = []
+        if len(title) > rules.title_max:
+            suggestions.append(f"Title too long - max {rules.title_max} characters")
+        if len(description) > rules.description_max:
+            suggestions.append(f"Description too long - max {rules.description_max} characters")
+        if len(keyword_list) > rules.keywords_max:
+            suggestions.append(f"Too many keywords - max {rules.keywords_max} allowed")
+        if findings:
+            optimized["forbidden_terms"] = findings
+            terms = sorted({finding["term"] for finding in findings})
+            suggestions.append(f"Remove forbidden terms: {', '.join(terms)}")
+
+        optimized["suggestions"] = suggestions
+        optimized["compliant"] = len(suggestions) == 0
+        return optimized
+
+
+def throughput_stats(items: int, platforms: int, results: int, failed: int, started: float) -> Dict[str, Any]:
+    """Summary block for a batch run started at time.perf_counter() value `started`"""
+    elapsed = time.perf_counter() - started
+    return {
+        "items": items,
+        "platforms": platforms,
+        "results": results,
+        "failed": failed,
+        "elapsed_seconds": round(elapsed, 4),
+        "results_per_second": round(results / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+# Global optimizer instance
+platform_optimizer = PlatformOptimizer()
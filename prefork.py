@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Prefork production launcher for MJ Microstock Prompter
+
+The master imports the Flask app and warms templates, keyword tables, platform rules and the
+lazily imported imaging/provider libraries once, then forks workers that share those pages
+copy-on-write. Each worker serves the shared listening socket with a threaded WSGI server and
+is recycled after a configurable number of requests to contain memory growth.
+
+Signals (sent to the master):
+    SIGHUP           graceful reload: start a new master and workers on the same socket, then drain
+                     the old workers once the new ones are serving
+    SIGTERM, SIGINT  graceful shutdown: workers finish in-flight requests, then exit
+
+Usage:
+    python prefork.py --workers 4 --port 5000 --max-requests 1000
+"""
+
+import argparse
+import gc
+import importlib
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import Config
+
+logger = logging.getLogger("prefork")
+
+# Set on a reload so the new master keeps serving the already-bound socket
+LISTEN_FD_ENV = "PREFORK_LISTEN_FD"
+# Set on a reload to the old master's pid, which the new master signals once its workers are up
+PREDECESSOR_ENV = "PREFORK_PREDECESSOR_PID"
+# Sent by the new master to tell the old one to drain its workers and exit
+SUCCESSOR_READY = signal.SIGUSR1
+
+# Workers that exit with an error sooner than this after starting are respawned with a growing delay
+MIN_WORKER_LIFETIME_SECONDS = 5.0
+RESPAWN_BACKOFF_SECONDS = 0.5
+RESPAWN_BACKOFF_MAX_SECONDS = 30.0
+
+# Imported by the master so workers inherit them instead of importing on their first request
+PRELOAD_MODULES = ["numpy", "PIL.Image", "piexif", "image_hashing", "image_quality", "metadata_export"]
+
+
+def memory_usage(pid: Optional[int] = None) -> Dict[str, Optional[float]]:
+    """Resident (RSS) and proportional (PSS, shared pages split between processes) memory in MB"""
+    usage: Dict[str, Optional[float]] = {"rss_mb": None, "pss_mb": None}
+    proc = f"/proc/{pid or 'self'}"
+    for filename, field, key in (("status", "VmRSS:", "rss_mb"), ("smaps_rollup", "Pss:", "pss_mb")):
+        try:
+            with open(f"{proc}/{filename}") as f:
+                for line in f:
+                    if line.startswith(field):
+                        usage[key] = round(int(line.split()[1]) / 1024, 1)
+                        break
+        except OSError:
+            pass
+    if usage["rss_mb"] is None and pid is None:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        usage["rss_mb"] = round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    return usage
+
+
+def format_memory(usage: Dict[str, Optional[float]]) -> str:
+    text = f"rss {usage['rss_mb']} MB"
+    return text + (f", pss {usage['pss_mb']} MB" if usage["pss_mb"] is not None else "")
+
+
+def preload():
+    """Import the app and warm everything workers would otherwise build per process"""
+    from app import app
+    from controller import _load_genai, _load_openai
+    from keyword_ranking import category_stems
+    from microstock_templates import INDUSTRY_KEYWORDS, MICROSTOCK_CATEGORIES
+
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    for category in set(MICROSTOCK_CATEGORIES) | set(INDUSTRY_KEYWORDS):
+        category_stems(category)
+    for module in PRELOAD_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            logger.warning(f"Preload skipped {module}: {e}")
+    # Importing the SDKs is fork-safe; clients are still created per worker on first use
+    _load_genai()
+    _load_openai()
+
+    # Keep the garbage collector from touching (and so un-sharing) the preloaded objects
+    gc.collect()
+    gc.freeze()
+    return app
+
+
+def listen_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """Bind the shared listening socket, or adopt the one handed over by a reloading master"""
+    fd = os.environ.pop(LISTEN_FD_ENV, None)
+    if fd is not None:
+        sock = socket.socket(fileno=int(fd))
+    else:
+        family = socket.AF_INET6 if ":" in host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class RequestLimiter:
+    """WSGI middleware that calls on_limit once max_requests requests have been received"""
+
+    def __init__(self, app, max_requests: int, on_limit: Callable[[], None]):
+        self.app = app
+        self.max_requests = max_requests
+        self.on_limit = on_limit
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        with self._lock:
+            self.count += 1
+            reached = self.max_requests > 0 and self.count == self.max_requests
+        try:
+            return self.app(environ, start_response)
+        finally:
+            if reached:
+                self.on_limit()
+
+
+def run_worker(app, sock: socket.socket, worker_id: int, max_requests: int) -> int:
+    """Serve requests in a forked worker until recycled or told to stop"""
+    from werkzeug.serving import make_server
+
+    # Ctrl+C reaches the whole process group; the master decides how workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    def stop(*_args):
+        # shutdown() blocks until serve_forever returns, so it must not run on the serving thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    limiter = RequestLimiter(app, max_requests, stop)
+    host, port = sock.getsockname()[:2]
+    server = make_server(host, port, limiter, threaded=True, fd=sock.fileno())
+    # Let in-flight requests finish when the server closes
+    server.daemon_threads = False
+    server.block_on_close = True
+    signal.signal(signal.SIGTERM, stop)
+
+    logger.info(f"Worker {worker_id} ready (pid {os.getpid()}, {format_memory(memory_usage())}, "
+                f"recycles after {max_requests or 'unlimited'} requests)")
+    server.serve_forever()
+    server.server_close()
+    logger.info(f"Worker {worker_id} exiting after {limiter.count} requests")
+    return 0
+
+
+class Master:
+    """Forks, supervises, recycles and reloads workers sharing one listening socket"""
+
+    def __init__(self, app, sock: socket.socket, workers: int, max_requests: int, max_requests_jitter: int,
+                 graceful_timeout: float):
+        self.app = app
+        self.sock = sock
+        self.num_workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.workers: Dict[int, int] = {}  # pid -> worker id
+        self.signals: List[int] = []
+        self.started_at: Dict[int, float] = {}  # worker id -> monotonic start time
+        self.crashes: Dict[int, int] = {}  # worker id -> consecutive early crashes
+        self.respawn_at: Dict[int, float] = {}  # worker id -> monotonic time of the next spawn
+        self.successor: Optional[int] = None
+
+    def spawn(self, worker_id: int) -> int:
+        # Jitter keeps workers started together from all recycling at the same moment
+        limit = self.max_requests + random.randint(0, self.max_requests_jitter) if self.max_requests else 0
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                status = run_worker(self.app, self.sock, worker_id, limit)
+            except Exception as e:
+                logger.error(f"Worker {worker_id} crashed: {e}")
+            finally:
+                os._exit(status)
+        self.workers[pid] = worker_id
+        self.started_at[worker_id] = time.monotonic()
+        return pid
+
+    def reap(self) -> List[Tuple[int, int]]:
+        """Collect exited workers and return their (worker id, exit code) pairs"""
+        exited = []
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            if pid in self.workers:
+                exited.append((self.workers.pop(pid), os.waitstatus_to_exitcode(status)))
+            elif pid == self.successor:
+                self.successor = None
+                logger.error(f"New master exited during reload (code {os.waitstatus_to_exitcode(status)}); "
+                             f"the current workers keep serving")
+        return exited
+
+    def schedule_respawn(self, worker_id: int, exit_code: int, now: float) -> float:
+        """Queue a replacement for an exited worker, backing off while it keeps crashing at startup"""
+        lifetime = now - self.started_at.get(worker_id, now)
+        if exit_code != 0 and lifetime < MIN_WORKER_LIFETIME_SECONDS:
+            self.crashes[worker_id] = self.crashes.get(worker_id, 0) + 1
+        else:
+            self.crashes.pop(worker_id, None)
+
+        crashes = self.crashes.get(worker_id, 0)
+        delay = min(RESPAWN_BACKOFF_SECONDS * 2 ** (crashes - 1), RESPAWN_BACKOFF_MAX_SECONDS) if crashes else 0.0
+        if delay:
+            logger.warning(f"Worker {worker_id} crashed {crashes} time(s) in a row at startup, "
+                           f"starting a replacement in {delay:.1f}s")
+        else:
+            logger.info(f"Worker {worker_id} exited, starting a replacement")
+        self.respawn_at[worker_id] = now + delay
+        return delay
+
+    def stop_workers(self):
+        """SIGTERM every worker and wait for them to drain, killing any that exceed the timeout"""
+        for pid in list(self.workers):
+            self._signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.05)
+        for pid in list(self.workers):
+            logger.warning(f"Worker pid {pid} did not stop within {self.graceful_timeout}s, killing it")
+            self._signal(pid, signal.SIGKILL)
+        while self.workers:
+            self.reap()
+            time.sleep(0.01)
+
+    @staticmethod
+    def _signal(pid: int, signum: int):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def report(self, started: float):
+        """Log startup time and master memory (each worker logs its own when ready)"""
+        logger.info(f"Master pid {os.getpid()} up in {(time.perf_counter() - started) * 1000:.0f} ms "
+                    f"with {len(self.workers)} workers, {format_memory(memory_usage())}")
+
+    def run(self, started: float) -> int:
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, SUCCESSOR_READY):
+            signal.signal(signum, lambda signum, _frame: self.signals.append(signum))
+
+        for worker_id in range(1, self.num_workers + 1):
+            self.spawn(worker_id)
+        host, port = self.sock.getsockname()[:2]
+        logger.info(f"Serving on http://{host}:{port}")
+        self.report(started)
+
+        predecessor = os.environ.pop(PREDECESSOR_ENV, None)
+        if predecessor:
+            # Our workers share the socket now, so the old master can drain its own
+            self._signal(int(predecessor), SUCCESSOR_READY)
+
+        while True:
+            if self.signals:
+                signum = self.signals.pop(0)
+                if signum == signal.SIGHUP:
+                    self.reload()
+                    continue
+                if signum == SUCCESSOR_READY:
+                    logger.info("New master is serving, stopping old workers gracefully")
+                else:
+                    logger.info(f"Received {signal.Signals(signum).name}, stopping workers gracefully")
+                    # A shutdown requested mid-reload also stops the master that was starting
+                    if self.successor:
+                        self._signal(self.successor, signal.SIGTERM)
+                self.stop_workers()
+                return 0
+
+            now = time.monotonic()
+            for worker_id, exit_code in self.reap():
+                self.schedule_respawn(worker_id, exit_code, now)
+            for worker_id, due in list(self.respawn_at.items()):
+                if due <= now:
+                    del self.respawn_at[worker_id]
+                    self.spawn(worker_id)
+            time.sleep(0.1)
+
+    def reload(self):
+        """Start a fresh master on the listening socket; it signals this one to drain once its workers are up
+
+        The current workers keep serving while the new master preloads, and if it fails to start
+        they simply carry on.
+        """
+        if self.successor:
+            logger.warning("Reload already in progress, ignoring SIGHUP")
+            return
+        logger.info("Reloading: starting a new master")
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.environ[LISTEN_FD_ENV] = str(self.sock.fileno())
+                os.environ[PREDECESSOR_ENV] = str(os.getppid())
+                os.execv(sys.executable, [sys.executable] + sys.argv)
+            finally:
+                os._exit(1)
+        self.successor = pid
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Prefork production server for MJ Microstock Prompter")
+    parser.add_argument("--host", default=Config.PREFORK_HOST)
+    parser.add_argument("--port", type=int, default=Config.PREFORK_PORT)
+    parser.add_argument("-w", "--workers", type=int, default=Config.PREFORK_WORKERS)
+    parser.add_argument("--max-requests", type=int, default=Config.PREFORK_MAX_REQUESTS,
+                        help="Recycle a worker after this many requests (0 disables)")
+    parser.add_argument("--max-requests-jitter", type=int, default=Config.PREFORK_MAX_REQUESTS_JITTER)
+    parser.add_argument("--graceful-timeout", type=float, default=Config.PREFORK_GRACEFUL_TIMEOUT)
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        sys.exit("The prefork launcher needs os.fork(); use 'python app.py' on this platform")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(process)d] %(levelname)s %(message)s")
+    started = time.perf_counter()
+    sock = listen_socket(args.host, args.port)
+    app = preload()
+    logger.info(f"Preloaded app in {(time.perf_counter() - started) * 1000:.0f} ms "
+                f"({format_memory(memory_usage())})")
+
+    master = Master(app, sock, args.workers, args.max_requests, args.max_requests_jitter, args.graceful_timeout)
+    return master.run(started)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
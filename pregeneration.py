@@ -0,0 +1,221 @@
+"""
+Background pre-generation of popular prompts
+Counts which subjects, styles and settings are requested, and while the app is idle generates
+prompts for the most requested ones (seeded with the trending subjects) within an hourly token
+budget, so a matching request is served from the pool without waiting on a provider
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+from config import Config
+from singleflight import request_key
+
+logger = logging.getLogger(__name__)
+
+# Generator methods worth pre-generating (Imagen prompts are built locally and cost nothing)
+PREGEN_METHODS = {"prompt_generator", "flux_prompt_generator"}
+# Demand credited to a seed spec before any request for it has been seen
+SEED_WEIGHT = 0.5
+BUDGET_WINDOW_SECONDS = 3600
+
+
+class PregenSpec(NamedTuple):
+    """One generation request shape: provider, model, generator method and its arguments"""
+    provider: str
+    model: Optional[str]
+    method: str
+    kwargs: Dict[str, Any]
+
+
+def spec_key(spec: PregenSpec) -> str:
+    return request_key(spec.provider, spec.model, spec.method, spec.kwargs)
+
+
+class PregenerationPool:
+    """Idle-time generator and store of prompts for the most requested specs"""
+
+    def __init__(self, generator_factory: Optional[Callable[..., Any]] = None):
+        self.generator_factory = generator_factory
+        self.seed_factory: Optional[Callable[[], List[PregenSpec]]] = None
+        self._lock = threading.Lock()
+        self._specs: Dict[str, PregenSpec] = {}
+        self._demand: Dict[str, float] = {}
+        self._cache: Dict[str, Deque[Tuple[float, Dict[str, Any]]]] = {}
+        self._generators: Dict[Tuple[str, Optional[str]], Any] = {}
+        self._last_request = 0.0
+        self._window_start = time.monotonic()
+        self._spent = 0
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stop = threading.Event()
+        self.hits = self.misses = self.generated = self.failures = 0
+
+    def observe(self, spec: PregenSpec, count: int = 1):
+        """Count count requested prompts for spec and start the background worker if it is not running"""
+        if not Config.PREGEN_ENABLED or spec.method not in PREGEN_METHODS:
+            return
+        self._ensure_started()
+        key = spec_key(spec)
+        with self._lock:
+            self._last_request = time.monotonic()
+            self._specs.setdefault(key, spec)
+            self._demand[key] = self._demand.get(key, 0.0) + count
+            self._evict(keep=key)
+
+    def take(self, spec: PregenSpec) -> Optional[Dict[str, Any]]:
+        """A pre-generated result for spec, or None; with PREGEN_UNIQUE each result is served once"""
+        if not Config.PREGEN_ENABLED or spec.method not in PREGEN_METHODS:
+            return None
+        key = spec_key(spec)
+        with self._lock:
+            entries = self._cache.get(key)
+            while entries and time.monotonic() - entries[0][0] > Config.PREGEN_TTL_SECONDS:
+                entries.popleft()
+            if not entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            _created, result = entries.popleft() if Config.PREGEN_UNIQUE else entries[0]
+            return dict(result, pregenerated=True)
+
+    def seed(self, specs: List[PregenSpec]):
+        """Make specs candidates for pre-generation before they have been requested"""
+        with self._lock:
+            for spec in specs:
+                if spec.method in PREGEN_METHODS:
+                    key = spec_key(spec)
+                    self._specs.setdefault(key, spec)
+                    self._demand.setdefault(key, SEED_WEIGHT)
+            self._evict()
+
+    def run_once(self) -> int:
+        """Generate one prompt for each of the most demanded specs still short of PREGEN_PER_SPEC
+
+        Stops when a request arrives or the hourly token budget is spent; returns how many were generated.
+        """
+        generated = 0
+        for key, spec in self._candidates():
+            if not self._idle():
+                break
+            try:
+                generator = self._generator(spec)
+                if not self._reserve(generator.estimate_call_tokens(spec.method, **spec.kwargs)):
+                    break
+                result = getattr(generator, spec.method)(**spec.kwargs)
+            except Exception as e:
+                self.failures += 1
+                logger.warning(f"Pre-generation for {spec.kwargs.get('main_base')!r} failed: {e}")
+                continue
+            with self._lock:
+                self._cache.setdefault(key, deque()).append((time.monotonic(), result))
+                self.generated += 1
+            generated += 1
+        return generated
+
+    def _candidates(self) -> List[Tuple[str, PregenSpec]]:
+        with self._lock:
+            ranked = sorted(self._demand, key=self._demand.get, reverse=True)
+            candidates = [(key, self._specs[key]) for key in ranked
+                          if len(self._cache.get(key, ())) < Config.PREGEN_PER_SPEC
+                          and self._has_server_key(self._specs[key].provider)]
+        return candidates[:Config.PREGEN_BATCH]
+
+    @staticmethod
+    def _has_server_key(provider: str) -> bool:
+        # Background work never uses a requester's own key
+        try:
+            return bool(Config.get_api_key(provider)) or not Config.requires_api_key(provider)
+        except ValueError:
+            return False
+
+    def _generator(self, spec: PregenSpec):
+        if (spec.provider, spec.model) not in self._generators:
+            factory = self.generator_factory
+            if factory is None:
+                from controller import PrompterGenerator as factory
+            self._generators[(spec.provider, spec.model)] = factory(
+                api_key=Config.get_api_key(spec.provider), model_name=spec.model, provider=spec.provider)
+        return self._generators[(spec.provider, spec.model)]
+
+    def _idle(self) -> bool:
+        return time.monotonic() - self._last_request >= Config.PREGEN_IDLE_SECONDS
+
+    def _reserve(self, tokens: int) -> bool:
+        """Charge tokens to this hour's PREGEN_TOKEN_BUDGET, or False if they do not fit"""
+        with self._lock:
+            if time.monotonic() - self._window_start >= BUDGET_WINDOW_SECONDS:
+                self._window_start = time.monotonic()
+                self._spent = 0
+                # Older demand counts for less each hour, so the pool follows what is popular now
+                for key in self._demand:
+                    self._demand[key] /= 2
+            if self._spent + tokens > Config.PREGEN_TOKEN_BUDGET:
+                return False
+            self._spent += tokens
+            return True
+
+    def _evict(self, keep: Optional[str] = None):
+        """Forget the coldest specs beyond PREGEN_MAX_TRACKED, preferring ones without cached prompts"""
+        while len(self._demand) > max(Config.PREGEN_MAX_TRACKED, 1 if keep else 0):
+            candidates = [key for key in self._demand if key != keep]
+            uncached = [key for key in candidates if not self._cache.get(key)]
+            self._forget(min(uncached or candidates, key=self._demand.get))
+
+    def _forget(self, key: str):
+        self._specs.pop(key, None)
+        self._demand.pop(key, None)
+        self._cache.pop(key, None)
+
+    def _ensure_started(self):
+        # A forked worker process inherits the pool but not its thread
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="pregeneration", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        if self.seed_factory is not None:
+            try:
+                self.seed(self.seed_factory())
+            except Exception as e:
+                logger.warning(f"Could not seed the pre-generation pool: {e}")
+        while not self._stop.wait(Config.PREGEN_INTERVAL_SECONDS):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Pre-generation round failed: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            cached = sum(len(entries) for entries in self._cache.values())
+            tracked, spent = len(self._demand), self._spent
+        served = self.hits + self.misses
+        return {
+            "enabled": Config.PREGEN_ENABLED,
+            "tracked_specs": tracked,
+            "cached_prompts": cached,
+            "generated": self.generated,
+            "failures": self.failures,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / served, 3) if served else 0.0,
+            "tokens_spent_this_hour": spent,
+            "token_budget_per_hour": Config.PREGEN_TOKEN_BUDGET,
+        }
+
+
+# Global pool shared by every request in the process
+pregeneration_pool = PregenerationPool()
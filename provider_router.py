@@ -0,0 +1,355 @@
+"""
+Health-based provider selection with hedged requests
+When the chosen provider is slower than its usual latency percentile (or fails), the same call
+is sent to the next healthy configured provider and the first good answer wins, so a provider
+incident bounds tail latency instead of stalling every request
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from config import Config
+from singleflight import CoalescingGenerator
+
+logger = logging.getLogger(__name__)
+
+# Generator methods that are hedged; any other attribute is served by the healthiest generator
+HEDGED_METHODS = {"prompt_generator", "flux_prompt_generator", "storyboard_generator"}
+ASYNC_HEDGED_METHODS = {"aprompt_generator", "aflux_prompt_generator", "astoryboard_generator"}
+# SDK error classes (OpenAI, Google API core) that mean the provider, not the request, failed
+PROVIDER_FAILURE_NAMES = ("Timeout", "APIConnectionError", "RateLimitError", "InternalServerError",
+                          "ServiceUnavailable", "ResourceExhausted", "DeadlineExceeded", "BadGateway")
+
+
+class ProviderHealth:
+    """Recent latency and outcomes of one provider method, with a circuit breaker after repeated failures"""
+
+    def __init__(self, name: str, method: str = "", window: int = 200):
+        self.name = name
+        self.method = method
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.calls = self.failures = self.hedges = self.wins = 0  # wins: backup requests that answered first
+        self._lock = threading.Lock()
+
+    def record(self, ok: bool, seconds: float):
+        with self._lock:
+            self.calls += 1
+            self.outcomes.append(ok)
+            if ok:
+                self.latencies.append(seconds)
+                self.consecutive_failures = 0
+                self.open_until = 0.0
+            else:
+                self.failures += 1
+                self.consecutive_failures += 1
+                if self.consecutive_failures >= Config.ROUTER_CIRCUIT_FAILURES:
+                    self.open_until = time.monotonic() + Config.ROUTER_CIRCUIT_COOLDOWN_SECONDS
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            values = sorted(self.latencies)
+        if not values:
+            return None
+        return values[max(1, math.ceil(pct / 100 * len(values))) - 1]
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    @property
+    def circuit_open(self) -> bool:
+        return time.monotonic() < self.open_until
+
+    @property
+    def healthy(self) -> bool:
+        return not self.circuit_open and self.error_rate <= Config.ROUTER_MAX_ERROR_RATE
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for this provider before sending a backup request"""
+        if len(self.latencies) < Config.HEDGE_MIN_SAMPLES:
+            return Config.HEDGE_DEFAULT_DELAY_SECONDS
+        return max(Config.HEDGE_MIN_DELAY_SECONDS, self.percentile(Config.HEDGE_PERCENTILE))
+
+    def stats(self) -> Dict[str, Any]:
+        p50, p99 = self.percentile(50), self.percentile(99)
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "error_rate": round(self.error_rate, 3),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p99_ms": round(p99 * 1000, 1) if p99 is not None else None,
+            "hedges_sent": self.hedges,
+            "hedges_won": self.wins,
+            "circuit_open": self.circuit_open,
+            "healthy": self.healthy,
+        }
+
+
+class ProviderRouter:
+    """Orders providers by health and runs generator calls with a hedged backup
+
+    Health is kept per (provider, method), so slow storyboards do not stretch the hedge delay of
+    single prompts; the sync and async variants of a method share theirs.
+    """
+
+    def __init__(self):
+        self.health: Dict[Tuple[str, str], ProviderHealth] = {}
+        self._lock = threading.Lock()
+
+    def health_of(self, provider: str, method: str) -> ProviderHealth:
+        method = method_key(method)
+        with self._lock:
+            if (provider, method) not in self.health:
+                self.health[(provider, method)] = ProviderHealth(provider, method)
+            return self.health[(provider, method)]
+
+    def _known_health(self, provider: str, method: Optional[str]) -> List[ProviderHealth]:
+        """Recorded health of one provider method, or of all its methods, without creating entries"""
+        method = method_key(method) if method else None
+        with self._lock:
+            return [health for (name, key), health in self.health.items()
+                    if name == provider and method in (None, key)]
+
+    def order(self, generators: List[Any], method: Optional[str] = None) -> List[Any]:
+        """Healthy generators first, open circuits last, otherwise in the requested order
+
+        Without a method, a provider counts as unhealthy when any of its methods is.
+        """
+        def key(indexed):
+            index, generator = indexed
+            healths = self._known_health(provider_name(generator), method)
+            return (any(h.circuit_open for h in healths), not all(h.healthy for h in healths), index)
+        return [generator for _, generator in sorted(enumerate(generators), key=key)]
+
+    def _start(self, generator: Any, method: str, args: Tuple, kwargs: Dict) -> Tuple[Future, threading.Event]:
+        """Run one call on its own thread, returning its future and an event set once it is running
+
+        A dedicated thread means a call never waits in a queue, so the hedge clock measures the
+        provider rather than local congestion, and concurrency is bounded by the server's own threads.
+        """
+        health = self.health_of(provider_name(generator), method)
+        future: Future = Future()
+        running = threading.Event()
+
+        def run():
+            future.set_running_or_notify_cancel()
+            running.set()
+            started = time.perf_counter()
+            try:
+                result = getattr(generator, method)(*args, **kwargs)
+            except Exception as e:
+                if is_provider_failure(e):
+                    health.record(False, time.perf_counter() - started)
+                future.set_exception(e)
+                return
+            health.record(True, time.perf_counter() - started)
+            future.set_result(result)
+
+        threading.Thread(target=run, name=f"hedge-{health.name}", daemon=True).start()
+        return future, running
+
+    def call(self, generators: List[Any], method: str, args: Tuple = (), kwargs: Optional[Dict] = None) -> Any:
+        """Run method on the healthiest generator, hedging to the next one when it is slow or the provider fails
+
+        A caller error (bad key, invalid input) is not failed over: it is raised unless a call already running succeeds.
+        """
+        candidates = self.order(generators, method)
+        pending: Dict[Future, Any] = {}
+        errors: List[Exception] = []
+
+        def launch(hedge: bool) -> Optional[threading.Event]:
+            if not candidates:
+                return None
+            generator = candidates.pop(0)
+            if hedge:
+                self.health_of(provider_name(generator), method).hedges += 1
+            future, running = self._start(generator, method, args, kwargs or {})
+            pending[future] = generator
+            return running
+
+        first = candidates[0]
+        # The hedge clock starts once the primary is actually running
+        launch(hedge=False).wait()
+        deadline = self.health_of(provider_name(first), method).hedge_delay()
+        while pending:
+            done, _ = wait(list(pending), timeout=deadline, return_when=FIRST_COMPLETED)
+            if not done:
+                # The primary is slower than its usual tail: race a backup against it
+                deadline = None
+                launch(hedge=True)
+                continue
+            for future in done:
+                generator = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    logger.warning(f"{provider_name(generator)} {method} failed: {e}")
+                    if not is_provider_failure(e):
+                        # The caller's key or input is at fault: another provider would not help
+                        candidates.clear()
+                    launch(hedge=True)
+                    continue
+                if generator is not first:
+                    self.health_of(provider_name(generator), method).wins += 1
+                # A losing call still running finishes in the background
+                return result
+        raise errors[0] if errors else RuntimeError(f"No provider available for {method}")
+
+    async def acall(self, generators: List[Any], method: str, args: Tuple = (), kwargs: Optional[Dict] = None) -> Any:
+        """Async call: the losing request is cancelled rather than left running"""
+        candidates = self.order(generators, method)
+        pending: Dict[asyncio.Task, Any] = {}
+        errors: List[Exception] = []
+
+        async def timed(generator: Any) -> Any:
+            health = self.health_of(provider_name(generator), method)
+            started = time.perf_counter()
+            try:
+                result = await getattr(generator, method)(*args, **(kwargs or {}))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if is_provider_failure(e):
+                    health.record(False, time.perf_counter() - started)
+                raise
+            health.record(True, time.perf_counter() - started)
+            return result
+
+        def launch(hedge: bool) -> bool:
+            if not candidates:
+                return False
+            generator = candidates.pop(0)
+            if hedge:
+                self.health_of(provider_name(generator), method).hedges += 1
+            pending[asyncio.ensure_future(timed(generator))] = generator
+            return True
+
+        first = candidates[0]
+        launch(hedge=False)
+        deadline = self.health_of(provider_name(first), method).hedge_delay()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(list(pending), timeout=deadline, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    deadline = None
+                    launch(hedge=True)
+                    continue
+                for task in done:
+                    generator = pending.pop(task)
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                        logger.warning(f"{provider_name(generator)} {method} failed: {task.exception()}")
+                        if not is_provider_failure(task.exception()):
+                            candidates.clear()
+                        launch(hedge=True)
+                        continue
+                    if generator is not first:
+                        self.health_of(provider_name(generator), method).wins += 1
+                    return task.result()
+            raise errors[0] if errors else RuntimeError(f"No provider available for {method}")
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        with self._lock:
+            healths = list(self.health.values())
+        stats: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for health in healths:
+            stats.setdefault(health.name, {})[health.method] = health.stats()
+        return stats
+
+
+def provider_name(generator: Any) -> str:
+    provider = getattr(generator, "provider", None)
+    return str(getattr(provider, "value", provider))
+
+
+def is_provider_failure(error: BaseException) -> bool:
+    """Whether an error is the provider's fault (timeout, connection, 429 or 5xx) rather than the caller's
+
+    Only these count against a provider's health and fail over; auth and validation errors come from
+    one caller's key or input. Generators wrap SDK errors, so the whole __cause__ chain is checked.
+    """
+    while error is not None:
+        if isinstance(error, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+            return True
+        status = getattr(error, "status_code", None)
+        if status is None:
+            status = getattr(error, "code", None)
+        if isinstance(status, int) and (status == 429 or status >= 500):
+            return True
+        if any(marker in type(error).__name__ for marker in PROVIDER_FAILURE_NAMES):
+            return True
+        error = error.__cause__
+    return False
+
+
+def method_key(method: str) -> str:
+    """The health key of a generator method: async variants share their sync method's"""
+    return method[1:] if method in ASYNC_HEDGED_METHODS else method
+
+
+class HedgedGenerator:
+    """PrompterGenerator look-alike that spreads calls over several providers' generators"""
+
+    def __init__(self, generators: List[Any], router: Optional[ProviderRouter] = None):
+        self.generators = generators
+        self.router = router or provider_router
+
+    def __getattr__(self, name: str):
+        if name in HEDGED_METHODS:
+            return lambda *args, **kwargs: self.router.call(self.generators, name, args, kwargs)
+        if name in ASYNC_HEDGED_METHODS:
+            return lambda *args, **kwargs: self.router.acall(self.generators, name, args, kwargs)
+        # Streaming and everything else goes to the healthiest provider without a hedge
+        return getattr(self.select(), name)
+
+    def select(self) -> Any:
+        """The healthiest generator; a stream resolves it once so its reported provider is the one that streamed"""
+        return self.router.order(self.generators)[0]
+
+
+def select_generator(generator: Any) -> Any:
+    """The single generator that serves a request's unhedged calls (streams), looking through coalescing"""
+    inner = generator.generator if isinstance(generator, CoalescingGenerator) else generator
+    return inner.select() if isinstance(inner, HedgedGenerator) else generator
+
+
+def with_failover(primary: Any, factory: Callable[..., Any], keys: Optional[Dict[str, str]] = None) -> Any:
+    """Wrap a generator in a HedgedGenerator when the request carries a key for another provider
+
+    keys maps provider names to the requester's own backup keys. The server's keys back a request up
+    only with HEDGE_SERVER_KEYS, since otherwise any caller (even with a bogus key) could spend the
+    operator's quota. factory(api_key=..., model_name=..., provider=...) builds the backup generators.
+    """
+    if not Config.HEDGING_ENABLED or provider_name(primary) not in Config.HEDGE_PROVIDERS:
+        return primary
+    backups = []
+    for provider in Config.HEDGE_PROVIDERS:
+        if provider == provider_name(primary):
+            continue
+        api_key = (keys or {}).get(provider) or (Config.get_api_key(provider) if Config.HEDGE_SERVER_KEYS else "")
+        if not api_key:
+            continue
+        try:
+            backups.append(factory(api_key=api_key, provider=provider,
+                                   model_name=Config.get_models_for_provider(provider)[0]))
+        except Exception as e:
+            logger.warning(f"Backup provider {provider} unavailable: {e}")
+    return HedgedGenerator([primary] + backups) if backups else primary
+
+
+# Global router shared by every request in the process
+provider_router = ProviderRouter()
@@ -22,7 +22,7 @@ try:
 except ImportError as e:
     print(f"❌ Import error: {e}")
     print("📋 Please install Flask dependencies first:")
-    print("   pip install flask python-dotenv google-generativeai openai pillow piexif pandas")
+    print("   pip install flask python-dotenv google-generativeai openai pillow piexif")
 
 except Exception as e:
     print(f"❌ Error: {e}")
\ No newline at end of file
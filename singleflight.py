@@ -0,0 +1,159 @@
+"""
+Request coalescing for identical in-flight generations
+Concurrent calls with the same normalized inputs share one upstream provider call and
+every waiter receives its result
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+import re
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from config import Config
+
+# Generator methods whose results are shared between identical concurrent requests
+COALESCED_METHODS = {"prompt_generator", "flux_prompt_generator", "imagen_prompt_generator", "storyboard_generator"}
+ASYNC_COALESCED_METHODS = {"a" + name for name in COALESCED_METHODS}
+
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(value: Any) -> Any:
+    """Case- and whitespace-insensitive form of request inputs"""
+    if isinstance(value, str):
+        return WHITESPACE.sub(" ", value).strip().casefold()
+    if isinstance(value, dict):
+        return {str(k): normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(v) for v in value]
+    return value
+
+
+def request_key(*parts: Any) -> str:
+    """Stable digest of normalized request parts"""
+    encoded = json.dumps(normalize(parts), sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key"""
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._tasks: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.upstream = 0
+
+    def _count(self, leader: bool):
+        with self._lock:
+            self.calls += 1
+            self.upstream += leader
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Run fn, or wait for the identical call already in flight and share its result"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        self._count(leader)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async do: the shared call runs as its own task, so one waiter disconnecting does not cancel it"""
+        loop = asyncio.get_running_loop()
+        task = self._tasks.get(key)
+        leader = task is None or task.get_loop() is not loop
+        if leader:
+            task = self._tasks[key] = loop.create_task(fn())
+            task.add_done_callback(lambda done: self._tasks.pop(key, None) if self._tasks.get(key) is done else None)
+        self._count(leader)
+        result = await asyncio.shield(task)
+        return result if leader else copy.deepcopy(result)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls) + len(self._tasks)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls, upstream = self.calls, self.upstream
+        return {
+            "enabled": Config.COALESCING_ENABLED,
+            "calls": calls,
+            "upstream_calls": upstream,
+            "coalesced": calls - upstream,
+            "coalescing_ratio": round((calls - upstream) / calls, 3) if calls else 0.0,
+            "in_flight": self.in_flight,
+        }
+
+
+class CoalescingGenerator:
+    """Generator wrapper that routes generation calls through a SingleFlight
+
+    scope identifies everything outside the call arguments that changes the answer
+    (provider, model, credentials including backup keys, seed, output cap).
+    """
+
+    def __init__(self, generator: Any, scope: tuple, flight: Optional[SingleFlight] = None):
+        self.generator = generator
+        self.scope = scope
+        self.flight = flight or singleflight
+
+    def __getattr__(self, name: str):
+        method = getattr(self.generator, name)
+        if name in ASYNC_COALESCED_METHODS:
+            async def coalesced_async(*args, **kwargs):
+                key = request_key(self.scope, name, args, kwargs)
+                return await self.flight.ado(key, lambda: method(*args, **kwargs))
+            return coalesced_async
+        if name not in COALESCED_METHODS:
+            return method
+
+        def coalesced(*args, **kwargs):
+            key = request_key(self.scope, name, args, kwargs)
+            return self.flight.do(key, lambda: method(*args, **kwargs))
+        return coalesced
+
+
+def coalesce(generator: Any, data: Dict) -> Any:
+    """Wrap a request's generator so identical concurrent requests share upstream calls"""
+    if not Config.COALESCING_ENABLED:
+        return generator
+    # Backup keys are part of the credential: a shared call could otherwise fail over on someone else's key
+    backups = data.get("backup_api_keys")
+    backups = sorted(backups.items()) if isinstance(backups, dict) else []
+    credential = hashlib.sha256(repr((data.get("api_key") or "", backups)).encode("utf-8")).hexdigest()
+    scope = (data.get("provider", "gemini"), data.get("model"), credential, data.get("seed"), data.get("max_tokens"))
+    return CoalescingGenerator(generator, scope)
+
+
+# Global coalescer shared by every request in the process
+singleflight = SingleFlight()
@@ -59,6 +59,37 @@ function downloadJSON(data, filename) {
     document.body.removeChild(element);
 }
 
+// POST JSON with stream=ndjson and call onEvent for each event as it arrives
+async function streamEvents(url, data, onEvent) {
+    const response = await fetch(url, {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify(Object.assign({}, data, {stream: 'ndjson'}))
+    });
+    if (!response.ok) {
+        const result = await response.json();
+        throw new Error(result.error || response.statusText);
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const {done, value} = await reader.read();
+        buffer += decoder.decode(value || new Uint8Array(), {stream: !done});
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        for (const line of lines) {
+            if (line.trim()) {
+                onEvent(JSON.parse(line));
+            }
+        }
+        if (done) {
+            break;
+        }
+    }
+}
+
 // Initialize Bootstrap tooltips
 document.addEventListener('DOMContentLoaded', function() {
     var tooltipTriggerList = [].slice.call(document.querySelectorAll('[data-bs-toggle="tooltip"]'));
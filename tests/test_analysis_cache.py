@@ -0,0 +1,109 @@
+import unittest
+import os
+import sys
+import tempfile
+from fractions import Fraction
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from analysis_cache import AnalysisCache
+
+
+class TestAnalysisCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = AnalysisCache(max_entries=3)
+
+    def tearDown(self):
+        self.cache.close()
+
+    def test_round_trip_and_stats(self):
+        """Test that stored payloads come back and lookups are counted."""
+        self.assertIsNone(self.cache.get("abc", "gemini", "gemini-1.5-pro"))
+        self.cache.set("abc", "gemini", "gemini-1.5-pro", {"ai_title": "Team meeting"})
+
+        self.assertEqual(self.cache.get("abc", "gemini", "gemini-1.5-pro"), {"ai_title": "Team meeting"})
+        stats = self.cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["entries"], 1)
+
+    def test_key_includes_provider_model_and_kind(self):
+        """Test that the same image under another provider, model or kind is a miss."""
+        self.cache.set("abc", "gemini", "gemini-1.5-pro", {"v": 1})
+
+        self.assertIsNone(self.cache.get("abc", "openai", "gemini-1.5-pro"))
+        self.assertIsNone(self.cache.get("abc", "gemini", "gemini-2.5-flash"))
+        self.assertIsNone(self.cache.get("abc", "gemini", "gemini-1.5-pro", kind="ai_analysis"))
+
+    def test_evicts_least_recently_used(self):
+        """Test that the entry bound evicts the least recently accessed entry."""
+        for digest in ("a", "b", "c"):
+            self.cache.set(digest, "none", "none", {"digest": digest})
+        self.cache.get("a", "none", "none")
+        self.cache.set("d", "none", "none", {"digest": "d"})
+
+        self.assertIsNone(self.cache.get("b", "none", "none"))
+        self.assertIsNotNone(self.cache.get("a", "none", "none"))
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_byte_bound(self):
+        """Test that the size bound evicts entries to stay under max_bytes."""
+        cache = AnalysisCache(max_bytes=200)
+        cache.set("a", "none", "none", {"blob": "x" * 120})
+        cache.set("b", "none", "none", {"blob": "y" * 120})
+
+        self.assertLessEqual(cache.stats()["size_bytes"], 200)
+        self.assertIsNone(cache.get("a", "none", "none"))
+        cache.close()
+
+    def test_perceptual_hashes(self):
+        """Test that perceptual hashes round-trip per provider/model and follow eviction."""
+        self.cache.set("a", "gemini", "m", {"v": 1}, kind="ai_analysis")
+        self.cache.set_phash("a", "gemini", "m", 0xFFFF000000000001)
+
+        self.assertEqual(list(self.cache.iter_phashes("gemini", "m")), [("a", 0xFFFF000000000001)])
+        self.assertEqual(list(self.cache.iter_phashes("openai", "m")), [])
+
+        for digest in ("b", "c", "d"):
+            self.cache.set(digest, "gemini", "m", {"v": 1})
+        self.assertEqual(list(self.cache.iter_phashes("gemini", "m")), [])
+
+    def test_persists_across_instances(self):
+        """Test that a file-backed cache survives reopening."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache", "analysis.sqlite3")
+            cache = AnalysisCache(path=path)
+            cache.set("abc", "none", "none", {"filename": "photo.jpg"})
+            cache.close()
+
+            reopened = AnalysisCache(path=path)
+            self.assertEqual(reopened.get("abc", "none", "none"), {"filename": "photo.jpg"})
+            reopened.close()
+
+    def test_file_cache_is_shareable_between_processes(self):
+        """Test that a file-backed cache uses WAL and waits for other writers, and the config path is absolute."""
+        from config import Config
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = AnalysisCache(path=os.path.join(tmp, "analysis.sqlite3"))
+            self.assertEqual(cache._conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            cache.close()
+        self.assertTrue(os.path.isabs(Config.ANALYSIS_CACHE_PATH))
+
+    def test_json_compatible_matches_a_cache_hit(self):
+        """Test that fresh payloads are converted to the types a cache hit returns."""
+        payload = {"size": (640, 480), "exif": {"ExposureTime": Fraction(1, 125)}}
+        self.cache.set("abc", "none", "none", payload)
+        self.assertEqual(AnalysisCache.json_compatible(payload), self.cache.get("abc", "none", "none"))
+        self.assertEqual(AnalysisCache.json_compatible(payload), {"size": [640, 480], "exif": {"ExposureTime": "1/125"}})
+
+    def test_hash_file_matches_hash_bytes(self):
+        """Test that file and in-memory hashing agree."""
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(b"image-bytes")
+            path = f.name
+        try:
+            self.assertEqual(AnalysisCache.hash_file(path), AnalysisCache.hash_bytes(b"image-bytes"))
+        finally:
+            os.remove(path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+import asyncio
+import json
+import os
+import sys
+import time
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+import asgi_app
+
+
+class SlowGenerator:
+    """Stand-in provider whose calls take 50 ms"""
+
+    def __init__(self, api_key=None, model_name=None, provider='gemini'):
+        self.provider = provider
+
+    async def aprompt_generator(self, **kwargs):
+        await asyncio.sleep(0.05)
+        if not kwargs['main_base'].strip():
+            raise ValueError("Main base cannot be empty")
+        return {'text': f"/imagine prompt: {kwargs['main_base']} at dawn", 'provider': self.provider}
+
+    async def astoryboard_generator(self, context, keywords, num_scenes):
+        await asyncio.sleep(0.05)
+        return {'scenes': [{'scene': 1, 'prompt': context}], 'provider': self.provider}
+
+
+async def call(app, method, path, payload=None):
+    """Run one request through the ASGI app and return (status, headers, body)"""
+    body = json.dumps(payload).encode() if payload is not None else b''
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'', 'root_path': '',
+             'headers': [(b'content-type', b'application/json')], 'server': ('testserver', 80)}
+    received = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return received.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    start = sent[0]
+    return start['status'], dict(start['headers']), b''.join(m.get('body', b'') for m in sent[1:])
+
+
+class TestAsgiApp(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch.multiple(asgi_app, PrompterGenerator=SlowGenerator, PROMPT_PACING_SECONDS=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_generation_requests_run_concurrently(self):
+        """Test that 200 in-flight generation requests share one event loop instead of queueing."""
+        payload = {'api_key': 'key', 'main_base': 'team meeting', 'num_prompts': 2}
+
+        async def run():
+            return await asyncio.gather(*(call(asgi_app.app, 'POST', '/api/generate_prompts', payload)
+                                          for _ in range(200)))
+
+        started = time.perf_counter()
+        responses = asyncio.run(run())
+        elapsed = time.perf_counter() - started
+
+        self.assertLess(elapsed, 2.0)  # 200 requests x 2 calls x 50 ms would take 20 s serially
+        status, headers, body = responses[0]
+        self.assertEqual(status, 200)
+        prompts = json.loads(body)['prompts']
+        self.assertEqual([p['index'] for p in prompts], [1, 2])
+        self.assertTrue(prompts[0]['prompt'].endswith('--ar 16:9 --q 2'))
+        self.assertNotIn('/imagine', prompts[0]['prompt'])
+
+    def test_validation_matches_flask_handlers(self):
+        """Test that the async and Flask handlers return the same error payloads."""
+        client = asgi_app.flask_app.test_client()
+        for path, payload in [('/api/generate_prompts', {'main_base': 'x'}),
+                              ('/api/generate_storyboard', {'api_key': 'key', 'context': 'c'}),
+                              ('/api/bulk_generate', {'api_key': 'key'})]:
+            status, _, body = asyncio.run(call(asgi_app.app, 'POST', path, payload))
+            expected = client.post(path, json=payload)
+            self.assertEqual(status, expected.status_code)
+            self.assertEqual(body, expected.data)
+
+    def test_storyboard_and_bulk_generate(self):
+        """Test that the async storyboard and bulk routes answer like the Flask ones."""
+        status, _, body = asyncio.run(call(asgi_app.app, 'POST', '/api/generate_storyboard',
+                                           {'api_key': 'key', 'context': 'city', 'keywords': 'a, b'}))
+        self.assertEqual((status, json.loads(body)['scenes'][0]['prompt']), (200, 'city'))
+
+        status, _, body = asyncio.run(call(asgi_app.app, 'POST', '/api/bulk_generate', {
+            'api_key': 'key', 'delay_between': 0, 'prompts_data': [{'main_base': 'desk'}, {'main_base': ' '}]}))
+        rows = json.loads(body)['prompts']
+        self.assertEqual([row['status'] for row in rows], ['Success', 'Failed'])
+
+    def test_streaming_storyboard_is_served_by_flask(self):
+        """Test that a streamed storyboard request is relayed to the Flask route with its body intact."""
+        with patch('app.PrompterGenerator') as flask_generator:
+            flask_generator.return_value.stream_storyboard_generator.return_value = iter(
+                [{'scene': 1, 'prompt': 'city'}])
+            flask_generator.return_value.provider.value = 'gemini'
+            status, headers, body = asyncio.run(call(asgi_app.app, 'POST', '/api/generate_storyboard', {
+                'api_key': 'key', 'context': 'city', 'keywords': 'a', 'stream': 'ndjson'}))
+
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b'content-type'], b'application/x-ndjson')
+        events = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual([event['type'] for event in events], ['start', 'scenes', 'summary'])
+
+    def test_other_routes_fall_back_to_flask(self):
+        """Test that non-generation routes are served by the Flask app through the WSGI bridge."""
+        status, headers, body = asyncio.run(call(asgi_app.app, 'POST', '/api/optimize_for_platform', {
+            'title': 'Desk', 'description': 'Office desk', 'keywords': 'office', 'platform': 'getty'}))
+
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b'content-type'], b'application/json')
+        self.assertEqual(json.loads(body)['optimized']['platform'], 'getty')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from bulk_ingest import ResultWriter, ProgressReporter, ingest, iter_image_files, load_checkpoint
+
+
+class FakeExtractor:
+    """Stands in for ImageMetadataExtractor.process_image."""
+
+    def __init__(self, slow_on=None):
+        self.calls = []
+        self.slow_on = slow_on
+        self.started = threading.Event()
+
+    def process_image(self, image_path, output_dir=None, force_refresh=False, duplicate_index=None):
+        self.calls.append(image_path)
+        if image_path == self.slow_on:
+            self.started.set()
+            time.sleep(0.1)
+        return {'image_path': image_path, 'metadata': {}, 'processed_at': 'now', 'success': True}
+
+
+class TestBulkIngest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, 'library')
+        os.makedirs(os.path.join(self.root, 'nested'))
+        for name in ('a.jpg', 'b.PNG', 'notes.txt', os.path.join('nested', 'c.tiff')):
+            with open(os.path.join(self.root, name), 'wb') as f:
+                f.write(b'x')
+        self.output = os.path.join(self.tmp.name, 'results.jsonl')
+        self.checkpoint = self.output + '.checkpoint'
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _run(self, extractor, paths):
+        writer = ResultWriter(self.output)
+        reporter = ProgressReporter(len(paths), stream=io.StringIO())
+        try:
+            return ingest(paths, extractor, writer, self.checkpoint, workers=1, reporter=reporter)
+        finally:
+            writer.close()
+
+    def test_iter_image_files(self):
+        """Test that only image files are found, recursively and in stable order."""
+        names = [os.path.relpath(p, self.root) for p in iter_image_files(self.root)]
+        self.assertEqual(names, ['a.jpg', 'b.PNG', os.path.join('nested', 'c.tiff')])
+        self.assertEqual(len(list(iter_image_files(self.root, recursive=False))), 2)
+
+    def test_writes_results_and_checkpoint(self):
+        """Test that every result is written and checkpointed."""
+        paths = list(iter_image_files(self.root))
+        summary = self._run(FakeExtractor(), paths)
+
+        self.assertEqual(summary['processed'], 3)
+        with open(self.output) as f:
+            written = [json.loads(line)['image_path'] for line in f]
+        self.assertEqual(sorted(written), sorted(paths))
+        self.assertEqual(load_checkpoint(self.checkpoint), set(paths))
+
+    def test_resumes_after_interruption(self):
+        """Test that Ctrl-C cancels queued images, checkpoints running ones and a rerun does the rest."""
+        paths = list(iter_image_files(self.root))
+        extractor = FakeExtractor(slow_on=paths[1])
+
+        class InterruptedReporter(ProgressReporter):
+            """Receives Ctrl-C while the main thread handles the first result."""
+            interrupted = False
+
+            def update(self, success):
+                super().update(success)
+                if not self.interrupted:
+                    self.interrupted = True
+                    extractor.started.wait(1)
+                    raise KeyboardInterrupt
+
+        writer = ResultWriter(self.output)
+        try:
+            with self.assertRaises(KeyboardInterrupt):
+                ingest(paths, extractor, writer, self.checkpoint, workers=1,
+                       reporter=InterruptedReporter(len(paths), stream=io.StringIO()))
+        finally:
+            writer.close()
+        self.assertEqual(extractor.calls, paths[:2])
+        self.assertEqual(load_checkpoint(self.checkpoint), set(paths[:2]))
+
+        extractor = FakeExtractor()
+        summary = self._run(extractor, paths)
+
+        self.assertEqual(extractor.calls, paths[2:])
+        self.assertEqual(summary['skipped'], 0)
+        self.assertEqual(load_checkpoint(self.checkpoint), set(paths))
+
+if __name__ == '__main__':
+    unittest.main()
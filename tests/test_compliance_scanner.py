@@ -0,0 +1,45 @@
+import unittest
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from compliance_scanner import ComplianceScanner
+
+
+class TestComplianceScanner(unittest.TestCase):
+
+    def setUp(self):
+        self.scanner = ComplianceScanner(
+            {'adobe_stock': ['adobe', 'photoshop'], 'getty': ['getty images', 'istock'], 'istock': ['istock']},
+            avoid_terms=['logos', 'recognizable landmarks'],
+            trademark_terms=['nike', 'eiffel tower'])
+
+    def test_scan_finds_terms_in_every_field(self):
+        """Test case-insensitive, plural and hyphenated matches across title, description and keywords."""
+        findings = self.scanner.scan('NIKE sneakers by the Eiffel-Tower', 'No logo here, only logos',
+                                     ['running', 'Photoshop', 'istock'])
+
+        self.assertEqual([(f['term'], f['field']) for f in findings],
+                         [('nike', 'title'), ('eiffel tower', 'title'), ('logos', 'description'),
+                          ('photoshop', 'keywords'), ('istock', 'keywords')])
+        self.assertEqual(findings[1]['match'], 'Eiffel-Tower')
+        self.assertEqual(findings[4]['platforms'], ['getty', 'istock'])
+
+    def test_scan_respects_word_boundaries(self):
+        """Test that terms match whole words and simple plurals but not longer words."""
+        findings = self.scanner.scan('Nikesh portrait', 'Nikes and nikel', 'logistics, photoshopped')
+        self.assertEqual([(f['term'], f['match']) for f in findings], [('nike', 'Nikes')])
+
+    def test_findings_are_filtered_per_platform(self):
+        """Test that common terms apply to every platform and platform terms only to their own."""
+        findings = self.scanner.scan('Nike shoes', 'Retouched in Photoshop', 'getty images')
+
+        self.assertEqual([f['term'] for f in self.scanner.for_platform(findings, 'adobe_stock')], ['nike', 'photoshop'])
+        self.assertEqual([f['term'] for f in self.scanner.for_platform(findings, 'getty')], ['nike', 'getty images'])
+        self.assertEqual([f['term'] for f in self.scanner.for_platform(findings, 'shutterstock')], ['nike'])
+
+    def test_clean_metadata_has_no_findings(self):
+        """Test that metadata without forbidden terms has no findings."""
+        self.assertEqual(self.scanner.scan('Team meeting', 'Colleagues in an office', 'team, office'), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import importlib.util
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from image_hashing import hamming_distance
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+HAS_PIL = importlib.util.find_spec("PIL") is not None
+
+
+class TestHamming(unittest.TestCase):
+
+    def test_hamming_distance(self):
+        """Test bit-difference counting between 64-bit hashes."""
+        self.assertEqual(hamming_distance(0, 0), 0)
+        self.assertEqual(hamming_distance(0b1011, 0b0001), 2)
+        self.assertEqual(hamming_distance(0, (1 << 64) - 1), 64)
+
+
+@unittest.skipUnless(HAS_NUMPY, "NumPy not installed")
+class TestNearDuplicateIndex(unittest.TestCase):
+
+    def test_nearest_within_threshold(self):
+        """Test that the closest hash within max_distance is returned with its payload."""
+        from image_hashing import NearDuplicateIndex
+
+        index = NearDuplicateIndex(max_distance=4)
+        index.add(0xFF00FF00FF00FF00, "burst-1")
+        index.add(0x0123456789ABCDEF, "other")
+
+        self.assertEqual(index.nearest(0xFF00FF00FF00FF03), ("burst-1", 2))
+        self.assertIsNone(index.nearest(0x00FF00FF00FF00FF))
+
+    def test_grows_past_initial_capacity(self):
+        """Test that the index keeps every hash as it grows."""
+        from image_hashing import NearDuplicateIndex
+
+        index = NearDuplicateIndex(max_distance=0)
+        for i in range(200):
+            index.add(i << 8, i)
+
+        self.assertEqual(len(index), 200)
+        self.assertEqual(index.nearest(150 << 8), (150, 0))
+
+
+@unittest.skipUnless(HAS_NUMPY and HAS_PIL, "NumPy and Pillow required")
+class TestPerceptualHash(unittest.TestCase):
+
+    def _save(self, img, name):
+        path = os.path.join(self.tmp.name, name)
+        img.save(path, "JPEG", quality=90)
+        return path
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_near_identical_frames_hash_close(self):
+        """Test that a slightly altered frame hashes close and a different image does not."""
+        import numpy as np
+        from PIL import Image
+        from image_hashing import perceptual_hash
+
+        rng = np.random.default_rng(0)
+
+        def smooth_scene():
+            coarse = Image.fromarray(rng.integers(0, 255, (8, 8), dtype=np.uint8))
+            return np.asarray(coarse.resize((320, 240), Image.BICUBIC))
+
+        base = smooth_scene()
+        noisy = np.clip(base + rng.normal(0, 4, base.shape), 0, 255).astype(np.uint8)
+        other = smooth_scene()
+
+        for method in ("phash", "dhash"):
+            a = perceptual_hash(self._save(Image.fromarray(base), "a.jpg"), method)
+            b = perceptual_hash(self._save(Image.fromarray(noisy), "b.jpg"), method)
+            c = perceptual_hash(self._save(Image.fromarray(other), "c.jpg"), method)
+            self.assertLessEqual(hamming_distance(a, b), 6)
+            self.assertGreater(hamming_distance(a, c), 12)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,296 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import csv
+import io
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from controller import AIProvider
+from image_metadata_extractor import REPORT_COLUMNS, CsvReportWriter, ImageMetadataExtractor
+
+HAS_PIL = importlib.util.find_spec("PIL") is not None
+
+
+def keyword_answer(index):
+    return {'index': index, 'ai_title': f'Title {index}', 'ai_description': 'desc',
+            'ai_keywords': ['one', 'two'], 'ai_category': 'Nature', 'commercial_appeal': 7}
+
+
+@unittest.skipUnless(HAS_PIL, "Pillow not installed")
+class TestBatchedKeywording(unittest.TestCase):
+
+    def setUp(self):
+        from PIL import Image
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.paths = []
+        for i, color in enumerate([(200, 30, 30), (30, 200, 30), (30, 30, 200)]):
+            path = os.path.join(self.tmp.name, f'img_{i}.jpg')
+            Image.new('RGB', (64, 48), color).save(path)
+            self.paths.append(path)
+
+        self.extractor = ImageMetadataExtractor()
+        self.extractor.generator = MagicMock(provider=AIProvider.GEMINI, model_name='gemini-test')
+        self.generate = self.extractor.generator.model.generate_content
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_one_request_per_chunk_with_single_fallback(self):
+        """Test that a chunk is keyworded in one request and a missing image is retried alone."""
+        self.generate.side_effect = [
+            MagicMock(text='```json\n' + json.dumps([keyword_answer(2), keyword_answer(0)]) + '\n```'),
+            MagicMock(text=json.dumps(dict(keyword_answer(1), ai_title='Retried'))),
+        ]
+
+        results = self.extractor.batch_process_images(self.paths, ai_batch_size=3)
+
+        self.assertEqual(self.generate.call_count, 2)
+        self.assertEqual(len(self.generate.call_args_list[0][0][0]), 3 * 2 + 1)
+        titles = [r['metadata']['ai_analysis']['ai_title'] for r in results]
+        self.assertEqual(titles, ['Title 0', 'Retried', 'Title 2'])
+        self.assertTrue(all(r['metadata']['ai_analysis']['ai_generated'] for r in results))
+
+    def test_failed_batch_falls_back_to_single_requests(self):
+        """Test that an unusable batched answer degrades to one request per image."""
+        self.generate.side_effect = [MagicMock(text='not json')] + [
+            MagicMock(text=json.dumps(keyword_answer(i))) for i in range(3)
+        ]
+
+        results = self.extractor.batch_process_images(self.paths, ai_batch_size=8)
+
+        self.assertEqual(self.generate.call_count, 4)
+        self.assertEqual([r['metadata']['ai_analysis']['ai_title'] for r in results],
+                         ['Title 0', 'Title 1', 'Title 2'])
+
+    @unittest.skipUnless(importlib.util.find_spec("numpy"), "NumPy not installed")
+    def test_borrowed_analysis_is_not_cached_for_the_borrower(self):
+        """Test that a near-duplicate's borrowed analysis is not served to a later ungrouped request."""
+        from PIL import Image
+        from analysis_cache import AnalysisCache
+
+        twin = os.path.join(self.tmp.name, 'twin.png')
+        Image.new('RGB', (64, 48), (200, 30, 30)).save(twin)
+        self.extractor.cache = AnalysisCache()
+        self.generate.side_effect = [MagicMock(text=json.dumps(dict(keyword_answer(0), ai_title=title)))
+                                     for title in ('Original', 'Own')]
+
+        results = self.extractor.batch_process_images([self.paths[0], twin], near_duplicate_threshold=6)
+        self.assertEqual(results[1]['metadata']['ai_analysis']['reused_from'], 'img_0.jpg')
+
+        alone = self.extractor.extract_image_metadata(twin)
+        self.assertEqual(alone['ai_analysis']['ai_title'], 'Own')
+        self.assertNotIn('reused_from', alone['ai_analysis'])
+
+    def test_truncated_batch_keeps_complete_items(self):
+        """Test that a cut-off batched answer only re-requests the images it lost."""
+        answer = json.dumps([keyword_answer(0), keyword_answer(1), keyword_answer(2)])
+        self.generate.side_effect = [
+            MagicMock(text='```json\n' + answer[:answer.rindex('{') + 20]),
+            MagicMock(text='Sure: ' + json.dumps(dict(keyword_answer(2), ai_title='Retried'))),
+        ]
+
+        results = self.extractor.batch_process_images(self.paths, ai_batch_size=8)
+
+        self.assertEqual(self.generate.call_count, 2)
+        self.assertEqual([r['metadata']['ai_analysis']['ai_title'] for r in results],
+                         ['Title 0', 'Title 1', 'Retried'])
+
+    def test_truncated_single_answer_is_served_but_not_cached(self):
+        """Test that a salvaged one-image answer is flagged and not cached, and one without keywords is a placeholder."""
+        from analysis_cache import AnalysisCache
+
+        self.extractor.cache = AnalysisCache()
+        answer = json.dumps(keyword_answer(0))
+        self.generate.side_effect = [
+            MagicMock(text=answer[:answer.index('"ai_category"') + 20]),
+            MagicMock(text=answer[:answer.index('"ai_keywords"') - 2]),
+            MagicMock(text=answer),
+        ]
+
+        truncated = self.extractor.extract_image_metadata(self.paths[0])['ai_analysis']
+        self.assertTrue(truncated['ai_generated'] and truncated['truncated'])
+        self.assertEqual(truncated['ai_keywords'], 'one, two')
+
+        placeholder = self.extractor.extract_image_metadata(self.paths[0])['ai_analysis']
+        self.assertFalse(placeholder['ai_generated'])
+
+        complete = self.extractor.extract_image_metadata(self.paths[0])['ai_analysis']
+        self.assertNotIn('truncated', complete)
+        self.assertEqual(self.extractor.extract_image_metadata(self.paths[0])['ai_analysis']['ai_title'], 'Title 0')
+        self.assertEqual(self.generate.call_count, 3)
+
+    def test_cache_hits_stream_while_the_batch_request_runs(self):
+        """Test that a chunk's cache hit is yielded before the batched request answers, hashing each image once."""
+        from analysis_cache import AnalysisCache
+
+        self.extractor.cache = AnalysisCache()
+        self.generate.return_value = MagicMock(text=json.dumps(keyword_answer(0)))
+        self.extractor.extract_image_metadata(self.paths[1])
+        answered = threading.Event()
+
+        def batched_answer(content):
+            answered.wait(2)
+            return MagicMock(text=json.dumps([keyword_answer(0), keyword_answer(1)]))
+        self.generate.side_effect = batched_answer
+
+        with patch.object(AnalysisCache, 'hash_file', side_effect=AnalysisCache.hash_file) as hash_file:
+            results = self.extractor.iter_process_images(self.paths, ai_batch_size=3, near_duplicate_threshold=-1)
+            first = next(results)
+            self.assertFalse(answered.is_set())
+            answered.set()
+            rest = list(results)
+
+        self.assertEqual(first['image_path'], self.paths[1])
+        self.assertTrue(first['metadata']['cache_hit'])
+        self.assertEqual([r['image_path'] for r in rest], [self.paths[0], self.paths[2]])
+        self.assertEqual(hash_file.call_count, 3)
+
+class TestCsvReport(unittest.TestCase):
+
+    def setUp(self):
+        self.success = {'image_path': '/tmp/red.jpg', 'success': True, 'processed_at': 'now', 'metadata': {
+            'filename': 'red.jpg', 'width': 64, 'height': 48, 'file_size': 2 * 1024 * 1024, 'format': 'JPEG',
+            'ai_analysis': {'ai_title': 'Red square', 'ai_keywords': ['red'], 'ai_category': 'Abstract'},
+            'microstock_optimization': {'quality_score': 80, 'microstock_ready': True},
+            'exif': {'has_gps': False}, 'duplicate_group': {'representative': 'first.jpg', 'distance': 2}}}
+        self.failure = {'image_path': '/tmp/broken.jpg', 'success': False, 'error': 'cannot identify image',
+                        'processed_at': 'now'}
+
+    def test_header_and_rows_follow_report_columns(self):
+        """Test that the header is REPORT_COLUMNS in order and rows fill every column, including error rows."""
+        output = io.StringIO()
+        CsvReportWriter(output).write_all([self.success, self.failure])
+        rows = list(csv.reader(io.StringIO(output.getvalue())))
+
+        self.assertEqual(rows[0], REPORT_COLUMNS)
+        self.assertTrue(all(len(row) == len(REPORT_COLUMNS) for row in rows))
+        success, failure = (dict(zip(REPORT_COLUMNS, row)) for row in rows[1:])
+        self.assertEqual((success['filename'], success['file_size_mb'], success['duplicate_of'], success['error']),
+                         ('red.jpg', '2.0', 'first.jpg', ''))
+        self.assertEqual((failure['filename'], failure['error'], failure['width']),
+                         ('broken.jpg', 'cannot identify image', ''))
+
+    def test_rows_are_written_as_results_arrive(self):
+        """Test that each row is written before the next result is requested, and the header can be skipped."""
+        output = io.StringIO()
+        written = []
+
+        def results():
+            for result in (self.success, self.failure):
+                yield result
+                written.append(output.getvalue().count('\n'))
+
+        self.assertEqual(CsvReportWriter(output, write_header=False).write_all(results()), 2)
+        self.assertEqual(written, [1, 2])
+
+
+@unittest.skipUnless(HAS_PIL, "Pillow not installed")
+class TestBatchExtractStreaming(unittest.TestCase):
+
+    def setUp(self):
+        import app
+        from PIL import Image
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.uploads = os.path.join(self.tmp.name, 'uploads')
+        os.makedirs(self.uploads)
+        for patcher in (patch.dict(app.app.config, UPLOAD_FOLDER=self.uploads),
+                        patch.object(app, 'get_default_cache', return_value=None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = app.app.test_client()
+
+        self.images = []
+        for name, color in (('red.jpg', (200, 30, 30)), ('green.jpg', (30, 200, 30))):
+            buffer = io.BytesIO()
+            Image.new('RGB', (64, 48), color).save(buffer, 'JPEG')
+            self.images.append((buffer.getvalue(), name))
+        self.images.insert(1, (b'not an image', 'broken.jpg'))
+
+    def _post(self, stream):
+        files = [(io.BytesIO(data), name) for data, name in self.images]
+        return self.client.post('/api/batch_extract_metadata', data={'images': files, 'stream': stream},
+                                content_type='multipart/form-data')
+
+    def test_ndjson_stream_reports_each_image_in_order(self):
+        """Test that NDJSON streaming sends a result per image in order with running counts, then a summary."""
+        response = self._post('ndjson')
+        events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertEqual([event['type'] for event in events], ['start', 'result', 'result', 'result', 'summary'])
+        results = events[1:4]
+        self.assertEqual([event['result']['filename'].split('_', 1)[1] for event in results],
+                         ['red.jpg', 'broken.jpg', 'green.jpg'])
+        self.assertEqual([(event['succeeded'], event['failed']) for event in results], [(1, 0), (1, 1), (2, 1)])
+        self.assertEqual((events[-1]['succeeded'], events[-1]['failed'], events[-1]['total_processed']), (2, 1, 3))
+        self.assertEqual(os.listdir(self.uploads), [])
+
+    def test_sse_stream_frames_events_and_removes_uploads(self):
+        """Test that SSE streaming names each frame after its event and deletes the uploads afterwards."""
+        response = self._post('sse')
+        frames = response.get_data(as_text=True).strip().split('\n\n')
+
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertEqual([frame.split('\n')[0] for frame in frames],
+                         ['event: start'] + ['event: result'] * 3 + ['event: summary'])
+        summary = json.loads(frames[-1].split('\n')[1][len('data: '):])
+        self.assertEqual(summary['succeeded'], 2)
+        self.assertEqual(os.listdir(self.uploads), [])
+
+    def test_zip_export_writes_manifest_last_and_removes_uploads(self):
+        """Test that the ZIP export ends with a manifest row per upload and leaves no uploads behind."""
+        import zipfile
+
+        files = [(io.BytesIO(data), name) for data, name in self.images]
+        response = self.client.post('/api/batch_export_zip', data={'images': files},
+                                    content_type='multipart/form-data')
+        with zipfile.ZipFile(io.BytesIO(response.get_data())) as archive:
+            names = archive.namelist()
+            manifest = list(csv.DictReader(io.StringIO(archive.read('manifest.csv').decode('utf-8'))))
+
+        self.assertEqual(names[-1], 'manifest.csv')
+        self.assertEqual([row['source_filename'] for row in manifest], ['red.jpg', 'broken.jpg', 'green.jpg'])
+        self.assertEqual([row['success'] for row in manifest], ['True', 'False', 'True'])
+        self.assertEqual(os.listdir(self.uploads), [])
+
+    def test_zip_export_removes_uploads_when_setup_fails(self):
+        """Test that uploads are deleted when the export fails before its body starts."""
+        import app
+
+        files = [(io.BytesIO(data), name) for data, name in self.images]
+        with patch.object(app, 'create_metadata_extractor', side_effect=RuntimeError('no extractor')):
+            response = self.client.post('/api/batch_export_zip', data={'images': files},
+                                        content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(os.listdir(self.uploads), [])
+
+
+@unittest.skipUnless(HAS_PIL and importlib.util.find_spec("piexif"), "Pillow and piexif required")
+class TestEmbedMetadata(unittest.TestCase):
+
+    def test_embeds_nested_ai_analysis(self):
+        """Test that extractor metadata with nested ai_analysis ends up in the EXIF block."""
+        import io
+        import piexif
+        from PIL import Image
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'logo.png')
+            Image.new('RGBA', (32, 32), (10, 20, 30, 128)).save(path)
+            output = io.BytesIO()
+            metadata = {'ai_analysis': {'ai_title': 'Café sign', 'ai_keywords': 'cafe, sign'}}
+            ImageMetadataExtractor().embed_metadata(path, metadata, output)
+
+        exif = piexif.load(output.getvalue())['0th']
+        self.assertEqual(bytes(exif[piexif.ImageIFD.XPTitle]).decode('utf-16le').rstrip('\x00'), 'Café sign')
+        self.assertEqual(bytes(exif[piexif.ImageIFD.XPKeywords]).decode('utf-16le').rstrip('\x00'), 'cafe, sign')
+
+if __name__ == '__main__':
+    unittest.main()
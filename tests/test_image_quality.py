@@ -0,0 +1,94 @@
+import unittest
+import importlib.util
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from image_quality import assess_technical_quality
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+HAS_PIL = importlib.util.find_spec("PIL") is not None
+
+
+class TestAssessTechnicalQuality(unittest.TestCase):
+
+    def test_clean_metrics_score_full_marks(self):
+        """Test that sharp, clean, well-exposed metrics add the full score without issues."""
+        metrics = {'sharpness': 500.0, 'noise_sigma': 0.5, 'mean_brightness': 120.0,
+                   'shadow_clipping': 0.0, 'highlight_clipping': 0.01}
+        self.assertEqual(assess_technical_quality(metrics), (30, []))
+
+    def test_problems_become_issues(self):
+        """Test that blur, noise and clipping are each reported."""
+        metrics = {'sharpness': 5.0, 'noise_sigma': 8.0, 'mean_brightness': 230.0,
+                   'shadow_clipping': 0.0, 'highlight_clipping': 0.3}
+        score, issues = assess_technical_quality(metrics)
+
+        self.assertEqual(score, 0)
+        self.assertEqual(len(issues), 4)
+
+
+@unittest.skipUnless(HAS_NUMPY, "NumPy not installed")
+class TestMeasureArray(unittest.TestCase):
+
+    def setUp(self):
+        import numpy as np
+
+        rng = np.random.default_rng(0)
+        self.np = np
+        self.rng = rng
+        # Hard-edged 8x8 pixel checkerboard with mid-grey levels
+        self.sharp = np.kron(rng.integers(0, 2, (48, 64)), np.ones((8, 8))).astype(np.float32) * 120 + 60
+
+    def _box_blur(self, pixels, radius=4):
+        kernel = self.np.ones(2 * radius + 1) / (2 * radius + 1)
+        rows = self.np.apply_along_axis(lambda r: self.np.convolve(r, kernel, mode='same'), 1, pixels)
+        return self.np.apply_along_axis(lambda c: self.np.convolve(c, kernel, mode='same'), 0, rows)
+
+    def test_blur_lowers_sharpness(self):
+        """Test that Laplacian variance drops sharply for a blurred copy."""
+        from image_quality import laplacian_variance
+
+        self.assertGreater(laplacian_variance(self.sharp), 10 * laplacian_variance(self._box_blur(self.sharp)))
+
+    def test_noise_estimate_tracks_added_noise(self):
+        """Test that the noise estimate ignores edges and recovers the added sigma."""
+        from image_quality import estimate_noise
+
+        noisy = self.sharp + self.rng.normal(0, 5, self.sharp.shape)
+        self.assertLess(estimate_noise(self.sharp), 0.5)
+        self.assertAlmostEqual(estimate_noise(noisy), 5, delta=1.5)
+
+    def test_clipping_fractions(self):
+        """Test shadow and highlight clipping fractions and mean brightness."""
+        from image_quality import exposure_metrics
+
+        pixels = self.np.full((10, 10), 128.0, dtype=self.np.float32)
+        pixels[:2] = 255
+        pixels[-1] = 0
+        metrics = exposure_metrics(pixels)
+
+        self.assertEqual(metrics['highlight_clipping'], 0.2)
+        self.assertEqual(metrics['shadow_clipping'], 0.1)
+
+
+@unittest.skipUnless(HAS_NUMPY and HAS_PIL, "NumPy and Pillow required")
+class TestMicrostockPotential(unittest.TestCase):
+
+    def test_blurry_image_is_not_microstock_ready(self):
+        """Test that technical metrics feed quality_score and quality_issues."""
+        from PIL import Image, ImageFilter
+        from image_metadata_extractor import ImageMetadataExtractor
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "soft.jpg")
+            Image.new("RGB", (640, 480), (90, 120, 150)).filter(ImageFilter.GaussianBlur(4)).save(path)
+            metadata = ImageMetadataExtractor().extract_image_metadata(path)
+
+        self.assertIn('technical_quality', metadata)
+        optimization = metadata['microstock_optimization']
+        self.assertTrue(any('out of focus' in issue for issue in optimization['quality_issues']))
+        self.assertFalse(optimization['microstock_ready'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from json_extract import JsonStreamExtractor, extract_json, iter_json_items
+
+
+class TestExtractJson(unittest.TestCase):
+
+    def test_fences_and_surrounding_prose(self):
+        """Test that JSON is found inside fences and surrounding prose."""
+        fenced = 'Here you go:\n```json\n[{"scene": 1, "prompt": "a, b"}]\n```\nEnjoy!'
+        self.assertEqual(extract_json(fenced, list), [{'scene': 1, 'prompt': 'a, b'}])
+        self.assertEqual(extract_json('Result: {"ai_title": "T"} (done)', dict), {'ai_title': 'T'})
+        self.assertEqual(extract_json('Scenes [1-3] below:\n[{"scene": 1}]', list), [{'scene': 1}])
+
+    def test_truncated_answers_are_salvaged(self):
+        """Test that truncated arrays keep complete items and truncated objects are closed."""
+        self.assertEqual(extract_json('[{"scene": 1}, {"scene": 2, "prompt": "cut', list), [{'scene': 1}])
+        self.assertEqual(extract_json('{"ai_title": "T", "ai_keywords": ["a", "b', dict),
+                         {'ai_title': 'T', 'ai_keywords': ['a', 'b']})
+        self.assertEqual(extract_json('{"ai_title": "T", "ai_desc', dict), {'ai_title': 'T'})
+
+    def test_repair_can_be_disabled(self):
+        """Test that without repair a truncated answer raises instead of being salvaged."""
+        with self.assertRaises(json.JSONDecodeError):
+            extract_json('{"ai_title": "T", "ai_keywords": ["a", "b', dict, repair=False)
+        self.assertEqual(extract_json('Sure: {"ai_title": "T"}', dict, repair=False), {'ai_title': 'T'})
+
+    def test_expected_type_coercion_and_trailing_commas(self):
+        """Test that wrapped lists and listed objects match the expected type and trailing commas are forgiven."""
+        self.assertEqual(extract_json('{"scenes": [{"scene": 1},]}', list), [{'scene': 1}])
+        self.assertEqual(extract_json('[{"ai_title": "T"}]', dict), {'ai_title': 'T'})
+
+    def test_nothing_usable_raises_decode_error(self):
+        """Test that text without JSON raises JSONDecodeError."""
+        with self.assertRaises(json.JSONDecodeError):
+            extract_json('I cannot help with that.', list)
+
+    def test_items_are_yielded_as_they_complete(self):
+        """Test that streamed array items are yielded as soon as each one closes."""
+        extractor = JsonStreamExtractor()
+        self.assertEqual(extractor.feed('```json\n[{"scene": 1, "prompt": "a \\"quoted\\" ]'), [])
+        self.assertEqual(extractor.feed(' word"}, {"scene"'), [{'scene': 1, 'prompt': 'a "quoted" ] word'}])
+        self.assertEqual(extractor.feed(': 2}]'), [{'scene': 2}])
+        chunks = ['[1, "tw', 'o", {"x": [1, 2]}', ', null]']
+        self.assertEqual(list(iter_json_items(chunks)), [1, 'two', {'x': [1, 2]}, None])
+
+
+if __name__ == '__main__':
+    unittest.main()
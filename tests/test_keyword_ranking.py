@@ -0,0 +1,45 @@
+import unittest
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from keyword_ranking import dedupe_keywords, rank_keywords, stem, trim_to_word_boundary
+
+
+class TestKeywordRanking(unittest.TestCase):
+
+    def test_stem_folds_plurals_and_inflections(self):
+        """Test that plural and -ing/-ed forms share a stem while short words are left alone."""
+        self.assertEqual(stem('meetings'), stem('meeting'))
+        self.assertEqual(stem('companies'), 'company')
+        self.assertEqual(stem('businesses'), 'business')
+        self.assertEqual(stem('planned'), stem('plan'))
+        self.assertEqual(stem('glass'), 'glass')
+        self.assertEqual(stem('bus'), 'bus')
+
+    def test_dedupe_keeps_first_form(self):
+        """Test that plural and case variants collapse to the first form given and blanks are dropped."""
+        self.assertEqual(dedupe_keywords(['Teams', 'team', ' office ', 'offices', '', 'Video Calls', 'video call']),
+                         ['Teams', 'office', 'Video Calls'])
+
+    def test_rank_prefers_title_then_description_then_category(self):
+        """Test that truncation keeps keywords relevant to the item over the first N supplied."""
+        keywords = ['sunset', 'cat', 'laptop', 'strategy', 'meetings', 'team', 'office']
+        ranked = rank_keywords(keywords, title='Team meeting in a modern office',
+                               description='Colleagues sharing a laptop', category='business', limit=4)
+
+        self.assertEqual(set(ranked[:3]), {'meetings', 'team', 'office'})
+        self.assertEqual(ranked[3], 'laptop')
+
+    def test_rank_keeps_input_order_without_context(self):
+        """Test that without a title or description the first keywords are kept in order."""
+        self.assertEqual(rank_keywords(['c', 'b', 'a'], limit=2), ['c', 'b'])
+
+    def test_trim_to_word_boundary(self):
+        """Test that trimming never splits a word and drops trailing punctuation."""
+        self.assertEqual(trim_to_word_boundary('Diverse business team meeting', 20), 'Diverse business')
+        self.assertEqual(trim_to_word_boundary('Business team, meeting', 14), 'Business team')
+        self.assertEqual(trim_to_word_boundary('Short title', 50), 'Short title')
+        self.assertEqual(trim_to_word_boundary('Supercalifragilistic', 10), 'Supercalif')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import importlib.util
+import json
+import os
+import sys
+import urllib.error
+import urllib.request
+from unittest.mock import patch
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+import controller
+from config import Config
+from loadtest.fake_provider import start_fake_provider
+from loadtest.run_load import percentile, summarize
+
+
+def post_json(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(), headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+
+class TestFakeProvider(unittest.TestCase):
+
+    def setUp(self):
+        self.server = start_fake_provider()
+        self.addCleanup(self.server.shutdown)
+
+    def test_openai_chat_completion(self):
+        """Test that the fake server answers OpenAI chat completions with the local provider."""
+        reply = post_json(f'{self.server.base_url}/v1/chat/completions',
+                          {'model': 'gpt-3.5-turbo', 'messages': [{'role': 'user', 'content': 'Generate 2 scenes.'}]})
+        self.assertEqual(len(json.loads(reply['choices'][0]['message']['content'])), 2)
+
+    def test_injected_rate_limits_and_errors(self):
+        """Test that 429 and 500 responses are injected at the configured rates and counted."""
+        self.server.rate_429 = 1.0
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            post_json(f'{self.server.base_url}/v1beta/models/gemini-2.5-flash:generateContent', {'contents': []})
+        self.assertEqual(raised.exception.code, 429)
+        self.assertEqual(raised.exception.headers['Retry-After'], '1')
+
+        self.server.rate_429, self.server.error_rate = 0.0, 1.0
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            post_json(f'{self.server.base_url}/v1/chat/completions', {'messages': []})
+        self.assertEqual(raised.exception.code, 500)
+        self.assertEqual(self.server.stats.snapshot(), {'gemini_429': 1, 'openai_500': 1})
+
+    @unittest.skipUnless(importlib.util.find_spec('google.generativeai'), "google-generativeai not installed")
+    def test_gemini_sdk_talks_to_the_stand_in(self):
+        """Test that GEMINI_BASE_URL routes the real Gemini SDK to the stand-in."""
+        import google.generativeai as genai
+        with patch.object(controller, 'genai', genai), patch.object(Config, 'GEMINI_BASE_URL', self.server.base_url):
+            generator = controller.PrompterGenerator(api_key='loadtest', model_name='gemini-2.5-flash')
+            result = generator.prompt_generator(main_base='team meeting')
+
+        self.assertTrue(result['text'].startswith('/imagine prompt:'))
+        self.assertEqual(self.server.stats.snapshot(), {'gemini_ok': 1})
+
+
+class TestLoadReport(unittest.TestCase):
+
+    def test_percentiles_and_summary(self):
+        """Test nearest-rank percentiles and per-endpoint failure counts."""
+        values = [i / 1000 for i in range(1, 101)]
+        self.assertEqual((percentile(values, 50), percentile(values, 99)), (0.05, 0.099))
+
+        samples = [('generate_prompts', 200, 0.1), ('generate_prompts', 200, 0.3), ('generate_prompts', 500, 0.2),
+                   ('bulk_generate', 0, 5.0)]
+        report = summarize(samples, elapsed=2.0)
+        self.assertEqual(report['generate_prompts']['ok'], 2)
+        self.assertEqual(report['generate_prompts']['failed'], {'500': 1})
+        self.assertEqual(report['generate_prompts']['throughput_rps'], 1.0)
+        self.assertEqual(report['generate_prompts']['p99_ms'], 300.0)
+        self.assertEqual(report['bulk_generate']['failed'], {'connection error': 1})
+        self.assertIsNone(report['bulk_generate']['p50_ms'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import unittest
+from unittest.mock import patch
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from config import Config
+from controller import AIProvider, PrompterGenerator
+from local_provider import LocalProvider, latency_sampler, local_answer
+
+HAS_PIL = importlib.util.find_spec("PIL") is not None
+
+
+class TestLocalAnswers(unittest.TestCase):
+
+    def test_answers_are_shaped_like_the_app_expects(self):
+        """Test that each prompt kind gets an answer in the format its parser expects."""
+        self.assertTrue(local_answer('Create a BESTSELLING microstock prompt').startswith('/imagine prompt:'))
+        self.assertEqual(len(json.loads(local_answer('Generate 3 scenes.'))), 3)
+        batch = json.loads(local_answer('You are given 4 images, labelled Image 0 to Image 3.'))
+        self.assertEqual([item['index'] for item in batch], [0, 1, 2, 3])
+        self.assertIn('ai_keywords', json.loads(local_answer('respond with a JSON object containing')))
+
+    def test_answers_are_deterministic_per_prompt_and_images(self):
+        """Test that answers depend only on the prompt and the images."""
+        prompt = 'respond with a JSON object containing'
+        self.assertEqual(local_answer(prompt, ['abc']), local_answer(prompt, ['abc']))
+        self.assertNotEqual(local_answer('CORE SUBJECT: cat\n'), local_answer('CORE SUBJECT: dog\n'))
+
+    def test_latency_distributions(self):
+        """Test that each latency spec samples in range and unknown ones are rejected."""
+        self.assertEqual(latency_sampler('fixed:250')(), 0.25)
+        self.assertTrue(0.1 <= latency_sampler('uniform:100,200')() <= 0.2)
+        self.assertGreater(latency_sampler('lognormal:800,0.5')(), 0)
+        with self.assertRaises(ValueError):
+            latency_sampler('pareto:1')
+
+    def test_simulated_latency(self):
+        """Test that sync and async calls both wait for the simulated latency."""
+        provider = LocalProvider('fixed:50')
+        started = time.perf_counter()
+        provider.generate('Generate 1 scenes.')
+        asyncio.run(provider.agenerate('Generate 1 scenes.'))
+        self.assertGreaterEqual(time.perf_counter() - started, 0.1)
+
+
+class TestLocalGenerator(unittest.TestCase):
+
+    def setUp(self):
+        self.generator = PrompterGenerator(provider='local')
+
+    def test_no_api_key_needed(self):
+        """Test that the local provider is selected without an API key."""
+        self.assertEqual(self.generator.provider, AIProvider.LOCAL)
+        self.assertEqual(Config.get_api_key('local'), '')
+
+    def test_prompt_generators(self):
+        """Test that the Midjourney, Flux and Imagen generators work offline."""
+        midjourney = self.generator.prompt_generator(main_base='team meeting')
+        self.assertEqual(midjourney['provider'], 'local')
+        self.assertTrue(midjourney['text'].startswith('/imagine prompt: team meeting'))
+
+        flux = self.generator.flux_prompt_generator(main_base='team meeting')
+        self.assertIn('team meeting', flux['text'])
+        self.assertNotIn('--', flux['text'])
+
+        imagen = self.generator.imagen_prompt_generator(main_base='team meeting')
+        self.assertIn('team meeting', imagen['text'])
+
+    def test_storyboard(self):
+        """Test that storyboard scenes are numbered and use the context and keywords."""
+        result = self.generator.storyboard_generator('product launch', ['rocket', 'crowd'], 3)
+        self.assertEqual([scene['scene'] for scene in result['scenes']], [1, 2, 3])
+        self.assertIn('product launch', result['scenes'][0]['prompt'])
+        self.assertIn('crowd', result['scenes'][1]['prompt'])
+
+    def test_async_generators_match_sync(self):
+        """Test that the async storyboard generator returns the sync result."""
+        sync = self.generator.storyboard_generator('product launch', ['rocket'], 2)
+        self.assertEqual(asyncio.run(self.generator.astoryboard_generator('product launch', ['rocket'], 2)), sync)
+
+    def test_app_accepts_local_requests_without_key(self):
+        """Test that the API accepts keyless local requests but still rejects keyless Gemini ones."""
+        import app
+        client = app.app.test_client()
+        with patch.object(app, 'PROMPT_PACING_SECONDS', 0):
+            response = client.post('/api/generate_prompts', json={'provider': 'local', 'main_base': 'office'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['prompts'][0]['provider'], 'local')
+
+        response = client.post('/api/generate_prompts', json={'provider': 'gemini', 'main_base': 'office'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_storyboard_streams_scene_ranges(self):
+        """Test that a long local storyboard streams every scene range."""
+        import app
+        response = app.app.test_client().post('/api/generate_storyboard', json={
+            'provider': 'local', 'context': 'launch', 'keywords': 'rocket', 'num_scenes': 20,
+            'chunk_size': 8, 'stream': 'ndjson'})
+        events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+        self.assertEqual(events[0], {'type': 'start', 'total_scenes': 20, 'chunks': 3})
+        ranges = sorted((e['first_scene'], e['last_scene']) for e in events if e['type'] == 'scenes')
+        self.assertEqual(ranges, [(1, 8), (9, 16), (17, 20)])
+        self.assertEqual(events[-1]['scenes_generated'], 20)
+        self.assertEqual(events[-1]['failed_chunks'], [])
+
+
+@unittest.skipUnless(HAS_PIL, "Pillow not installed")
+class TestLocalImageAnalysis(unittest.TestCase):
+
+    def test_batch_keywording_without_key(self):
+        """Test that batch image keywording works with the local provider."""
+        from PIL import Image
+        from image_metadata_extractor import ImageMetadataExtractor
+
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for i, color in enumerate([(200, 30, 30), (30, 200, 30)]):
+                paths.append(os.path.join(tmp, f'img_{i}.jpg'))
+                Image.new('RGB', (64, 48), color).save(paths[-1])
+
+            extractor = ImageMetadataExtractor(ai_provider='local')
+            results = extractor.batch_process_images(paths, ai_batch_size=2)
+
+        analyses = [r['metadata']['ai_analysis'] for r in results]
+        self.assertTrue(all(a['ai_generated'] and a['ai_keywords'] for a in analyses))
+
+
+if __name__ == '__main__':
+    unittest.main()
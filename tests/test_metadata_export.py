@@ -0,0 +1,111 @@
+import unittest
+import csv
+import io
+import json
+import os
+import sys
+import zipfile
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from metadata_export import ExportWriter, iter_export, iter_zip_archive, manifest_row, normalize_record, write_exports
+
+BATCH_RESULT = {
+    'filename': 'beach.jpg',
+    'success': True,
+    'metadata': {
+        'filename': 'beach.jpg',
+        'width': 6000,
+        'height': 4000,
+        'created_date': '2024-05-01T10:00:00',
+        'ai_analysis': {
+            'ai_title': 'Sunny beach',
+            'ai_description': 'Waves on a sunny beach',
+            'ai_keywords': ', '.join(f'kw{i}' for i in range(60)),
+            'ai_category': 'Travel'
+        },
+        'microstock_optimization': {'quality_score': 80}
+    }
+}
+
+FLAT_ITEM = {'filename': 'desk.jpg', 'title': 'Desk', 'keywords': ['office', 'work'], 'category': 'Business'}
+
+
+class TestMetadataExport(unittest.TestCase):
+
+    def test_normalize_accepts_batch_results_and_flat_items(self):
+        """Test that nested extractor output and flat records normalize alike."""
+        record = normalize_record(BATCH_RESULT)
+        self.assertEqual(record['title'], 'Sunny beach')
+        self.assertEqual(record['quality_score'], 80)
+        self.assertEqual(len(record['keywords']), 60)
+
+        self.assertEqual(normalize_record(FLAT_ITEM)['keywords'], ['office', 'work'])
+
+    def test_agency_layout_applies_keyword_limit(self):
+        """Test the Adobe Stock layout: headers, numeric category and 49 keywords max."""
+        rows = list(csv.reader(io.StringIO(''.join(iter_export([BATCH_RESULT, FLAT_ITEM], 'adobe_stock')))))
+
+        self.assertEqual(rows[0], ['Filename', 'Title', 'Keywords', 'Category', 'Releases'])
+        self.assertEqual(rows[1][3], '21')
+        self.assertEqual(len(rows[1][2].split(', ')), 49)
+        self.assertEqual(rows[2][:4], ['desk.jpg', 'Desk', 'office, work', '3'])
+
+    def test_json_and_jsonl_are_valid_in_small_chunks(self):
+        """Test that chunked JSON/JSONL output parses back to the input items."""
+        items = [FLAT_ITEM] * 5
+        chunks = list(iter_export(items, 'json', chunk_size=10))
+
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(json.loads(''.join(chunks)), items)
+        self.assertEqual(json.loads(''.join(iter_export([], 'json'))), [])
+        lines = ''.join(iter_export(items, 'jsonl')).splitlines()
+        self.assertEqual([json.loads(line) for line in lines], items)
+
+    def test_write_exports_renders_several_formats_in_one_pass(self):
+        """Test that a single pass over a generator fills every writer."""
+        outputs = {fmt: io.StringIO() for fmt in ('shutterstock', 'istock', 'jsonl')}
+        writers = [ExportWriter(f, fmt) for fmt, f in outputs.items()]
+
+        count = write_exports((item for item in [BATCH_RESULT, FLAT_ITEM]), writers)
+
+        self.assertEqual(count, 2)
+        self.assertEqual(len(outputs['shutterstock'].getvalue().splitlines()), 3)
+        istock = list(csv.reader(io.StringIO(outputs['istock'].getvalue())))
+        self.assertEqual(istock[1][1], '2024-05-01')
+        self.assertEqual(len(outputs['jsonl'].getvalue().splitlines()), 2)
+
+    def test_zip_archive_streams_valid_entries(self):
+        """Test that the on-the-fly ZIP is readable, stores images and deflates the manifest."""
+        image = os.urandom(50000)
+        manifest = ('archive_name,title\n' + 'images/beach.jpg,Sunny beach\n' * 200).encode('utf-8')
+        chunks = list(iter_zip_archive(iter([('images/beach.jpg', image), ('manifest.csv', manifest)]),
+                                       chunk_size=8192))
+
+        self.assertGreater(len(chunks), 6)
+        with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.read('images/beach.jpg'), image)
+            self.assertEqual(archive.getinfo('images/beach.jpg').compress_type, zipfile.ZIP_STORED)
+            self.assertLess(archive.getinfo('manifest.csv').compress_size, len(manifest))
+
+    def test_zip_archive_streams_file_entries(self):
+        """Test that an entry given as a binary file is read in chunks from its current position."""
+        manifest = io.BytesIO(b'skipped' + b'archive_name,title\n' * 1000)
+        manifest.seek(len(b'skipped'))
+        archive_bytes = b''.join(iter_zip_archive(iter([('manifest.csv', manifest)]), chunk_size=1024))
+
+        with zipfile.ZipFile(io.BytesIO(archive_bytes)) as archive:
+            self.assertEqual(archive.read('manifest.csv'), b'archive_name,title\n' * 1000)
+
+    def test_manifest_row(self):
+        """Test that a manifest row carries the archive name, source file, title and success flag."""
+        row = manifest_row('images/beach.jpg', 'beach.jpg', BATCH_RESULT)
+        self.assertEqual(row[:3], ['images/beach.jpg', 'beach.jpg', 'Sunny beach'])
+        self.assertTrue(row[7])
+
+    def test_unknown_format_rejected(self):
+        """Test that an unsupported export format raises ValueError."""
+        with self.assertRaises(ValueError):
+            ExportWriter(io.StringIO(), 'xlsx')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import os
+import time
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from platform_optimizer import PlatformOptimizer, throughput_stats
+
+
+class TestPlatformOptimizer(unittest.TestCase):
+
+    def setUp(self):
+        self.optimizer = PlatformOptimizer()
+
+    def test_single_item_limits(self):
+        """Test that titles, descriptions and keywords are fitted to the platform limits."""
+        keywords = ', '.join(f'kw{i}' for i in range(40))
+        result = self.optimizer.optimize('T' * 90, 'Short description', keywords, 'business', 'getty')
+
+        self.assertEqual(len(result['title']), 80)
+        self.assertEqual(len(result['keywords'].split(', ')), 30)
+        self.assertTrue(result['keywords_truncated'])
+        self.assertFalse(result['compliant'])
+        self.assertEqual(len(result['suggestions']), 2)
+
+    def test_unknown_platform_falls_back_for_single_requests(self):
+        """Test that a single request for an unknown platform keeps the old Shutterstock fallback."""
+        result = self.optimizer.optimize('Title', 'Description', 'a, b', platform='unknown')
+
+        self.assertEqual(result['platform'], 'unknown')
+        self.assertTrue(result['compliant'])
+
+    def test_batch_yields_every_item_platform_pair(self):
+        """Test batch results for flat items and extractor metadata across platforms."""
+        items = [
+            {'title': 'Desk', 'description': 'Office desk', 'keywords': 'office, desk'},
+            {'metadata': {'filename': 'beach.jpg', 'ai_analysis': {
+                'ai_title': 'Beach', 'ai_description': 'Sunny beach', 'ai_keywords': 'sea, sand'}}},
+            {'title': 'No description'},
+        ]
+        results = list(self.optimizer.optimize_batch(items, ['adobe_stock', 'istock']))
+
+        self.assertEqual(len(results), 6)
+        self.assertEqual([(r['index'], r['platform']) for r in results[:2]], [(0, 'adobe_stock'), (0, 'istock')])
+        self.assertEqual(results[2]['optimized']['keywords'], 'sea, sand')
+        self.assertFalse(results[4]['success'])
+
+    def test_forbidden_terms_are_reported_per_platform(self):
+        """Test that one scan per item flags common and platform-specific forbidden terms."""
+        items = [{'title': 'Nike shoes', 'description': 'Edited in Photoshop', 'keywords': 'sport, shoes'}]
+        results = {r['platform']: r['optimized'] for r in self.optimizer.optimize_batch(items, ['shutterstock', 'adobe_stock'])}
+
+        self.assertEqual([f['term'] for f in results['shutterstock']['forbidden_terms']], ['nike'])
+        self.assertEqual([f['term'] for f in results['adobe_stock']['forbidden_terms']], ['nike', 'photoshop'])
+        self.assertFalse(results['adobe_stock']['compliance_check']['forbidden_terms'])
+        self.assertIn('Remove forbidden terms: nike, photoshop', results['adobe_stock']['suggestions'])
+        self.assertFalse(results['shutterstock']['compliant'])
+
+    def test_resolve_platforms(self):
+        """Test 'all', comma-separated names and rejection of unknown platforms."""
+        self.assertEqual(len(self.optimizer.resolve_platforms('all')), len(self.optimizer.platforms))
+        self.assertEqual([r.name for r in self.optimizer.resolve_platforms('getty, istock')], ['getty', 'istock'])
+        with self.assertRaises(ValueError):
+            self.optimizer.resolve_platforms(['shutterstock', 'flickr'])
+
+    def test_throughput_stats(self):
+        """Test that throughput counts results per second of elapsed time."""
+        stats = throughput_stats(10, 4, 40, 1, started=time.perf_counter() - 2)
+        self.assertEqual(stats['results'], 40)
+        self.assertAlmostEqual(stats['results_per_second'], 20, delta=1)
+
+if __name__ == '__main__':
+    unittest.main()
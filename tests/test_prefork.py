@@ -0,0 +1,108 @@
+import unittest
+import json
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from prefork import Master, RequestLimiter, memory_usage
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class TestPrefork(unittest.TestCase):
+
+    def test_request_limiter_fires_once_at_limit(self):
+        """Test that the limiter counts every request but fires its callback only once."""
+        calls = []
+        limiter = RequestLimiter(lambda environ, start_response: [b'ok'], 3, lambda: calls.append(True))
+        for _ in range(5):
+            limiter({}, None)
+        self.assertEqual((limiter.count, len(calls)), (5, 1))
+
+    def test_memory_usage_reports_rss(self):
+        """Test that the current process reports a positive resident size."""
+        self.assertGreater(memory_usage()['rss_mb'], 0)
+
+    def test_respawn_backs_off_while_worker_crashes_at_startup(self):
+        """Test that early crashes double the respawn delay and a clean exit resets it."""
+        master = Master(None, None, 1, 0, 0, 1)
+        now = time.monotonic()
+        master.started_at[1] = now
+        self.assertEqual(master.schedule_respawn(1, 1, now + 0.1), 0.5)
+        self.assertEqual(master.schedule_respawn(1, 1, now + 0.2), 1.0)
+        self.assertEqual(master.schedule_respawn(1, 1, now + 0.3), 2.0)
+        self.assertAlmostEqual(master.respawn_at[1], now + 2.3)
+        self.assertEqual(master.schedule_respawn(1, 0, now + 0.4), 0.0)
+        master.started_at[1] = now - 60
+        self.assertEqual(master.schedule_respawn(1, 1, now), 0.0)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), "Prefork needs os.fork")
+    def test_workers_recycle_reload_and_stop(self):
+        """Test that requests keep succeeding across recycling and a SIGHUP reload, then SIGTERM stops cleanly."""
+        port = free_port()
+        log_file = tempfile.TemporaryFile(mode='w+')
+        self.addCleanup(log_file.close)
+        master = subprocess.Popen([sys.executable, 'prefork.py', '--host', '127.0.0.1', '--port', str(port),
+                                   '--workers', '2', '--max-requests', '2', '--max-requests-jitter', '0'],
+                                  cwd=ROOT, stdout=subprocess.DEVNULL, stderr=log_file)
+        self.addCleanup(lambda: master.poll() is None and master.kill())
+
+        def wait_for_log(text, count=1):
+            deadline = time.monotonic() + 30
+            while True:
+                log_file.seek(0)
+                log = log_file.read()
+                if log.count(text) >= count:
+                    return log
+                self.assertLess(time.monotonic(), deadline, f"timed out waiting for {text!r}")
+                time.sleep(0.1)
+
+        def post():
+            request = urllib.request.Request(f'http://127.0.0.1:{port}/api/analyze_prompt',
+                                             data=json.dumps({'main_base': 'team meeting'}).encode(),
+                                             headers={'Content-Type': 'application/json'})
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.status
+
+        wait_for_log('up in')
+        self.assertEqual([post() for _ in range(6)], [200] * 6)
+
+        # The old master hands over to the new one and exits once the new workers are serving
+        master.send_signal(signal.SIGHUP)
+        log = wait_for_log('up in', count=2)
+        successor = int(re.findall(r'Master pid (\d+) up in', log)[1])
+        self.addCleanup(self._kill, successor)
+        self.assertEqual([post() for _ in range(2)], [200] * 2)
+        self.assertEqual(master.wait(timeout=30), 0)
+        self.assertEqual([post() for _ in range(2)], [200] * 2)
+
+        os.kill(successor, signal.SIGTERM)
+        log = wait_for_log('Received SIGTERM')
+
+        self.assertIn('Worker 1 ready', log)
+        self.assertIn('rss', log)
+        self.assertIn('exited, starting a replacement', log)
+        self.assertIn('Reloading', log)
+        self.assertIn('stopping old workers', log)
+
+    @staticmethod
+    def _kill(pid):
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+from unittest.mock import patch
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from config import Config
+from controller import PrompterGenerator
+from pregeneration import PregenerationPool, PregenSpec
+
+
+def spec(subject: str, aspect: str = '16:9') -> PregenSpec:
+    return PregenSpec('local', None, 'prompt_generator',
+                      {'main_base': subject, 'image_style': 'Photography', 'aspect': aspect})
+
+
+class TestPregenerationPool(unittest.TestCase):
+
+    def setUp(self):
+        settings = {'PREGEN_ENABLED': True, 'PREGEN_IDLE_SECONDS': 0, 'PREGEN_PER_SPEC': 1, 'PREGEN_BATCH': 1,
+                    'PREGEN_TOKEN_BUDGET': 10 ** 6, 'PREGEN_UNIQUE': True}
+        for name, value in settings.items():
+            patcher = patch.object(Config, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch.object(PregenerationPool, '_ensure_started')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = PregenerationPool()
+
+    def test_most_requested_spec_is_generated_first(self):
+        """Test that the most requested spec is generated first and matched case-insensitively."""
+        self.pool.observe(spec('office'))
+        self.pool.observe(spec('beach'), count=3)
+        self.assertEqual(self.pool.run_once(), 1)
+        self.assertIsNone(self.pool.take(spec('office')))
+        self.assertTrue(self.pool.take(spec('Beach '))['pregenerated'])
+
+    def test_each_prompt_is_served_once_when_unique(self):
+        """Test that unique mode serves each prompt once and shared mode reuses it."""
+        self.pool.observe(spec('office'))
+        self.pool.run_once()
+        self.assertIsNotNone(self.pool.take(spec('office')))
+        self.assertIsNone(self.pool.take(spec('office')))
+        self.assertIsNone(self.pool.take(spec('office', aspect='1:1')))
+
+        self.pool.run_once()
+        with patch.object(Config, 'PREGEN_UNIQUE', False):
+            self.assertEqual(self.pool.take(spec('office')), self.pool.take(spec('office')))
+        self.assertEqual(self.pool.stats()['hits'], 3)
+
+    def test_hourly_token_budget_and_traffic_stop_generation(self):
+        """Test that generation stops when the hourly budget is spent or requests are arriving."""
+        per_prompt = PrompterGenerator(provider='local').estimate_call_tokens('prompt_generator', **spec('a').kwargs)
+        with patch.object(Config, 'PREGEN_TOKEN_BUDGET', per_prompt * 3 // 2), patch.object(Config, 'PREGEN_BATCH', 5):
+            self.pool.observe(spec('a'))
+            self.pool.observe(spec('b'))
+            self.assertEqual(self.pool.run_once(), 1)
+            self.assertEqual(self.pool.run_once(), 0)
+        with patch.object(Config, 'PREGEN_IDLE_SECONDS', 60):
+            self.pool.observe(spec('b'))
+            self.assertEqual(self.pool.run_once(), 0)
+
+    def test_tracked_specs_are_capped_evicting_uncached_first(self):
+        """Test that past PREGEN_MAX_TRACKED uncached specs are forgotten first, then cached ones with their prompts."""
+        with patch.object(Config, 'PREGEN_MAX_TRACKED', 2):
+            self.pool.observe(spec('office'))
+            self.pool.run_once()
+            self.pool.observe(spec('beach'), count=3)
+            self.pool.observe(spec('forest'))
+            self.assertEqual(self.pool.stats()['tracked_specs'], 2)
+            self.assertIsNotNone(self.pool.take(spec('office')))
+
+        with patch.object(Config, 'PREGEN_MAX_TRACKED', 1):
+            self.pool.run_once()
+            self.pool.observe(spec('desert'))
+            self.assertEqual(self.pool.stats()['tracked_specs'], 1)
+            self.assertEqual(self.pool.stats()['cached_prompts'], 0)
+
+    def test_trending_subjects_seed_the_pool(self):
+        """Test that trending subjects seed the pool before any request."""
+        import app
+        with patch.object(Config, 'DEFAULT_PROVIDER', 'local'), patch.object(Config, 'DEFAULT_MODEL', 'local'):
+            seeds = app.trending_prompt_specs()
+            self.pool.seed(seeds)
+            self.assertEqual(self.pool.run_once(), 1)
+        self.assertEqual(sum(self.pool.take(seed) is not None for seed in seeds), 1)
+        self.assertIn('startup office environment', [seed.kwargs['main_base'] for seed in seeds])
+
+    def test_route_serves_pool_prompts_before_calling_the_provider(self):
+        """Test that the prompts route serves pooled prompts first and reports pool stats."""
+        import app
+        client = app.app.test_client()
+        request = {'provider': 'local', 'main_base': 'office', 'num_prompts': 2}
+        with patch.object(app, 'pregeneration_pool', self.pool), patch.object(app, 'PROMPT_PACING_SECONDS', 0):
+            client.post('/api/generate_prompts', json=request)
+            self.assertEqual(self.pool.run_once(), 1)
+            response = client.post('/api/generate_prompts', json=request)
+            stats = json.loads(client.get('/api/stats').data)['pregeneration']
+        self.assertEqual(len(response.get_json()['prompts']), 2)
+        self.assertEqual((stats['hits'], stats['generated']), (1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
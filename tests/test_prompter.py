@@ -1,11 +1,14 @@
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from controller import PrompterGenerator, AIProvider
 import controller
+import asyncio
 import json
+import re
+import time
 
 # Ensure placeholder attributes exist for patching
 controller.openai = MagicMock()
@@ -104,5 +107,123 @@ class TestPrompterGenerator(unittest.TestCase):
         self.assertEqual(result['provider'], 'openai')
         self.assertEqual(result['scenes'][0]['prompt'], 'first scene')
 
+    @patch('controller.genai.GenerativeModel')
+    def test_async_prompt_generator_gemini(self, mock_gemini_model):
+        """Test that the async generator awaits Gemini's async API instead of the blocking call."""
+        mock_response = MagicMock()
+        mock_response.text = "an async prompt"
+        mock_gemini_model.return_value.generate_content_async = AsyncMock(return_value=mock_response)
+
+        generator = PrompterGenerator(api_key=self.api_key, provider='gemini')
+        result = asyncio.run(generator.aprompt_generator(main_base="test"))
+
+        self.assertEqual((result['text'], result['provider']), ("an async prompt", 'gemini'))
+        self.assertEqual(result['usage']['input_tokens'], result['usage']['full_input_tokens'])
+        mock_gemini_model.return_value.generate_content.assert_not_called()
+
+    @patch('controller.openai.AsyncOpenAI')
+    @patch('controller.openai.OpenAI')
+    def test_async_storyboard_generator_openai(self, mock_openai_client, mock_async_client):
+        """Test async storyboard generation through the AsyncOpenAI client."""
+        mock_response = MagicMock()
+        mock_response.choices[0].message.content = json.dumps([{"scene": 1, "prompt": "first scene"}])
+        mock_async_client.return_value.chat.completions.create = AsyncMock(return_value=mock_response)
+
+        generator = PrompterGenerator(api_key=self.api_key, provider='openai')
+        result = asyncio.run(generator.astoryboard_generator(context="test", keywords=["keyword"], num_scenes=1))
+
+        self.assertEqual(result['scenes'][0]['prompt'], 'first scene')
+        mock_openai_client.return_value.chat.completions.create.assert_not_called()
+
+    @patch('controller.genai.GenerativeModel')
+    def test_chunked_storyboard_runs_in_parallel_and_keeps_good_chunks(self, mock_gemini_model):
+        """Test that a long storyboard is split into parallel scene ranges and a bad range does not sink it."""
+        def answer(prompt, **kwargs):
+            time.sleep(0.1)
+            first, last = map(int, re.search(r"numbered (\d+) to (\d+)", prompt).groups())
+            if first == 5:
+                return MagicMock(text='[{"scene": 5, "prompt": "cut off')
+            return MagicMock(text=json.dumps([{"scene": n, "prompt": f"scene {n}"} for n in range(1, last - first + 2)]))
+        mock_gemini_model.return_value.generate_content.side_effect = answer
+        del mock_gemini_model.return_value.generate_content_async  # async calls use the sync API in a thread
+
+        generator = PrompterGenerator(api_key=self.api_key, provider='gemini')
+        started = time.perf_counter()
+        result = generator.storyboard_generator(context="test", keywords=["keyword"], num_scenes=12, chunk_size=4)
+        elapsed = time.perf_counter() - started
+
+        self.assertLess(elapsed, 0.5)  # 3 chunks x 2 attempts x 100 ms would take 0.6 s serially
+        self.assertEqual([scene['scene'] for scene in result['scenes']], [1, 2, 3, 4, 9, 10, 11, 12])
+        self.assertEqual([(c['first_scene'], c['last_scene']) for c in result['failed_chunks']], [(5, 8)])
+        self.assertEqual(mock_gemini_model.return_value.generate_content.call_count, 4)
+
+        async_result = asyncio.run(generator.astoryboard_generator(context="test", keywords=["keyword"],
+                                                                   num_scenes=12, chunk_size=4))
+        self.assertEqual(async_result, result)
+
+    @patch('controller.genai.GenerativeModel')
+    def test_stream_prompt_generator_gemini(self, mock_gemini_model):
+        """Test that streamed generation relays Gemini's chunks and skips ones without text."""
+        chunks = [MagicMock(parts=[1], text="a test "), MagicMock(parts=[]), MagicMock(parts=[1], text="prompt")]
+        mock_gemini_model.return_value.generate_content.return_value = iter(chunks)
+
+        generator = PrompterGenerator(api_key=self.api_key, provider='gemini')
+        result = list(generator.stream_prompt_generator(main_base="test"))
+
+        self.assertEqual(result, ["a test ", "prompt"])
+        self.assertTrue(mock_gemini_model.return_value.generate_content.call_args.kwargs['stream'])
+
+    @patch('controller.openai.OpenAI')
+    def test_stream_storyboard_generator_openai(self, mock_openai_client):
+        """Test that streamed storyboards yield each scene once its JSON object is complete."""
+        text = '```json\n[{"scene": 1, "prompt": "first"}, {"scene": 2, "prompt": "second"}]\n```'
+        deltas = [MagicMock(choices=[MagicMock(delta=MagicMock(content=text[i:i + 7]))]) for i in range(0, len(text), 7)]
+        mock_openai_client.return_value.chat.completions.create.return_value = iter(deltas)
+
+        generator = PrompterGenerator(api_key=self.api_key, provider='openai')
+        scenes = generator.stream_storyboard_generator(context="test", keywords=["keyword"], num_scenes=2)
+
+        self.assertEqual(next(scenes), {"scene": 1, "prompt": "first"})
+        self.assertEqual(list(scenes), [{"scene": 2, "prompt": "second"}])
+        self.assertTrue(mock_openai_client.return_value.chat.completions.create.call_args.kwargs['stream'])
+
+    def test_stream_generator_validates_eagerly(self):
+        """Test that a streaming generator rejects an empty subject before streaming starts."""
+        generator = PrompterGenerator(provider='local')
+        with self.assertRaises(ValueError):
+            generator.stream_flux_prompt_generator(main_base=" ")
+
+    @patch('controller.openai.OpenAI')
+    def test_compact_prompts_send_instructions_as_system_prompt(self, mock_openai_client):
+        """Test that compact mode sends only the request fields and reports the input-token drop."""
+        mock_response = MagicMock()
+        mock_response.choices[0].message.content = "a test prompt"
+        mock_openai_client.return_value.chat.completions.create.return_value = mock_response
+
+        generator = PrompterGenerator(api_key=self.api_key, provider='openai', compact_prompts=True)
+        result = generator.flux_prompt_generator(main_base="team meeting", theme="success")
+
+        system, user = mock_openai_client.return_value.chat.completions.create.call_args.kwargs['messages']
+        self.assertEqual(system['content'], controller.FLUX_COMPACT_SYSTEM_PROMPT)
+        self.assertIn("CORE SUBJECT: team meeting", user['content'])
+        self.assertIn("THEME: success", user['content'])
+        self.assertNotIn("OPTIMIZATION CHECKLIST", user['content'])
+        usage = result['usage']
+        self.assertLess(usage['input_tokens'], usage['full_input_tokens'] / 2)
+        self.assertGreater(usage['system_tokens'], 0)
+
+    @patch('controller.genai.GenerativeModel')
+    def test_compact_prompts_use_gemini_system_instruction(self, mock_gemini_model):
+        """Test that compact mode builds one Gemini model per system instruction and reuses it."""
+        mock_gemini_model.return_value.generate_content.return_value.text = "a test prompt"
+
+        generator = PrompterGenerator(api_key=self.api_key, provider='gemini', compact_prompts=True)
+        generator.prompt_generator(main_base="test")
+        generator.prompt_generator(main_base="other test")
+
+        mock_gemini_model.assert_called_with(model_name='gemini-1.5-pro',
+                                             system_instruction=controller.MIDJOURNEY_COMPACT_SYSTEM_PROMPT)
+        self.assertEqual(mock_gemini_model.call_count, 2)  # The default model plus the compact one
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,232 @@
+import unittest
+from unittest.mock import patch
+import asyncio
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from config import Config
+from provider_router import HedgedGenerator, ProviderRouter, with_failover
+
+
+class ProviderDown(Exception):
+    """A provider-side error, like the SDKs' 503 errors"""
+    status_code = 503
+
+
+class InvalidKey(Exception):
+    """A caller-side error, like the SDKs' 401 errors"""
+    status_code = 401
+
+
+class FakeGenerator:
+    """Answers with its provider name after a delay, or raises when told to fail"""
+
+    def __init__(self, provider, delay=0.0, fail=False, error=ProviderDown):
+        self.provider = provider
+        self.delay = delay
+        self.fail = fail
+        self.error = error
+        self.calls = 0
+        self.cancelled = threading.Event()
+
+    def prompt_generator(self, **kwargs):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise self.error(f"{self.provider} down")
+        return {'text': kwargs.get('main_base'), 'provider': self.provider}
+
+    async def aprompt_generator(self, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled.set()
+            raise
+        if self.fail:
+            raise self.error(f"{self.provider} down")
+        return {'text': kwargs.get('main_base'), 'provider': self.provider}
+
+
+class TestProviderRouter(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch.multiple(Config, HEDGE_DEFAULT_DELAY_SECONDS=0.05, HEDGE_MIN_DELAY_SECONDS=0.01,
+                                 HEDGE_MIN_SAMPLES=3, ROUTER_CIRCUIT_FAILURES=2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.router = ProviderRouter()
+
+    def test_fast_primary_is_not_hedged(self):
+        """Test that a primary answering before its hedge delay is never backed up."""
+        primary, backup = FakeGenerator('gemini'), FakeGenerator('openai')
+        result = HedgedGenerator([primary, backup], self.router).prompt_generator(main_base='cat')
+        self.assertEqual(result, {'text': 'cat', 'provider': 'gemini'})
+        self.assertEqual(backup.calls, 0)
+
+    def test_slow_primary_is_hedged_after_delay(self):
+        """Test that a slow primary is raced against the backup and the backup's win is counted."""
+        primary, backup = FakeGenerator('gemini', delay=1.0), FakeGenerator('openai')
+        started = time.perf_counter()
+        result = self.router.call([primary, backup], 'prompt_generator', kwargs={'main_base': 'cat'})
+        self.assertEqual(result['provider'], 'openai')
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertEqual(self.router.stats()['openai']['prompt_generator']['hedges_won'], 1)
+
+    def test_hedge_delay_follows_latency_percentile(self):
+        """Test that the hedge delay is the default until enough samples, then the configured percentile."""
+        health = self.router.health_of('gemini', 'prompt_generator')
+        self.assertEqual(health.hedge_delay(), 0.05)
+        for seconds in (0.1, 0.2, 0.3, 0.4):
+            health.record(True, seconds)
+        with patch.object(Config, 'HEDGE_PERCENTILE', 75):
+            self.assertEqual(health.hedge_delay(), 0.3)
+
+    def test_failure_fails_over_immediately(self):
+        """Test that a failing primary fails over without waiting for the hedge delay."""
+        primary, backup = FakeGenerator('gemini', fail=True), FakeGenerator('openai')
+        result = self.router.call([primary, backup], 'prompt_generator', kwargs={'main_base': 'cat'})
+        self.assertEqual(result['provider'], 'openai')
+
+    def test_all_failing_raises_primary_error(self):
+        """Test that when every provider fails the primary's error is raised."""
+        generators = [FakeGenerator('gemini', fail=True), FakeGenerator('openai', fail=True)]
+        with self.assertRaisesRegex(ProviderDown, 'gemini down'):
+            self.router.call(generators, 'prompt_generator', kwargs={})
+
+    def test_caller_errors_neither_fail_over_nor_count_against_the_provider(self):
+        """Test that an invalid-key error, even wrapped, is raised without failover or a health record."""
+        class WrappingGenerator(FakeGenerator):
+            def prompt_generator(self, **kwargs):
+                try:
+                    return super().prompt_generator(**kwargs)
+                except InvalidKey as e:
+                    raise ValueError(f"OpenAI API error: {e}") from e
+
+        primary = WrappingGenerator('gemini', fail=True, error=InvalidKey)
+        backup = FakeGenerator('openai')
+        for _ in range(3):
+            with self.assertRaises(ValueError):
+                self.router.call([primary, backup], 'prompt_generator', kwargs={})
+        with self.assertRaises(InvalidKey):
+            asyncio.run(self.router.acall([primary, backup], 'aprompt_generator', kwargs={}))
+        self.assertEqual(backup.calls, 0)
+        self.assertEqual(self.router.health_of('gemini', 'prompt_generator').calls, 0)
+        self.assertIs(self.router.order([primary, backup])[0], primary)
+
+    def test_unhealthy_provider_is_tried_last(self):
+        """Test that a provider whose circuit opened is ordered after healthy ones."""
+        primary, backup = FakeGenerator('gemini', fail=True), FakeGenerator('openai')
+        self.router.call([primary, backup], 'prompt_generator', kwargs={})
+        self.router.call([primary, backup], 'prompt_generator', kwargs={})
+        self.assertEqual(primary.calls, 1)
+        self.assertEqual(HedgedGenerator([primary, backup], self.router).provider, 'openai')
+
+    def test_circuit_opens_after_consecutive_failures(self):
+        """Test that the circuit opens only after the configured run of failures."""
+        health = self.router.health_of('gemini', 'prompt_generator')
+        for _ in range(10):
+            health.record(True, 0.1)
+        health.record(False, 0.1)
+        self.assertTrue(health.healthy)
+        health.record(False, 0.1)
+        self.assertTrue(health.circuit_open)
+        self.assertFalse(health.healthy)
+
+    def test_health_is_kept_per_method(self):
+        """Test that one method's failures do not reorder another's, and async calls share the sync health."""
+        primary, backup = FakeGenerator('gemini', fail=True), FakeGenerator('openai')
+        for _ in range(2):
+            self.router.call([primary, backup], 'prompt_generator', kwargs={})
+        self.assertIs(self.router.order([primary, backup], 'storyboard_generator')[0], primary)
+        self.assertIs(self.router.order([primary, backup], 'aprompt_generator')[0], backup)
+        self.assertEqual(set(self.router.stats()['gemini']), {'prompt_generator'})
+
+    def test_sync_calls_are_not_capped_by_a_shared_pool(self):
+        """Test that many concurrent slow calls all run at once without being hedged."""
+        primary, backup = FakeGenerator('gemini', delay=0.3), FakeGenerator('openai')
+        started = time.perf_counter()
+        with patch.object(Config, 'HEDGE_DEFAULT_DELAY_SECONDS', 2.0), ThreadPoolExecutor(max_workers=64) as pool:
+            results = list(pool.map(lambda _: self.router.call([primary, backup], 'prompt_generator', kwargs={}),
+                                    range(64)))
+        self.assertLess(time.perf_counter() - started, 1.5)
+        self.assertEqual({r['provider'] for r in results}, {'gemini'})
+        self.assertEqual(backup.calls, 0)
+
+    def test_async_loser_is_cancelled(self):
+        """Test that the losing async request is cancelled."""
+        primary, backup = FakeGenerator('gemini', delay=1.0), FakeGenerator('openai')
+        generator = HedgedGenerator([primary, backup], self.router)
+        result = asyncio.run(generator.aprompt_generator(main_base='cat'))
+        self.assertEqual(result['provider'], 'openai')
+        self.assertTrue(primary.cancelled.is_set())
+
+
+class TestStreamSelection(unittest.TestCase):
+
+    def test_stream_and_reported_provider_come_from_one_generator(self):
+        """Test that a streamed prompt reports the provider that streamed it even if the ordering changes."""
+        import app
+        from singleflight import coalesce
+
+        class StreamingGenerator:
+            def __init__(self, name):
+                self.provider = SimpleNamespace(value=name)
+
+            def stream_prompt_generator(self, **kwargs):
+                return iter([self.provider.value])
+
+        class FlippingRouter(ProviderRouter):
+            """Reverses its ordering on every call, like health changing mid-request"""
+            flips = 0
+
+            def order(self, generators, method=None):
+                self.flips += 1
+                return list(generators)[::-1] if self.flips % 2 else list(generators)
+
+        generator = coalesce(HedgedGenerator([StreamingGenerator('gemini'), StreamingGenerator('openai')],
+                                             FlippingRouter()), {})
+        job = app.PromptJob('prompt_generator', 'x', {'main_base': 'x'}, lambda result, _round, _i: result,
+                            'prompt', 'stream_prompt_generator', [])
+        events = list(app.stream_prompt_events(job, {'seed': 1}, generator, 1))
+        entry = next(event['entry'] for event in events if event['type'] == 'prompt')
+        self.assertEqual(entry['provider'], entry['text'])
+
+
+class TestWithFailover(unittest.TestCase):
+
+    def setUp(self):
+        self.primary = FakeGenerator('gemini')
+        self.factory = lambda api_key, model_name, provider: SimpleNamespace(provider=provider, api_key=api_key)
+
+    def test_backups_use_the_requests_own_keys(self):
+        """Test that backups are only built from keys the request carries, and only while hedging is enabled."""
+        with patch.multiple(Config, GEMINI_API_KEY='g', OPENAI_API_KEY='server'):
+            self.assertIs(with_failover(self.primary, self.factory), self.primary)
+            hedged = with_failover(self.primary, self.factory, {'openai': 'own'})
+            self.assertEqual(hedged.generators[1:], [SimpleNamespace(provider='openai', api_key='own')])
+            with patch.object(Config, 'HEDGING_ENABLED', False):
+                self.assertIs(with_failover(self.primary, self.factory, {'openai': 'own'}), self.primary)
+
+    def test_server_keys_are_opt_in(self):
+        """Test that the server's keys back requests up only with HEDGE_SERVER_KEYS."""
+        with patch.multiple(Config, OPENAI_API_KEY='server', HEDGE_SERVER_KEYS=True):
+            hedged = with_failover(self.primary, self.factory)
+            self.assertEqual(hedged.generators[1:], [SimpleNamespace(provider='openai', api_key='server')])
+
+    def test_requests_without_backup_keys_never_spend_server_quota(self):
+        """Test that a request with only its own (possibly bogus) key is not hedged on the server's key."""
+        import app
+        with patch.multiple(Config, OPENAI_API_KEY='server'):
+            generator = app.build_generator({'provider': 'gemini', 'api_key': 'bogus'}, self.factory)
+            self.assertNotIsInstance(generator.generator, HedgedGenerator)
+            generator = app.build_generator({'provider': 'gemini', 'api_key': 'bogus',
+                                             'backup_api_keys': {'openai': 'own', 'claude': 5}}, self.factory)
+            self.assertEqual(generator.generator.generators[1:], [SimpleNamespace(provider='openai', api_key='own')])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+from unittest.mock import patch
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from config import Config
+from singleflight import CoalescingGenerator, SingleFlight, coalesce, request_key
+
+
+class CountingGenerator:
+    """Generator stand-in that counts upstream calls, each taking 100 ms"""
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def prompt_generator(self, **kwargs):
+        with self._lock:
+            self.calls += 1
+        time.sleep(0.1)
+        if not kwargs['main_base'].strip():
+            raise ValueError("Main base cannot be empty")
+        return {'text': kwargs['main_base'], 'provider': 'gemini'}
+
+    async def aprompt_generator(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0.1)
+        return {'text': kwargs['main_base'], 'provider': 'gemini'}
+
+    def stream_prompt_generator(self, **kwargs):
+        return iter([kwargs['main_base']])
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def setUp(self):
+        self.upstream = CountingGenerator()
+        self.flight = SingleFlight()
+        self.generator = CoalescingGenerator(self.upstream, ('gemini', None, 'key', None), self.flight)
+
+    def test_keys_ignore_case_and_whitespace(self):
+        """Test that request keys ignore case and whitespace but not the provider."""
+        self.assertEqual(request_key('gemini', {'main_base': 'Team  Meeting '}),
+                         request_key('gemini', {'main_base': 'team meeting'}))
+        self.assertNotEqual(request_key('gemini', {'main_base': 'a'}), request_key('openai', {'main_base': 'a'}))
+
+    def test_concurrent_identical_calls_share_one_upstream_call(self):
+        """Test that concurrent identical calls share one upstream call and get separate copies."""
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            results = list(pool.map(lambda subject: self.generator.prompt_generator(main_base=subject),
+                                    ['Office'] * 9 + ['garden']))
+
+        self.assertEqual(self.upstream.calls, 2)
+        self.assertEqual(results[0], {'text': 'Office', 'provider': 'gemini'})
+        self.assertIsNot(results[0], results[1])
+        self.assertEqual(self.flight.stats()['coalescing_ratio'], 0.8)
+        self.assertEqual(self.flight.stats()['in_flight'], 0)
+
+    def test_sequential_calls_are_not_shared(self):
+        """Test that a finished call is not reused by a later identical one."""
+        self.generator.prompt_generator(main_base='office')
+        self.generator.prompt_generator(main_base='office')
+        self.assertEqual(self.upstream.calls, 2)
+
+    def test_errors_reach_every_waiter(self):
+        """Test that an upstream error is raised in every coalesced caller."""
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            futures = [pool.submit(self.generator.prompt_generator, main_base=' ') for _ in range(3)]
+        for future in futures:
+            self.assertIsInstance(future.exception(), ValueError)
+        self.assertEqual(self.upstream.calls, 1)
+
+    def test_async_calls_share_one_task(self):
+        """Test that concurrent identical async calls share one upstream task."""
+        async def run():
+            return await asyncio.gather(*(self.generator.aprompt_generator(main_base='office') for _ in range(5)))
+
+        results = asyncio.run(run())
+        self.assertEqual(self.upstream.calls, 1)
+        self.assertEqual([r['text'] for r in results], ['office'] * 5)
+
+    def test_streaming_is_not_coalesced(self):
+        """Test that streaming calls pass straight through."""
+        self.assertEqual(list(self.generator.stream_prompt_generator(main_base='office')), ['office'])
+
+    def test_seed_cap_and_key_separate_requests(self):
+        """Test that seed, output cap and credential split the scope and that the key is not stored."""
+        first = coalesce(self.upstream, {'api_key': 'a', 'seed': 1})
+        self.assertNotEqual(first.scope, coalesce(self.upstream, {'api_key': 'a', 'seed': 2}).scope)
+        self.assertNotEqual(first.scope, coalesce(self.upstream, {'api_key': 'a', 'seed': 1, 'max_tokens': 64}).scope)
+        self.assertNotEqual(first.scope, coalesce(self.upstream, {'api_key': 'b', 'seed': 1}).scope)
+        self.assertNotEqual(first.scope, coalesce(self.upstream, {'api_key': 'a', 'seed': 1,
+                                                                 'backup_api_keys': {'openai': 'o'}}).scope)
+        self.assertNotIn('a', first.scope)
+        with patch.object(Config, 'COALESCING_ENABLED', False):
+            self.assertIs(coalesce(self.upstream, {}), self.upstream)
+
+
+if __name__ == '__main__':
+    unittest.main()
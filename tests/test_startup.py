@@ -0,0 +1,45 @@
+import unittest
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["google.generativeai", "openai", "pandas", "PIL", "piexif", "numpy"]
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1000"))
+
+
+def import_in_fresh_interpreter(module):
+    script = (
+        "import json, sys, time\n"
+        "started = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = (time.perf_counter() - started) * 1000\n"
+        f"print(json.dumps({{'ms': elapsed, 'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))\n"
+    )
+    completed = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_controller_defers_provider_sdks(self):
+        """Test that importing the controller does not load provider SDKs."""
+        result = import_in_fresh_interpreter("controller")
+        self.assertEqual(result["loaded"], [])
+
+    def test_extractor_defers_imaging_libraries(self):
+        """Test that importing the extractor does not load Pillow, piexif or provider SDKs."""
+        result = import_in_fresh_interpreter("image_metadata_extractor")
+        self.assertEqual(result["loaded"], [])
+
+    @unittest.skipUnless(importlib.util.find_spec("flask"), "Flask not installed")
+    def test_app_within_startup_budget(self):
+        """Test that the Flask app imports lazily and within the startup budget."""
+        result = import_in_fresh_interpreter("app")
+        self.assertEqual(result["loaded"], [])
+        self.assertLess(result["ms"], STARTUP_BUDGET_MS)
+
+if __name__ == '__main__':
+    unittest.main()
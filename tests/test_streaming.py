@@ -0,0 +1,79 @@
+import unittest
+from unittest.mock import patch
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+import app
+from app import (FLUX_CLEAN_PARAMS, MIDJOURNEY_CLEAN_PARAMS, StreamingPromptCleaner, clean_flux_prompt,
+                 clean_generated_prompt)
+
+
+def stream_clean(text, params, size):
+    cleaner = StreamingPromptCleaner(params)
+    deltas = [cleaner.feed(text[i:i + size]) for i in range(0, len(text), size)]
+    return ''.join(deltas) + cleaner.finish()
+
+
+class TestStreamingPromptCleaner(unittest.TestCase):
+
+    def test_streamed_text_matches_final_clean(self):
+        """Test that the concatenated deltas equal the fully cleaned prompt for any chunking."""
+        texts = [
+            ('/imagine prompt: team meeting in a modern office, soft light --ar 16:9 --v 6 --q 2', MIDJOURNEY_CLEAN_PARAMS,
+             clean_generated_prompt),
+            ('`A sunlit kitchen`, fresh vegetables --tile bright. --style raw', MIDJOURNEY_CLEAN_PARAMS,
+             clean_generated_prompt),
+            ('Close-up of a laptop, shallow depth of field, photorealistic --zoom 2', FLUX_CLEAN_PARAMS,
+             clean_flux_prompt),
+        ]
+        for text, params, clean in texts:
+            for size in (1, 3, 7, len(text)):
+                self.assertEqual(stream_clean(text, params, size), clean(text), (text, size))
+
+    def test_flags_are_held_back_until_their_value_arrives(self):
+        """Test that a partial flag and its value are withheld and then dropped."""
+        cleaner = StreamingPromptCleaner(MIDJOURNEY_CLEAN_PARAMS)
+        self.assertEqual(cleaner.feed('city skyline at dusk --a'), 'city skyline at dusk')
+        self.assertEqual(cleaner.feed('r 16:9 wide'), '')
+        self.assertEqual(cleaner.finish(), ' wide')
+
+
+class TestStreamingEndpoints(unittest.TestCase):
+
+    def setUp(self):
+        self.client = app.app.test_client()
+
+    def test_prompt_text_streams_before_the_entry(self):
+        """Test that prompt deltas stream before the finished entry and summary."""
+        with patch.object(app, 'PROMPT_PACING_SECONDS', 0):
+            response = self.client.post('/api/generate_flux_prompts', json={
+                'provider': 'local', 'main_subject': 'team meeting', 'quality_tags': ['8k'], 'stream': 'ndjson'})
+            events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+        types = [event['type'] for event in events]
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertEqual((types[0], types[1], types[-2], types[-1]), ('start', 'delta', 'prompt', 'summary'))
+        streamed = ''.join(event['text'] for event in events if event['type'] == 'delta')
+        self.assertEqual(events[-2]['entry']['prompt'], streamed + ', 8k')
+
+    def test_validation_errors_are_plain_json(self):
+        """Test that a streaming request failing validation gets a plain JSON 400."""
+        response = self.client.post('/api/generate_prompts', json={'provider': 'gemini', 'main_base': 'x',
+                                                                   'stream': 'ndjson'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json(), {'error': 'API key and main subject are required'})
+
+    def test_provider_failure_ends_the_stream_with_an_error(self):
+        """Test that a provider failure mid-stream ends with an error event."""
+        with patch('controller.LocalProvider.stream', side_effect=RuntimeError('boom')):
+            response = self.client.post('/api/generate_prompts', json={'provider': 'local', 'main_base': 'x',
+                                                                       'stream': 'ndjson'})
+            events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+        self.assertEqual(events[-1]['type'], 'error')
+        self.assertIn('Error generating prompt', events[-1]['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+import controller
+from config import Config
+from controller import PrompterGenerator
+from token_estimator import (TokenBudgetExceeded, TokenLedger, estimate_tokens, fit_calls, fit_output_tokens,
+                             token_ledger)
+
+controller.genai = MagicMock()
+controller.openai = MagicMock()
+
+
+class TestTokenEstimates(unittest.TestCase):
+
+    def test_estimates_track_word_pieces(self):
+        """Test that estimates grow with words and word pieces."""
+        self.assertEqual(estimate_tokens(''), 0)
+        self.assertEqual(estimate_tokens('Hello world, this is a test.'), 8)
+        self.assertGreater(estimate_tokens('photorealistic'), estimate_tokens('photo'))
+
+    def test_output_cap_shrinks_then_rejects(self):
+        """Test that the output cap is kept, shrunk to the budget, or rejected below the minimum."""
+        self.assertEqual(fit_output_tokens(100, 150, 0, 32), 150)
+        self.assertEqual(fit_output_tokens(100, 150, 200, 32), 100)
+        with self.assertRaises(TokenBudgetExceeded):
+            fit_output_tokens(180, 150, 200, 32)
+
+    def test_job_budget_fits_whole_calls(self):
+        """Test that a job budget admits only whole calls."""
+        self.assertEqual(fit_calls(100, 10, 0), 10)
+        self.assertEqual(fit_calls(100, 10, 350), 3)
+
+    def test_ledger_compares_estimates_with_reported_counts(self):
+        """Test that the ledger compares estimates with provider-reported counts."""
+        ledger = TokenLedger()
+        ledger.record('openai', 100, 150, actual_input=120, actual_output=40)
+        ledger.record('openai', 100, 150)
+        stats = ledger.stats()['openai']
+        self.assertEqual((stats['calls'], stats['reported_calls']), (2, 1))
+        self.assertEqual(stats['actual_to_estimated'], 1.2)
+        self.assertEqual(stats['avg_actual_output'], 40.0)
+
+
+class TestGeneratorBudgets(unittest.TestCase):
+
+    @patch('controller.openai.OpenAI')
+    def test_request_budget_shrinks_output_and_ledger_records_usage(self, mock_openai_client):
+        """Test that a request budget shrinks the OpenAI cap, rejects calls that cannot fit and records usage."""
+        response = MagicMock()
+        response.choices[0].message.content = 'a test prompt'
+        response.usage.prompt_tokens, response.usage.completion_tokens = 480, 30
+        create = mock_openai_client.return_value.chat.completions.create
+        create.return_value = response
+
+        generator = PrompterGenerator(api_key='key', provider='openai', max_tokens=120)
+        estimated = generator.estimate_call_tokens('prompt_generator', main_base='team meeting') - 120
+        before = token_ledger.stats().get('openai', {}).get('reported_calls', 0)
+        with patch.object(Config, 'REQUEST_TOKEN_BUDGET', estimated + 50):
+            generator.prompt_generator(main_base='team meeting')
+        self.assertEqual(create.call_args.kwargs['max_tokens'], 50)
+        self.assertEqual(token_ledger.stats()['openai']['reported_calls'], before + 1)
+
+        with patch.object(Config, 'REQUEST_TOKEN_BUDGET', estimated + 10):
+            with self.assertRaises(TokenBudgetExceeded):
+                generator.prompt_generator(main_base='team meeting')
+
+    @patch('controller.genai.GenerativeModel')
+    def test_gemini_is_only_capped_when_asked(self, mock_gemini_model):
+        """Test that Gemini is only capped with a request max_tokens or a budget, at the fitted cap the ledger records."""
+        generate = mock_gemini_model.return_value.generate_content
+        generate.return_value = MagicMock(text='a test prompt', usage_metadata=None)
+
+        PrompterGenerator(api_key='key', provider='gemini').prompt_generator(main_base='team meeting')
+        self.assertEqual(generate.call_args.kwargs['generation_config'], {})
+
+        PrompterGenerator(api_key='key', provider='gemini', max_tokens=400).prompt_generator(main_base='team meeting')
+        self.assertEqual(generate.call_args.kwargs['generation_config'], {'max_output_tokens': 400})
+
+        generator = PrompterGenerator(api_key='key', provider='gemini')
+        estimated = generator.estimate_call_tokens('prompt_generator', main_base='team meeting')
+        estimated -= Config.PROMPT_MAX_TOKENS
+        before = token_ledger.stats()['gemini']['max_output']
+        with patch.object(Config, 'REQUEST_TOKEN_BUDGET', estimated + 1000):
+            generator.prompt_generator(main_base='team meeting')
+        self.assertEqual(generate.call_args.kwargs['generation_config'], {'max_output_tokens': Config.PROMPT_MAX_TOKENS})
+        with patch.object(Config, 'REQUEST_TOKEN_BUDGET', estimated + 50):
+            generator.prompt_generator(main_base='team meeting')
+        self.assertEqual(generate.call_args.kwargs['generation_config'], {'max_output_tokens': 50})
+        self.assertEqual(token_ledger.stats()['gemini']['max_output'] - before, Config.PROMPT_MAX_TOKENS + 50)
+
+    def test_storyboard_estimate_counts_every_chunk(self):
+        """Test that a chunked storyboard estimate covers every chunk and non-AI methods cost nothing."""
+        generator = PrompterGenerator(provider='local')
+        single = generator.estimate_call_tokens('storyboard_generator', context='launch', keywords=['rocket'],
+                                                num_scenes=8)
+        chunked = generator.estimate_call_tokens('storyboard_generator', context='launch', keywords=['rocket'],
+                                                 num_scenes=16, chunk_size=8)
+        self.assertGreater(chunked, 2 * single - 50)
+        self.assertEqual(generator.estimate_call_tokens('imagen_prompt_generator', main_base='x'), 0)
+
+
+class TestJobBudgets(unittest.TestCase):
+
+    def setUp(self):
+        import app
+        self.client = app.app.test_client()
+        patcher = patch.object(app, 'PROMPT_PACING_SECONDS', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.per_prompt = PrompterGenerator(provider='local').estimate_call_tokens('prompt_generator',
+                                                                                  main_base='office')
+
+    def test_prompt_job_is_trimmed_to_budget(self):
+        """Test that a prompt job is trimmed to the prompts its budget covers."""
+        request = {'provider': 'local', 'main_base': 'office', 'num_prompts': 5}
+        per_prompt = self.client.post('/api/generate_prompts', json=dict(request, token_budget=10 ** 6)).get_json()[
+            'token_budget']['tokens_per_prompt']
+        response = self.client.post('/api/generate_prompts', json=dict(request, token_budget=per_prompt * 5 // 2))
+        payload = response.get_json()
+        self.assertEqual(len(payload['prompts']), 2)
+        self.assertEqual(payload['token_budget']['skipped'], 3)
+
+        response = self.client.post('/api/generate_prompts', json={
+            'provider': 'local', 'main_base': 'office', 'token_budget': 10})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('token budget of 10', response.get_json()['error'])
+
+    def test_bulk_rows_over_budget_are_skipped(self):
+        """Test that bulk rows over the job budget are skipped."""
+        with patch.object(Config, 'JOB_TOKEN_BUDGET', self.per_prompt * 3 // 2):
+            response = self.client.post('/api/bulk_generate', json={
+                'provider': 'local', 'delay_between': 0,
+                'prompts_data': [{'main_base': 'office'}, {'main_base': 'office'}]})
+        rows = response.get_json()['prompts']
+        self.assertEqual([row['status'] for row in rows], ['Success', 'Failed'])
+        self.assertIn('token budget', rows[1]['generated_prompt'])
+
+    def test_bulk_row_that_cannot_be_estimated_only_fails_itself(self):
+        """Test that a bulk row with an unexpected field fails alone instead of aborting a budgeted job."""
+        with patch.object(Config, 'JOB_TOKEN_BUDGET', self.per_prompt * 3):
+            response = self.client.post('/api/bulk_generate', json={
+                'provider': 'local', 'delay_between': 0, 'max_retries': 1,
+                'prompts_data': [{'main_base': 'office', 'colour': 'red'}, {'main_base': 'office'}]})
+        self.assertEqual(response.status_code, 200)
+        rows = response.get_json()['prompts']
+        self.assertEqual([row['status'] for row in rows], ['Failed', 'Success'])
+        self.assertEqual(rows[0]['main_base'], 'office')
+
+    def test_storyboard_over_budget_is_rejected(self):
+        """Test that a storyboard over the job budget is rejected."""
+        response = self.client.post('/api/generate_storyboard', json={
+            'provider': 'local', 'context': 'launch', 'keywords': 'rocket', 'num_scenes': 20, 'token_budget': 500})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('token_ledger', json.loads(self.client.get('/api/stats').data))
+
+
+if __name__ == '__main__':
+    unittest.main()
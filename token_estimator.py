@@ -0,0 +1,109 @@
+"""
+Fast local token estimates for prompts sent to the providers
+Counts word pieces the way BPE tokenizers split English text (one token per common word,
+more for long words, one per punctuation mark), which is close enough to size requests
+without loading a tokenizer. Budgets use the estimates to reject or shrink work before it
+is sent, and the ledger records them against the counts the providers report.
+"""
+
+import re
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Optional
+
+TOKEN_PIECES = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate number of provider tokens in text"""
+    return sum((len(piece) + 5) // 6 if piece[0].isalnum() else 1 for piece in TOKEN_PIECES.findall(text or ""))
+
+
+class PromptTokenStats:
+    """Running totals of input tokens sent against what the full-instruction prompts would send"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.sent = 0
+        self.full = 0
+
+    def record(self, sent: int, full: int):
+        with self._lock:
+            self.requests += 1
+            self.sent += sent
+            self.full += full
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests, sent, full = self.requests, self.sent, self.full
+        return {
+            "requests": requests,
+            "input_tokens": sent,
+            "full_input_tokens": full,
+            "avg_input_tokens": round(sent / requests, 1) if requests else 0.0,
+            "avg_full_input_tokens": round(full / requests, 1) if requests else 0.0,
+            "saved_ratio": round(1 - sent / full, 3) if full else 0.0,
+        }
+
+
+class TokenBudgetExceeded(ValueError):
+    """Raised when work would need more tokens than its budget allows"""
+
+
+def fit_output_tokens(input_tokens: int, max_tokens: int, budget: int, minimum: int) -> int:
+    """Output cap for one call under a per-request budget (0 = none): shrunk to fit, or rejected"""
+    if not budget or input_tokens + max_tokens <= budget:
+        return max_tokens
+    if budget - input_tokens < minimum:
+        raise TokenBudgetExceeded(f"Prompt needs about {input_tokens + minimum} tokens, "
+                                  f"over the per-request budget of {budget}")
+    return budget - input_tokens
+
+
+def fit_calls(tokens_per_call: int, count: int, budget: int) -> int:
+    """How many of count calls of about tokens_per_call tokens fit a job budget (0 = none)"""
+    if not budget or not tokens_per_call:
+        return count
+    return min(count, budget // tokens_per_call)
+
+
+class TokenLedger:
+    """Estimated against provider-reported tokens per provider, for quota planning and batch sizing"""
+
+    FIELDS = ("calls", "estimated_input", "reported_calls", "reported_estimated_input", "actual_input",
+              "max_output", "actual_output")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(self.FIELDS, 0))
+
+    def record(self, provider: str, estimated_input: int, max_output: int,
+               actual_input: Optional[int] = None, actual_output: Optional[int] = None):
+        """Record one call; actual counts are None when the provider did not report them"""
+        with self._lock:
+            totals = self._totals[provider]
+            totals["calls"] += 1
+            totals["estimated_input"] += estimated_input
+            totals["max_output"] += max_output
+            if actual_input is not None:
+                totals["reported_calls"] += 1
+                totals["reported_estimated_input"] += estimated_input
+                totals["actual_input"] += actual_input
+                totals["actual_output"] += actual_output or 0
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            snapshot = {provider: dict(totals) for provider, totals in self._totals.items()}
+        for totals in snapshot.values():
+            reported = totals["reported_estimated_input"]
+            # Above 1.0 the estimator undercounts this provider's tokenizer
+            totals["actual_to_estimated"] = round(totals["actual_input"] / reported, 3) if reported else None
+            totals["avg_actual_output"] = (round(totals["actual_output"] / totals["reported_calls"], 1)
+                                           if totals["reported_calls"] else None)
+        return snapshot
+
+
+# Global totals shared by every generator in the process
+prompt_token_stats = PromptTokenStats()
+token_ledger = TokenLedger()